@@ -0,0 +1,414 @@
+"""
+Benchmark of structure learning, parameters learning, sampling, prediction,
+saving/loading and weights calculation on data/benchmark datasets.
+
+Usage:
+    python -m bamt.benchmark --data-dir data/benchmark --output bench.json
+    python -m bamt.benchmark --scales 1 10 --baseline bench.json --tolerance 0.2
+
+Results are written as json: meta information and one record per
+(dataset, scale, network, stage) with time, rows/sec and peak RSS of the process.
+With a baseline (a json written by previous run) records get the ratio
+of time to the baseline time, the run fails if some stage is slower
+than the baseline by more than the tolerance.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn import preprocessing as pp
+
+from bamt.networks.continuous_bn import ContinuousBN
+from bamt.networks.discrete_bn import DiscreteBN
+from bamt.networks.hybrid_bn import HybridBN
+from bamt.preprocessors import Preprocessor
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+HC_METRICS = ["K2", "MI", "LL", "BIC", "AIC"]
+STAGES = [
+    "structure",
+    "evo",
+    "fit_parameters",
+    "sample",
+    "predict",
+    "save",
+    "load",
+    "calculate_weights",
+]
+NETWORKS = {"Discrete": DiscreteBN, "Continuous": ContinuousBN, "Hybrid": HybridBN}
+
+# small budget of evolutionary algorithms, benchmark measures speed, not quality
+EVO_PARAMS = {"num_of_generations": 5, "pop_size": 10, "timeout": 1, "n_jobs": 1}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the process in megabytes (None if unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def scale_data(data: pd.DataFrame, factor: float, seed: int = 0) -> pd.DataFrame:
+    """
+    Scale-up of a dataset: rows are drawn with replacement,
+    continuous columns get a small gaussian noise (1% of std).
+    """
+    if factor == 1:
+        return data.copy()
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, data.shape[0], int(round(data.shape[0] * factor)))
+    scaled = data.iloc[rows].reset_index(drop=True)
+    for column in scaled.columns:
+        if pd.api.types.is_float_dtype(scaled[column]):
+            noise = rng.normal(0, 0.01 * data[column].std(), scaled.shape[0])
+            scaled[column] = scaled[column] + noise
+    return scaled
+
+
+def read_dataset(path: str) -> pd.DataFrame:
+    data = pd.read_csv(path, index_col=0)
+    # columns of numeric names (e.g. new_thyroid) are kept as str
+    data.columns = [str(column) for column in data.columns]
+    return data.dropna().reset_index(drop=True)
+
+
+def prepare(data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """Encode and discretize data. Returns encoded, discretized data and info."""
+    encoded, _ = Preprocessor([("encoder", pp.LabelEncoder())]).apply(data)
+    p = Preprocessor(
+        [
+            ("encoder", pp.LabelEncoder()),
+            (
+                "discretizer",
+                pp.KBinsDiscretizer(n_bins=5, encode="ordinal", strategy="quantile"),
+            ),
+        ]
+    )
+    discretized, _ = p.apply(data)
+    return encoded, discretized, p.info
+
+
+def network_types(info: Dict) -> List[str]:
+    """Types of networks that can be learnt on data with such info."""
+    types = set(info["types"].values())
+    if types <= {"disc", "disc_num"}:
+        return ["Discrete"]
+    if types == {"cont"}:
+        return ["Continuous"]
+    return ["Hybrid"]
+
+
+def measure(func: Callable, repeats: int = 1) -> Tuple[float, object]:
+    """Best time of repeats and the last result of func."""
+    best, result = np.inf, None
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Benchmark(object):
+    """
+    Runner of the benchmark. Stages are run for each dataset, scale factor and
+    network: structure (HC with each metric), evo (Evo optimizer, or
+    Composite network learning for "Composite"), fit_parameters, sample
+    (for each of sample_sizes), predict, save, load and calculate_weights.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data/benchmark",
+        datasets: Optional[Sequence[str]] = None,
+        scales: Sequence[float] = (1,),
+        sample_sizes: Sequence[int] = (100, 1000, 10000),
+        stages: Optional[Sequence[str]] = None,
+        metrics: Sequence[str] = HC_METRICS,
+        composite: bool = False,
+        repeats: int = 1,
+        seed: int = 42,
+    ):
+        """
+        :param datasets: names of csv files in data_dir (all by default)
+        :param scales: scale-up factors of datasets (see scale_data)
+        :param composite: whether to benchmark CompositeBN as well
+        :param repeats: stages are repeated, the best time is taken
+        """
+        self.data_dir = data_dir
+        if datasets is None:
+            datasets = sorted(
+                os.path.splitext(file)[0]
+                for file in os.listdir(data_dir)
+                if file.endswith(".csv")
+            )
+        self.datasets = list(datasets)
+        self.scales = list(scales)
+        self.sample_sizes = list(sample_sizes)
+        self.stages = list(STAGES if stages is None else stages)
+        self.metrics = list(metrics)
+        self.composite = composite
+        self.repeats = repeats
+        self.seed = seed
+        self.results = []
+
+    def _seed(self):
+        random.seed(self.seed)
+        np.random.seed(self.seed)
+
+    def _record(self, key: Dict, stage: str, rows: Optional[int], func: Callable):
+        self._seed()
+        seconds, result = measure(func, self.repeats)
+        self.results.append(
+            dict(
+                key,
+                stage=stage,
+                rows=rows,
+                seconds=seconds,
+                rows_per_sec=rows / seconds if rows and seconds > 0 else None,
+                peak_rss_mb=peak_rss_mb(),
+            )
+        )
+        return result
+
+    def _learn(self, key, bn_type, encoded, discretized, info):
+        """Structure learning stages. Returns bn to run other stages with."""
+        if bn_type == "Composite":
+            from bamt.networks.composite_bn import CompositeBN
+
+            def learn():
+                bn = CompositeBN()
+                bn.add_nodes(info)
+                bn.add_edges(encoded, verbose=False, **EVO_PARAMS)
+                return bn
+
+            return self._record(key, "structure_Composite", encoded.shape[0], learn)
+
+        def learn(optimizer, metric=None):
+            bn = NETWORKS[bn_type]()
+            bn.add_nodes(info)
+            if optimizer == "HC":
+                bn.add_edges(
+                    discretized, scoring_function=(metric,), progress_bar=False
+                )
+            else:
+                bn.add_edges(
+                    discretized, optimizer="Evo", verbose=False, **EVO_PARAMS
+                )
+            return bn
+
+        bn = None
+        if "structure" in self.stages:
+            for metric in self.metrics:
+                learnt = self._record(
+                    key,
+                    f"structure_HC_{metric}",
+                    discretized.shape[0],
+                    lambda: learn("HC", metric),
+                )
+                bn = learnt if bn is None else bn
+        if "evo" in self.stages:
+            learnt = self._record(
+                key, "structure_Evo", discretized.shape[0], lambda: learn("Evo")
+            )
+            bn = learnt if bn is None else bn
+        if bn is None:
+            bn = learn("HC", self.metrics[0] if self.metrics else "K2")
+        return bn
+
+    def _run_network(self, key, bn_type, data, encoded, discretized, info):
+        bn = self._learn(key, bn_type, encoded, discretized, info)
+        self._seed()
+        bn.fit_parameters(data)
+        if "fit_parameters" in self.stages:
+            self._record(
+                key, "fit_parameters", data.shape[0], lambda: bn.fit_parameters(data)
+            )
+        if "sample" in self.stages:
+            for n in self.sample_sizes:
+                self._record(
+                    key,
+                    f"sample_{n}",
+                    n,
+                    lambda: bn.sample(n, progress_bar=False, seed=self.seed),
+                )
+        if "predict" in self.stages:
+            # a third of columns is predicted from the rest
+            columns = data.columns[-max(1, data.shape[1] // 3) :]
+            test = data.drop(columns=columns).iloc[:1000]
+            self._record(
+                key,
+                "predict",
+                test.shape[0],
+                lambda: bn.predict(test, progress_bar=False),
+            )
+        # parameters of composite networks (numpy scalars, models of discrete nodes)
+        # can't be saved yet
+        saving = bn_type != "Composite"
+        if saving and ("save" in self.stages or "load" in self.stages):
+            with tempfile.TemporaryDirectory() as directory:
+                name = os.path.join(directory, "bn")
+                models_dir = os.path.join(directory, "models")
+                if "save" in self.stages:
+                    self._record(key, "save", None, lambda: bn.save(name, models_dir))
+                else:
+                    # loading needs a saved network, saving isn't measured then
+                    bn.save(name, models_dir)
+                if "load" in self.stages:
+
+                    def load():
+                        loaded = type(bn)()
+                        loaded.load(f"{name}.json", models_dir=models_dir)
+                        return loaded
+
+                    self._record(key, "load", None, load)
+        if "calculate_weights" in self.stages and bn_type != "Composite":
+            self._record(
+                key,
+                "calculate_weights",
+                discretized.shape[0],
+                lambda: bn.calculate_weights(discretized),
+            )
+
+    def run(self) -> List[Dict]:
+        # builders are imported on first use, import time isn't measured
+        import bamt.builders.hc_builder  # noqa: F401
+
+        if "evo" in self.stages:
+            import bamt.builders.evo_builder  # noqa: F401
+
+        if self.composite:
+            import bamt.networks.composite_bn  # noqa: F401
+            import bamt.builders.composite_builder  # noqa: F401
+
+        for dataset in self.datasets:
+            source = read_dataset(os.path.join(self.data_dir, f"{dataset}.csv"))
+            for scale in self.scales:
+                data = scale_data(source, scale, self.seed)
+                encoded, discretized, info = prepare(data)
+                bn_types = network_types(info)
+                if self.composite:
+                    bn_types.append("Composite")
+                for bn_type in bn_types:
+                    key = dict(
+                        dataset=dataset,
+                        scale=scale,
+                        network=bn_type,
+                        n_rows=data.shape[0],
+                        n_columns=data.shape[1],
+                    )
+                    self._run_network(key, bn_type, data, encoded, discretized, info)
+        return self.results
+
+    @staticmethod
+    def meta() -> Dict:
+        return dict(
+            time=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            numpy=np.__version__,
+            pandas=pd.__version__,
+        )
+
+
+def _key(record: Dict) -> Tuple:
+    return record["dataset"], record["scale"], record["network"], record["stage"]
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float = 0.2):
+    """
+    Add ratio of time to the time of the same stage in baseline
+    (and regression flag if ratio > 1 + tolerance) to results.
+    :return: regressed records
+    """
+    baseline_time = {_key(record): record["seconds"] for record in baseline}
+    regressions = []
+    for record in results:
+        base = baseline_time.get(_key(record))
+        if not base:
+            continue
+        record["baseline_seconds"] = base
+        record["ratio"] = record["seconds"] / base
+        record["regression"] = record["ratio"] > 1 + tolerance
+        if record["regression"]:
+            regressions.append(record)
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m bamt.benchmark", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--data-dir", default="data/benchmark")
+    parser.add_argument("--datasets", nargs="*", default=None)
+    parser.add_argument("--scales", nargs="*", type=float, default=[1])
+    parser.add_argument(
+        "--sample-sizes", nargs="*", type=int, default=[100, 1000, 10000]
+    )
+    parser.add_argument("--stages", nargs="*", choices=STAGES, default=None)
+    parser.add_argument("--metrics", nargs="*", choices=HC_METRICS, default=HC_METRICS)
+    parser.add_argument("--composite", action="store_true")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", default=None, help="json of previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    for name in ["builder", "network", "nodes", "preprocessor"]:
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    benchmark = Benchmark(
+        data_dir=args.data_dir,
+        datasets=args.datasets,
+        scales=[int(s) if float(s).is_integer() else s for s in args.scales],
+        sample_sizes=args.sample_sizes,
+        stages=args.stages,
+        metrics=args.metrics,
+        composite=args.composite,
+        repeats=args.repeats,
+        seed=args.seed,
+    )
+    results = benchmark.run()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+
+    with open(args.output, "w") as out:
+        json.dump({"meta": benchmark.meta(), "results": results}, out, indent=1)
+
+    table = pd.DataFrame(results)
+    columns = ["dataset", "scale", "network", "stage", "seconds", "rows_per_sec"]
+    if "ratio" in table.columns:
+        columns.append("ratio")
+    print(table[columns].to_string(index=False))
+    for record in regressions:
+        print(
+            f"Regression: {'/'.join(str(k) for k in _key(record))} "
+            f"{record['baseline_seconds']:.4f} s -> {record['seconds']:.4f} s"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,9 @@ class ParamDict(TypedDict, total=False):
     remove_init_edges: bool
     white_list: Optional[Tuple[str, str]]
     bl_add: Optional[List[str]]
+    candidates: Optional[Union[str, Dict[str, List[str]]]]
+    n_candidates: int
+    refresh_candidates: int
 
 
 class StructureBuilder(object):
@@ -81,34 +84,44 @@ class StructureBuilder(object):
         if not self.skeleton["E"]:
             logger_builder.error("Edges list is None")
             return None
+        children, parents = self._adjacency()
         for node_instance in self.skeleton["V"]:
-            node = node_instance.name
-            children = []
-            parents = []
-            for edge in self.skeleton["E"]:
-                if node in edge:
-                    if edge.index(node) == 0:
-                        children.append(edge[1])
-                    if edge.index(node) == 1:
-                        parents.append(edge[0])
-
             disc_parents = []
             cont_parents = []
-            for parent in parents:
+            for parent in parents[node_instance.name]:
                 if self.descriptor["types"][parent] in ["disc", "disc_num"]:
                     disc_parents.append(parent)
                 else:
                     cont_parents.append(parent)
 
-            id = self.skeleton["V"].index(node_instance)
-            self.skeleton["V"][id].disc_parents = disc_parents
-            self.skeleton["V"][id].cont_parents = cont_parents
-            self.skeleton["V"][id].children = children
+            node_instance.disc_parents = disc_parents
+            node_instance.cont_parents = cont_parents
+            node_instance.children = children[node_instance.name]
 
         ordered = gru.toporder(self.skeleton["V"], self.skeleton["E"])
-        not_ordered = [node.name for node in self.skeleton["V"]]
-        mask = [not_ordered.index(name) for name in ordered]
-        self.skeleton["V"] = [self.skeleton["V"][i] for i in mask]
+        positions = self._positions()
+        self.skeleton["V"] = [self.skeleton["V"][positions[name]] for name in ordered]
+
+    def _positions(self) -> Dict[str, int]:
+        """
+        Positions of vertices in skeleton by names.
+        """
+        return {node.name: i for i, node in enumerate(self.skeleton["V"])}
+
+    def _adjacency(self) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """
+        Children and parents of vertices in skeleton collected in one pass over edges
+        (in order of edges).
+        """
+        children = {node.name: [] for node in self.skeleton["V"]}
+        parents = {node.name: [] for node in self.skeleton["V"]}
+        for edge in self.skeleton["E"]:
+            parent, child = edge[0], edge[1]
+            if parent in children:
+                children[parent].append(child)
+            if child in parents:
+                parents[child].append(parent)
+        return children, parents
 
 
 class VerticesDefiner(StructureBuilder):
@@ -155,6 +168,7 @@ class VerticesDefiner(StructureBuilder):
         :param has_logit allows edges from cont to disc nodes
         :param use_mixture allows using Mixture
         """
+        positions = self._positions()
         for node_instance in self.vertices:
             node = node_instance
             if has_logit:
@@ -190,7 +204,7 @@ class VerticesDefiner(StructureBuilder):
             if node_instance == node:
                 continue
 
-            id = self.skeleton["V"].index(node_instance)
+            id = positions[node_instance.name]
             node.disc_parents = node_instance.disc_parents
             node.cont_parents = node_instance.cont_parents
             node.children = node_instance.children
@@ -217,6 +231,9 @@ class BaseDefiner(VerticesDefiner, EdgesDefiner):
             "remove_init_edges": True,
             "white_list": None,
             "bl_add": None,
+            "candidates": None,
+            "n_candidates": 10,
+            "refresh_candidates": 0,
         }
         super().__init__(descriptor, regressor=regressor)
         self.optimizer = None  # will be defined in subclasses
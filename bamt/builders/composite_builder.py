@@ -16,6 +16,7 @@ from pandas import DataFrame
 from sklearn import preprocessing
 
 import bamt.preprocessors as pp
+from bamt import profiling
 from bamt.builders.builders_base import VerticesDefiner, EdgesDefiner
 from bamt.log import logger_builder
 from bamt.nodes.composite_continuous_node import CompositeContinuousNode
@@ -122,6 +123,7 @@ class CompositeStructureBuilder(CompositeDefiner):
         self,
         regressor: Optional[Callable],
     ):
+        positions = self._positions()
         for node_instance in self.vertices:
             node = node_instance
             if (
@@ -136,12 +138,13 @@ class CompositeStructureBuilder(CompositeDefiner):
                 node = DiscreteNode(name=node_instance.name)
             else:
                 continue
-            id_node = self.skeleton["V"].index(node_instance)
+            id_node = positions[node_instance.name]
             node.disc_parents = node_instance.disc_parents
             node.cont_parents = node_instance.cont_parents
             node.children = node_instance.children
             self.skeleton["V"][id_node] = node
 
+    @profiling.profiled("composite_search")
     def build(
         self,
         data: DataFrame,
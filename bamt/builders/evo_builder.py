@@ -14,8 +14,10 @@ from golem.core.optimisers.optimization_parameters import GraphRequirements
 from golem.core.optimisers.optimizer import GraphGenerationParams
 from pandas import DataFrame
 
+from bamt import profiling
 from bamt.builders.builders_base import BaseDefiner
 from bamt.utils import EvoUtils as evo
+from bamt.utils import SkeletonUtils
 
 
 class EvoDefiner(BaseDefiner):
@@ -97,6 +99,7 @@ class EvoStructureBuilder(EvoDefiner):
         ]
         self.verbose = True
 
+    @profiling.profiled("evo_search")
     def build(
         self,
         data: DataFrame,
@@ -132,6 +135,9 @@ class EvoStructureBuilder(EvoDefiner):
 
         Args:
             data (DataFrame): The data from which to build the structure.
+            skeleton (dict or str, optional): Neighbours of nodes (or "PC", "MMPC"
+                to find them by SkeletonUtils.skeleton), edges are searched only
+                between them.
 
         Returns:
             best_graph_edge_list (List[Tuple[str, str]]): The edge list of the best graph found by the search.
@@ -191,6 +197,21 @@ class EvoStructureBuilder(EvoDefiner):
         if kwargs.get("whitelist", None) is not None:
             constraints.append(evo.has_only_whitelist_edges)
 
+        # search space restricted by the skeleton, edges are added between neighbours
+        skeleton = kwargs.get("skeleton", None)
+        if isinstance(skeleton, str):
+            skeleton = SkeletonUtils.skeleton(
+                data, self.descriptor["types"], method=skeleton
+            )
+        if skeleton is not None:
+            constraints.append(evo.has_only_skeleton_edges(skeleton))
+            optimizer_parameters.mutation_types = [
+                evo.skeleton_mutation_add(skeleton)
+                if mutation is evo.custom_mutation_add
+                else mutation
+                for mutation in optimizer_parameters.mutation_types
+            ]
+
         graph_generation_params = GraphGenerationParams(
             adapter=adapter,
             rules_for_constraint=constraints,
@@ -1,13 +1,47 @@
 from typing import Dict, List, Optional, Tuple, Callable, Union
 
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
 from pgmpy.base import DAG
-from pgmpy.estimators import HillClimbSearch
+from pgmpy.estimators import HillClimbSearch, K2Score
 
+from bamt import profiling
 from bamt.builders.builders_base import ParamDict, BaseDefiner
 from bamt.log import logger_builder
 from bamt.redef_HC import hc as hc_method
 from bamt.utils import GraphUtils as gru
+from bamt.utils.CountUtils import CountIndex
+from bamt.utils.MathUtils import mutual_information_matrix
+from bamt.utils.SkeletonUtils import skeleton
+
+
+class CountK2Score(K2Score):
+    """
+    K2 score with state counts taken from a bitmap count index of the data
+    (CountIndex) instead of grouping its rows. Weights of rows (counts of
+    identical rows) make counts sums of weights.
+    """
+
+    def __init__(self, data: DataFrame, sample_weight: Optional[np.ndarray] = None):
+        super(CountK2Score, self).__init__(data)
+        self.counts = CountIndex(data, sample_weight)
+
+    def state_counts(self, variable, parents=[], weighted=False, reindex=True):
+        parents = list(parents)
+        if reindex or not parents:
+            # rows and columns are all states and configurations in sorted order
+            table = self.counts.table([variable] + parents)
+            return DataFrame(table.reshape(table.shape[0], -1))
+        # observed configurations are unstacked as pgmpy does with rows of data,
+        # so local scores are summed in the same order
+        columns = [variable] + parents
+        cells, counts = self.counts.cells(columns)
+        index = pd.MultiIndex.from_arrays(
+            [self.counts.values[c][cells[:, i]] for i, c in enumerate(columns)],
+            names=columns,
+        )
+        return pd.Series(counts, index=index).unstack(parents).fillna(0)
 
 
 class HillClimbDefiner(BaseDefiner):
@@ -25,6 +59,73 @@ class HillClimbDefiner(BaseDefiner):
         super().__init__(data, descriptor, scoring_function, regressor)
         self.optimizer = HillClimbSearch(data)
 
+    def select_candidates(
+        self,
+        data: DataFrame,
+        candidates: Union[str, Dict[str, List[str]]],
+        n_candidates: int,
+        sample_weight: Optional[np.ndarray] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Sparse candidate parents of every node.
+        :param candidates: "MI" or "pearson" (n_candidates nodes with the highest
+        mutual information or absolute correlation), "brave" (neighbours by BigBraveBN
+        with n_nearest=n_candidates), "PC" or "MMPC" (neighbours in the skeleton
+        found by conditional independence tests, hybrid MMHC) or a dict node:
+        candidate parents
+        :param sample_weight: weights of rows, they are used by "MI" candidates only
+        """
+        columns = data.columns.to_list()
+        black_list = set(map(tuple, self.black_list))
+        if isinstance(candidates, dict):
+            return {
+                node: [u for u in parents if (u, node) not in black_list]
+                for node, parents in candidates.items()
+            }
+        if candidates in ["PC", "MMPC"]:
+            candidates = skeleton(data, self.descriptor["types"], method=candidates)
+            return {
+                node: [u for u in parents if (u, node) not in black_list]
+                for node, parents in candidates.items()
+            }
+        if candidates == "brave":
+            from bamt.networks.big_brave_bn import BigBraveBN
+
+            edges = BigBraveBN().set_possible_edges_by_brave(
+                data, n_nearest=n_candidates
+            )
+            selected = {node: [] for node in columns}
+            for u, v in edges:
+                if (u, v) not in black_list:
+                    selected[v].append(u)
+            return selected
+
+        if candidates == "MI":
+            codes = np.column_stack(
+                [pd.factorize(data[c], use_na_sentinel=False)[0] for c in columns]
+            )
+            proximity = mutual_information_matrix(
+                codes, codes.max(axis=0) + 1, weights=sample_weight
+            )
+        elif candidates == "pearson":
+            coded = data.apply(
+                lambda c: c if pd.api.types.is_numeric_dtype(c) else c.rank("dense")
+            )
+            proximity = coded.corr(method="pearson").abs().fillna(0).to_numpy()
+        else:
+            logger_builder.error(f"Candidates {candidates} are not supported")
+            return None
+        selected = {}
+        for j, node in enumerate(columns):
+            order = np.argsort(-proximity[:, j], kind="stable")
+            selected[node] = [
+                columns[i]
+                for i in order
+                if i != j and (columns[i], node) not in black_list
+            ][:n_candidates]
+        return selected
+
+    @profiling.profiled("hc_k2")
     def apply_K2(
         self,
         data: DataFrame,
@@ -32,6 +133,8 @@ class HillClimbDefiner(BaseDefiner):
         progress_bar: bool,
         remove_init_edges: bool,
         white_list: Optional[List[Tuple[str, str]]],
+        candidates: Optional[Dict[str, List[str]]] = None,
+        sample_weight: Optional[np.ndarray] = None,
     ):
         """
         :param init_edges: list of tuples, a graph to start learning with
@@ -39,6 +142,8 @@ class HillClimbDefiner(BaseDefiner):
         :param data: user's data
         :param progress_bar: verbose regime
         :param white_list: list of allowed edges
+        :param candidates: candidate parents of nodes, they restrict the white list
+        :param sample_weight: weights of rows (counts of identical rows)
         """
         if not all([i in ["disc", "disc_num"] for i in gru.nodes_types(data).values()]):
             logger_builder.error(
@@ -46,16 +151,26 @@ class HillClimbDefiner(BaseDefiner):
             )
             return None
 
+        if len(self.scoring_function) == 2 and sample_weight is not None:
+            logger_builder.error("Custom scoring functions do not support weights")
+            return None
+        # K2 (the score of searches from init_edges as well) counts by the index
+        k2_score = CountK2Score(data, sample_weight)
         if len(self.scoring_function) != 2:
-            from pgmpy.estimators import K2Score
-
-            scoring_function = K2Score
+            scoring_method = k2_score
         else:
-            scoring_function = self.scoring_function[1]
+            scoring_method = self.scoring_function[1](data)
+
+        if candidates is not None:
+            allowed = [(u, v) for v, parents in candidates.items() for u in parents]
+            if white_list:
+                white_list = set(map(tuple, white_list))
+                allowed = [edge for edge in allowed if edge in white_list]
+            white_list = allowed
 
         if not init_edges:
             best_model = self.optimizer.estimate(
-                scoring_method=scoring_function(data),
+                scoring_method=scoring_method,
                 black_list=self.black_list,
                 white_list=white_list,
                 show_progress=progress_bar,
@@ -71,6 +186,7 @@ class HillClimbDefiner(BaseDefiner):
                     white_list=white_list,
                     start_dag=startdag,
                     show_progress=False,
+                    scoring_method=k2_score,
                 )
             else:
                 best_model = self.optimizer.estimate(
@@ -78,11 +194,13 @@ class HillClimbDefiner(BaseDefiner):
                     white_list=white_list,
                     fixed_edges=init_edges,
                     show_progress=False,
+                    scoring_method=k2_score,
                 )
 
         structure = [list(x) for x in list(best_model.edges())]
         self.skeleton["E"] = structure
 
+    @profiling.profiled("hc_search")
     def apply_group1(
         self,
         data: DataFrame,
@@ -90,6 +208,9 @@ class HillClimbDefiner(BaseDefiner):
         init_edges: Optional[List[Tuple[str, str]]],
         remove_init_edges: bool,
         white_list: Optional[List[Tuple[str, str]]],
+        candidates: Optional[Dict[str, List[str]]] = None,
+        refresh_candidates: int = 0,
+        sample_weight: Optional[np.ndarray] = None,
     ):
         """
         This method implements the group of scoring functions.
@@ -98,6 +219,10 @@ class HillClimbDefiner(BaseDefiner):
         "LL" - Log Likelihood,
         "BIC" - Bayesian Information Criteria,
         "AIC" - Akaike information Criteria.
+        :param candidates: candidate parents of nodes, only they are tried as parents
+        :param refresh_candidates: period (in iterations) of selection of candidates
+        by score gain, 0 to keep the initial candidates
+        :param sample_weight: weights of rows (counts of identical rows)
         """
         column_name_dict = dict([(n.name, i) for i, n in enumerate(self.vertices)])
         blacklist_new = []
@@ -117,6 +242,11 @@ class HillClimbDefiner(BaseDefiner):
                 init_edges.append(
                     (column_name_dict[pair[0]], column_name_dict[pair[1]])
                 )
+        if candidates is not None:
+            candidates = {
+                column_name_dict[node]: [column_name_dict[u] for u in parents]
+                for node, parents in candidates.items()
+            }
 
         bn = hc_method(
             data,
@@ -126,21 +256,16 @@ class HillClimbDefiner(BaseDefiner):
             remove_geo_edges=remove_init_edges,
             black_list=blacklist_new,
             debug=progress_bar,
+            candidates=candidates,
+            refresh_candidates=refresh_candidates,
+            sample_weight=sample_weight,
         )
         structure = []
+        column_names = {rv: name for name, rv in column_name_dict.items()}
         nodes = sorted(list(bn.nodes()))
         for rv in nodes:
             for pa in bn.F[rv]["parents"]:
-                structure.append(
-                    [
-                        list(column_name_dict.keys())[
-                            list(column_name_dict.values()).index(pa)
-                        ],
-                        list(column_name_dict.keys())[
-                            list(column_name_dict.values()).index(rv)
-                        ],
-                    ]
-                )
+                structure.append([column_names[pa], column_names[rv]])
         self.skeleton["E"] = structure
 
 
@@ -179,23 +304,50 @@ class HCStructureBuilder(HillClimbDefiner):
         classifier: Optional[object],
         regressor: Optional[object],
         params: Optional[ParamDict] = None,
+        sample_weight: Optional[np.ndarray] = None,
         **kwargs,
     ):
+        """
+        :param sample_weight: weights of rows, e.g. counts of identical rows of data
+        compressed by bamt.preprocess.numpy_pandas.compress_rows
+        """
+        if sample_weight is not None:
+            sample_weight = np.asarray(sample_weight, dtype=float)
         if params:
             for param, value in params.items():
                 self.params[param] = value
 
         init_nodes = self.params.pop("init_nodes")
         bl_add = self.params.pop("bl_add")
+        candidates = self.params.pop("candidates")
+        n_candidates = self.params.pop("n_candidates")
+        refresh_candidates = self.params.pop("refresh_candidates")
 
         # Level 1
         self.skeleton["V"] = self.vertices
 
         self.restrict(data, init_nodes, bl_add)
+        if candidates is not None:
+            candidates = self.select_candidates(
+                data, candidates, n_candidates, sample_weight
+            )
         if self.scoring_function[0] == "K2":
-            self.apply_K2(data=data, progress_bar=progress_bar, **self.params)
+            self.apply_K2(
+                data=data,
+                progress_bar=progress_bar,
+                candidates=candidates,
+                sample_weight=sample_weight,
+                **self.params,
+            )
         elif self.scoring_function[0] in ["MI", "LL", "BIC", "AIC"]:
-            self.apply_group1(data=data, progress_bar=progress_bar, **self.params)
+            self.apply_group1(
+                data=data,
+                progress_bar=progress_bar,
+                candidates=candidates,
+                refresh_candidates=refresh_candidates,
+                sample_weight=sample_weight,
+                **self.params,
+            )
 
         # Level 2
 
@@ -1,9 +1,19 @@
-from .display import Display
+def __getattr__(name):
+    # matplotlib and pyvis are heavy, Display is imported on first use
+    if name == "Display":
+        from .display import Display
+
+        return Display
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def plot_(output, *args):
+    from .display import Display
+
     return Display(output).build(*args)
 
 
 def get_info_(bn, as_df):
+    from .display import Display
+
     return Display(output=None).get_info(bn, as_df)
@@ -22,17 +22,19 @@ import numpy as np
 from bamt.external.pyBN.utils.data import unique_bins
 
 
-def mutual_information(data, conditional=False):
+def mutual_information(data, conditional=False, weights=None):
+    # weights of rows (counts of identical rows), None for ones
     # bins = np.amax(data, axis=0)+1 # read levels for each variable
     bins = unique_bins(data)
     if len(bins) == 1:
-        hist, _ = np.histogramdd(data, bins=(bins))  # frequency counts
+        hist, _ = np.histogramdd(data, bins=(bins), weights=weights)  # frequency counts
         Px = (hist / hist.sum()) + (1e-7)
         MI = -1 * np.sum(Px * np.log(Px))
         return round(MI, 4)
 
     if len(bins) == 2:
-        hist, _ = np.histogramdd(data, bins=bins[0:2])  # frequency counts
+        # frequency counts
+        hist, _ = np.histogramdd(data, bins=bins[0:2], weights=weights)
 
         Pxy = hist / hist.sum()  # joint probability distribution over X,Y,Z
         Px = np.sum(Pxy, axis=1)  # P(X,Z)
@@ -53,7 +55,7 @@ def mutual_information(data, conditional=False):
             data = data.astype(np.int64)[:, 0:3]
 
         bins = np.amax(data, axis=0)
-        hist, _ = np.histogramdd(data, bins=bins)  # frequency counts
+        hist, _ = np.histogramdd(data, bins=bins, weights=weights)  # frequency counts
 
         Pxyz = hist / hist.sum()  # joint probability distribution over X,Y,Z
         Pz = np.sum(Pxyz, axis=(0, 1))  # P(Z)
@@ -82,7 +84,8 @@ def mutual_information(data, conditional=False):
             data[i, 1] = "".join(data[i, 1:ncols])
         data = data.astype(np.int64)[:, 0:2]
 
-        hist, _ = np.histogramdd(data, bins=bins[0:2])  # frequency counts
+        # frequency counts
+        hist, _ = np.histogramdd(data, bins=bins[0:2], weights=weights)
 
         Pxy = hist / hist.sum()  # joint probability distribution over X,Y,Z
         Px = np.sum(Pxy, axis=1)  # P(X,Z)
@@ -95,7 +98,7 @@ def mutual_information(data, conditional=False):
         return round(MI, 4)
 
 
-def entropy(data):
+def entropy(data, weights=None):
     """
     In the context of structure learning, and more specifically
     in constraint-based algorithms which rely on the mutual information
@@ -146,12 +149,13 @@ def entropy(data):
     # bins = unique_bins(data)
 
     if cols == 1:
-        hist, _ = np.histogramdd(data, bins=(bins))  # frequency counts
+        hist, _ = np.histogramdd(data, bins=(bins), weights=weights)  # frequency counts
         Px = hist / hist.sum() + (1e-7)
         H = -1 * np.sum(Px * np.log(Px))
 
     elif cols == 2:  # two variables -> assume X then Y
-        hist, _ = np.histogramdd(data, bins=bins[0:2])  # frequency counts
+        # frequency counts
+        hist, _ = np.histogramdd(data, bins=bins[0:2], weights=weights)
 
         Pxy = hist / hist.sum()  # joint probability distribution over X,Y,Z
         Py = np.sum(Pxy, axis=0)  # P(Y)
@@ -169,7 +173,7 @@ def entropy(data):
             data = data.astype(np.int64)[:, 0:3]
 
         bins = np.amax(data, axis=0)
-        hist, _ = np.histogramdd(data, bins=bins)  # frequency counts
+        hist, _ = np.histogramdd(data, bins=bins, weights=weights)  # frequency counts
 
         Pxyz = hist / hist.sum()  # joint probability distribution over X,Y,Z
         Pyz = np.sum(Pxyz, axis=0)
@@ -1,7 +1,7 @@
 import math
 import sys
 from copy import copy
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
@@ -9,7 +9,9 @@ import pandas as pd
 from bamt.external.pyBN.utils.independence_tests import mutual_information, entropy
 from bamt.preprocess.discretization import get_nodes_type
 from bamt.preprocess.graph import edges_to_dict
-from bamt.preprocess.numpy_pandas import loc_to_DataFrame
+from bamt.preprocess.numpy_pandas import get_type_numpy, loc_to_DataFrame
+
+LOG_MIN_DET = math.log(1e-16)
 
 
 def query_filter(data: pd.DataFrame, columns: List, values: List):
@@ -76,18 +78,169 @@ def entropy_gauss(pd_data):
     if flag_row & flag_col:
         return sys.float_info.max
     elif flag_row | flag_col:
-        var = np.var(data)
-        if var > 1e-16:
-            return 0.5 * (1 + math.log(var * 2 * math.pi))
-        else:
-            return sys.float_info.min
+        return entropy_var(np.var(data))
+    else:
+        return entropy_cov(np.cov(data))
+
+
+def entropy_var(var):
+    """Entropy of a Gaussian variable by its variance."""
+    if var > 1e-16:
+        return 0.5 * (1 + math.log(var * 2 * math.pi))
     else:
-        var = np.linalg.det(np.cov(data))
-        N = var.ndim
-        if var > 1e-16:
-            return 0.5 * (N * (1 + math.log(2 * math.pi)) + math.log(var))
+        return sys.float_info.min
+
+
+def entropy_cov(cov):
+    """
+    Entropy of a Gaussian vector by its covariance matrix.
+    The determinant is taken as a logarithm (slogdet), so it neither overflows
+    nor underflows for many columns.
+    """
+    sign, log_det = np.linalg.slogdet(cov)
+    N = np.ndim(log_det)
+    if sign > 0 and log_det > LOG_MIN_DET:
+        return 0.5 * (N * (1 + math.log(2 * math.pi)) + log_det)
+    else:
+        return sys.float_info.min
+
+
+class GaussianStatistics(object):
+    """
+    Entropies of families of columns of an array from sufficient statistics
+    computed once: the covariance matrix of continuous columns and, for every
+    set of discrete columns, moments of continuous columns in groups of rows
+    with the same discrete values. The entropy of a family comes from principal
+    submatrices, so scoring a family does not pass over the data.
+    Values are the same as of entropy_gauss and mi_gauss on the sliced data.
+    """
+
+    def __init__(self, data: np.ndarray, sample_weight: Optional[np.ndarray] = None):
+        """
+        :param sample_weight: weights of rows (counts of identical rows), statistics
+        are the same as of data with rows repeated
+        """
+        types = get_type_numpy(data)
+        self.continuous = np.array([types[i] == "cont" for i in range(data.shape[1])])
+        index = np.flatnonzero(self.continuous)
+        values = data[:, index].astype(float)
+        if sample_weight is None:
+            self.n = data.shape[0]
+            self.weights = np.ones(data.shape[0])
+            cov = np.cov(values, rowvar=False)
+            var = np.var(values, axis=0)
+            mean = values.mean(axis=0)
         else:
-            return sys.float_info.min
+            self.weights = np.asarray(sample_weight, dtype=float)
+            self.n = self.weights.sum()
+            mean = self.weights @ values / self.n
+            centred = values - mean
+            scatter = (centred * self.weights[:, None]).T @ centred
+            cov = scatter / (self.n - 1)
+            var = np.diag(scatter) / self.n
+        self.cov = np.full((data.shape[1], data.shape[1]), np.nan)
+        self.cov[np.ix_(index, index)] = np.atleast_2d(cov)
+        self.var = np.full(data.shape[1], np.nan)
+        self.var[index] = var
+        self._entropies = {}
+
+        # positions of continuous columns in the centred values of moments
+        self.data = data
+        self.position = np.full(data.shape[1], -1)
+        self.position[index] = np.arange(index.shape[0])
+        self.centred = values - mean
+        self._moments = {}
+
+    def is_continuous(self, columns: Sequence[int]) -> bool:
+        """Whether the family has continuous columns to be scored (needs two rows)."""
+        return self.n > 1 and bool(self.continuous[list(columns)].any())
+
+    def entropy(self, columns: Tuple[int, ...]) -> float:
+        if columns not in self._entropies:
+            if len(set(columns)) < len(columns):
+                # a repeated column, the covariance matrix is singular
+                value = sys.float_info.min
+            elif len(columns) == 1:
+                value = entropy_var(self.var[columns[0]])
+            else:
+                value = entropy_cov(self.cov[np.ix_(columns, columns)])
+            self._entropies[columns] = value
+        return self._entropies[columns]
+
+    def moments(self, discrete: Tuple[int, ...]):
+        """
+        Counts, sums and cross-products of all continuous columns (centred)
+        in groups of rows by values of discrete columns. The data is grouped
+        only once for a set of discrete columns.
+        """
+        key = tuple(sorted(discrete))
+        if key not in self._moments:
+            _, groups, rows = np.unique(
+                self.data[:, key], axis=0, return_inverse=True, return_counts=True
+            )
+            groups = groups.ravel()
+            counts = np.bincount(groups, weights=self.weights)
+            order = np.argsort(groups, kind="stable")
+            bounds = np.cumsum(rows)[:-1]
+            blocks = np.split(self.centred[order], bounds)
+            weighted = np.split(self.centred[order] * self.weights[order, None], bounds)
+            sums = np.array([block.sum(axis=0) for block in weighted])
+            products = np.array([a.T @ b for a, b in zip(blocks, weighted)])
+            self._moments[key] = counts, sums, products
+        return self._moments[key]
+
+    def entropy_cond(
+        self, continuous: Tuple[int, ...], discrete: Tuple[int, ...], method="MI"
+    ) -> float:
+        """entropy_cond of the continuous columns given the discrete ones"""
+        counts, sums, products = self.moments(discrete)
+        index = self.position[list(continuous)]
+        sums = sums[:, index]
+        products = products[:, index[:, None], index[None, :]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scatter = products - sums[:, :, None] * sums[:, None, :] / counts[
+                :, None, None
+            ]
+            if len(set(continuous)) < len(continuous):
+                entropies = [sys.float_info.min] * counts.shape[0]
+            elif len(continuous) == 1:
+                # np.var of a group
+                entropies = [entropy_var(var) for var in scatter[:, 0, 0] / counts]
+            else:
+                # np.cov of a group
+                scatter /= (counts - 1)[:, None, None]
+                entropies = [entropy_cov(cov) for cov in scatter]
+
+        H_gauss = self.entropy(continuous)
+        H_cond = 0.0
+        for count, H in zip(counts, entropies):
+            if count == 1:
+                if (method == "BIC") | (method == "AIC"):
+                    H_cond += count / self.n * H_gauss
+                else:
+                    H_cond += count / self.n * sys.float_info.max
+            else:
+                H_cond += count / self.n * H
+        if (method == "BIC") | (method == "AIC"):
+            return min(H_cond, H_gauss)
+        return H_cond
+
+    def mi(self, columns: Tuple[int, ...], method="MI") -> float:
+        """
+        mi_gauss of the family: the last column against the rest for continuous
+        columns, entropy of continuous columns given discrete ones for hybrid.
+        """
+        continuous = tuple(c for c in columns if self.continuous[c])
+        if len(continuous) < len(columns):
+            discrete = tuple(c for c in columns if not self.continuous[c])
+            return self.entropy(continuous) - self.entropy_cond(
+                continuous, discrete, method
+            )
+        if len(columns) == 1:
+            return self.entropy(columns)
+        H_last = self.entropy(columns[-1:])
+        H_trim = self.entropy(columns[:-1])
+        return min(H_last + H_trim - self.entropy(columns), H_last, H_trim)
 
 
 def entropy_all(data, method="MI"):
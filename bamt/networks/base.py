@@ -3,29 +3,38 @@ import os.path as path
 import random
 import re
 from copy import deepcopy
-from typing import Dict, Tuple, List, Callable, Optional, Type, Union, Any, Sequence
+from typing import (
+    Dict,
+    Tuple,
+    List,
+    Callable,
+    Optional,
+    Type,
+    Union,
+    Any,
+    Sequence,
+    Iterable,
+    Iterator,
+)
 
 import numpy as np
 import pandas as pd
 from joblib import Parallel, delayed
-from pgmpy.estimators import K2Score
 from sklearn.preprocessing import LabelEncoder
 from tqdm import tqdm
 
 import bamt.builders as builders
+from bamt import profiling
 from bamt.builders.builders_base import ParamDict
-from bamt.builders.evo_builder import EvoStructureBuilder
-from bamt.builders.hc_builder import HCStructureBuilder
 from bamt.display import plot_, get_info_
-from bamt.external.pyitlib.DiscreteRandomVariableUtils import (
-    entropy,
-    information_mutual,
-    information_mutual_conditional,
-    entropy_conditional,
-)
 from bamt.log import logger_network
-from bamt.nodes.base import BaseNode
-from bamt.utils import GraphUtils, serialization_utils, check_utils
+from bamt.networks.inference_plan import InferencePlan
+from bamt.nodes.base import BaseNode, codes_dtype
+from bamt.nodes.schema import CodedColumn
+from bamt.utils import GraphUtils, MathUtils, serialization_utils, check_utils
+from bamt.utils.CPTUtils import SparseCPT
+from bamt.utils.CountUtils import CountIndex
+from bamt.utils.SamplingUtils import GibbsSampler
 
 
 class BaseNetwork(object):
@@ -45,19 +54,40 @@ class BaseNetwork(object):
         self.nodes = []
         self.edges = []
         self.weights = {}
+        self.weights_ci = {}
         self.descriptor = {"types": {}, "signs": {}}
         self.distributions = {}
         self.has_logit = False
         self.use_mixture = False
         self.encoders = {}
+        self._compiled = None
+        self._query_plans = {}
+        self._registry = (None, {})
 
     @property
     def nodes_names(self) -> List[str]:
         return [node.name for node in self.nodes]
 
+    def _node_positions(self, refresh: bool = False) -> Dict[str, int]:
+        """
+        Registry of positions of nodes by names.
+        It is rebuilt when the list of nodes is replaced or resized
+        (nodes are assigned directly by builders, set_nodes and load).
+        """
+        key = (id(self.nodes), len(self.nodes))
+        if refresh or self._registry[0] != key:
+            self._registry = (
+                key,
+                {node.name: i for i, node in enumerate(self.nodes)},
+            )
+        return self._registry[1]
+
     def __getitem__(self, node_name: str) -> Type[BaseNode]:
-        if node_name in self.nodes_names:
-            index = self.nodes_names.index(node_name)
+        index = self._node_positions().get(node_name)
+        if index is None or self.nodes[index].name != node_name:
+            # the list was changed in place (e.g. a node was replaced or renamed)
+            index = self._node_positions(refresh=True).get(node_name)
+        if index is not None:
             return self.nodes[index]
 
     def validate(self, descriptor: Dict[str, Dict[str, str]]) -> bool:
@@ -67,7 +97,7 @@ class BaseNetwork(object):
         )
 
     def update_descriptor(self):
-        new_nodes_names = [node.name for node in self.nodes]
+        new_nodes_names = set(self._node_positions(refresh=True))
         self.descriptor["types"] = {
             node: type
             for node, type in self.descriptor["types"].items()
@@ -112,20 +142,24 @@ class BaseNetwork(object):
         )
         self.nodes = worker_1.vertices
 
+    @profiling.profiled("add_edges")
     def add_edges(
         self,
         data: pd.DataFrame,
-        scoring_function: Union[Tuple[str, Callable], Tuple[str]] = ("K2", K2Score),
+        scoring_function: Union[Tuple[str, Callable], Tuple[str]] = ("K2",),
         progress_bar: bool = True,
         classifier: Optional[object] = None,
         regressor: Optional[object] = None,
         params: Optional[ParamDict] = None,
         optimizer: str = "HC",
+        sample_weight: Optional[np.ndarray] = None,
         **kwargs,
     ):
         """
         Base function for Structure learning
         scoring_function: tuple with the following format (NAME, scoring_function) or (NAME, )
+        sample_weight: weights of rows, e.g. counts of identical rows of data
+        compressed by bamt.preprocess.numpy_pandas.compress_rows (HC only)
         Params:
         init_edges: list of tuples, a graph to start learning with
         remove_init_edges: allows changes in a model defined by user
@@ -167,7 +201,10 @@ class BaseNetwork(object):
                 f"{self.type} BN does not support {'discrete' if self.type == 'Continuous' else 'continuous'} data"
             )
             return None
+        # builders pull in pgmpy and golem, they are imported on first use
         if optimizer == "HC":
+            from bamt.builders.hc_builder import HCStructureBuilder
+
             worker = HCStructureBuilder(
                 data=data,
                 descriptor=self.descriptor,
@@ -177,6 +214,11 @@ class BaseNetwork(object):
                 regressor=regressor,
             )
         elif optimizer == "Evo":
+            if sample_weight is not None:
+                logger_network.error("Evo optimizer does not support weights of rows")
+                return None
+            from bamt.builders.evo_builder import EvoStructureBuilder
+
             worker = EvoStructureBuilder(
                 data=data,
                 descriptor=self.descriptor,
@@ -190,6 +232,8 @@ class BaseNetwork(object):
 
         self.sf_name = scoring_function[0]
 
+        if sample_weight is not None:
+            kwargs["sample_weight"] = sample_weight
         worker.build(
             data=data,
             params=params,
@@ -203,9 +247,27 @@ class BaseNetwork(object):
         self.nodes = worker.skeleton["V"]
         self.edges = worker.skeleton["E"]
 
-    def calculate_weights(self, discretized_data: pd.DataFrame):
+    @profiling.profiled("calculate_weights")
+    def calculate_weights(
+        self,
+        discretized_data: pd.DataFrame,
+        n_jobs: int = 1,
+        n_bootstrap: int = 0,
+        alpha: float = 0.05,
+        seed: Optional[int] = None,
+        sample_weight: Optional[np.ndarray] = None,
+    ):
         """
         Provide calculation of link strength according mutual information between node and its parent(-s) values.
+        Data is coded into integers once, every family's joint counts are computed once
+        and all mutual informations and entropies of its links are derived from them.
+        :param n_jobs: number of threads computing families (and bootstrap samples)
+        :param n_bootstrap: number of bootstrap samples to estimate confidence intervals
+        of weights, they are saved into weights_ci as (low, high)
+        :param alpha: confidence intervals are of 1 - alpha level
+        :param seed: seed of bootstrap sampling
+        :param sample_weight: weights of rows (counts of identical rows, see
+        compress_rows), bootstrap samples are drawn from rows with these weights
         """
         import bamt.utils.GraphUtils as gru
 
@@ -223,40 +285,67 @@ class BaseNetwork(object):
             logger_network.error(
                 "Bayesian Network hasn't fitted yet. Please add nodes with add_nodes() method"
             )
-        weights = dict()
 
-        for node in self.nodes:
-            parents = node.cont_parents + node.disc_parents
-            if parents is None:
-                continue
-            y = discretized_data[node.name].values
-            if len(parents) == 1:
-                x = discretized_data[parents[0]].values
-                ls_true = information_mutual(X=y, Y=x)
-                entropy_value = entropy(X=y)
-                weight = ls_true / entropy_value
-                weights[(parents[0], node.name)] = weight
+        families = [
+            [node.name] + node.cont_parents + node.disc_parents
+            for node in self.nodes
+            if node.cont_parents + node.disc_parents
+        ]
+        self.weights, self.weights_ci = {}, {}
+        if not families:
+            return
+        names = list(dict.fromkeys(name for family in families for name in family))
+        position = {name: i for i, name in enumerate(names)}
+        codes = np.column_stack(
+            [
+                pd.factorize(discretized_data[name], use_na_sentinel=False)[0]
+                for name in names
+            ]
+        )
+        cards = codes.max(axis=0) + 1
+
+        def compute(sample_weight, families):
+            weights = {}
+            for family in families:
+                members = [position[name] for name in family]
+                table = MathUtils.FamilyTable(
+                    codes[:, members], cards[members], sample_weight
+                )
+                for parent, weight in zip(family[1:], table.link_strengths()):
+                    weights[(parent, family[0])] = weight
+            return weights
+
+        # families are computed by threads, counting in numpy releases GIL
+        parts = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(compute)(sample_weight, [family]) for family in families
+        )
+        self.weights = {edge: w for part in parts for edge, w in part.items()}
+
+        if n_bootstrap:
+            rng = np.random.default_rng(seed)
+            n = codes.shape[0]
+            if sample_weight is None:
+                samples = [rng.integers(0, n, n) for _ in range(n_bootstrap)]
             else:
-                for parent_node in parents:
-                    x = discretized_data[parent_node].values
-                    other_parents = [tmp for tmp in parents if tmp != parent_node]
-                    z = list()
-                    for other_parent in other_parents:
-                        z.append(list(discretized_data[other_parent].values))
-                    ls_true = np.average(
-                        information_mutual_conditional(
-                            x=y, y=x, z=z, cartesian_product=True
-                        )
-                    )
-                    entropy_value = (
-                        np.average(
-                            entropy_conditional(X=y, Y=z, cartesian_product=True)
-                        )
-                        + 1e-8
+                total = np.sum(sample_weight)
+                p = np.asarray(sample_weight, dtype=float) / total
+                samples = [
+                    rng.choice(n, int(round(total)), p=p) for _ in range(n_bootstrap)
+                ]
+            # a sample is counts of drawn rows
+            replicates = Parallel(n_jobs=n_jobs, prefer="threads")(
+                delayed(compute)(np.bincount(rows, minlength=n), families)
+                for rows in samples
+            )
+            self.weights_ci = {
+                edge: tuple(
+                    np.nanquantile(
+                        [weights[edge] for weights in replicates],
+                        [alpha / 2, 1 - alpha / 2],
                     )
-                    weight = ls_true / entropy_value
-                    weights[(parent_node, node.name)] = weight
-        self.weights = weights
+                )
+                for edge in self.weights
+            }
 
     def set_nodes(self, nodes: List, info: Optional[Dict] = None):
         """
@@ -432,9 +521,18 @@ class BaseNetwork(object):
                 f"Unappropriated file format. Expected: .json. Got: {path.splitext(outdir)[-1]}"
             )
         with open(outdir, "w+") as out:
-            json.dump(data, out)
+            # json.dumps encodes in one pass in C, json.dump writes chunk by chunk
+            out.write(json.dumps(data, default=BaseNetwork._to_json))
         return True
 
+    @staticmethod
+    def _to_json(obj):
+        if isinstance(obj, SparseCPT):
+            return obj.to_dict()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
     def save_params(self, outdir: str):
         """
         Function to save BN params to json file
@@ -449,18 +547,43 @@ class BaseNetwork(object):
         """
         return self._save_to_file(outdir, self.edges)
 
-    def save(self, bn_name, models_dir: str = "models_dir"):
+    @profiling.profiled("save")
+    def save(
+        self,
+        bn_name,
+        models_dir: str = "models_dir",
+        container: Optional[str] = None,
+        n_jobs: int = 1,
+    ):
         """
         Function to save the whole BN to json file.
 
         :param bn_name: unique name of bn user want to save. It will be used as file name (e.g. bn_name.json).
         :param models_dir: if picklization is broken, joblib will serialize models in compressed files
         in models directory.
+        :param container: "zip" or "dir" to save BN into bn_name.bamt container
+        (a zip archive or a directory) instead of json: a small manifest, parameters
+        with arrays of CPTs and mixtures in .npy files and models in separate files.
+        Containers are loaded faster, models are loaded on first use.
+        :param n_jobs: number of threads to serialize models.
 
         :return: saving status.
         """
-        distributions = deepcopy(self.distributions)
         new_weights = {str(key): self.weights[key] for key in self.weights}
+        if container:
+            writer = serialization_utils.ContainerWriter(
+                f"{bn_name}.bamt", kind=container
+            )
+            header = {
+                "type": self.type,
+                "info": self.descriptor,
+                "edges": self.edges,
+                "weights": new_weights,
+            }
+            return writer.write(header, self.distributions)
+
+        # serializer returns new dicts for serialized models, parameters aren't changed
+        distributions = dict(self.distributions)
 
         to_serialize = {}
         # separate logit and gaussian nodes from distributions to serialize bn's models
@@ -481,7 +604,7 @@ class BaseNetwork(object):
                 ]
 
         serializer = serialization_utils.ModelsSerializer(
-            bn_name=bn_name, models_dir=models_dir
+            bn_name=bn_name, models_dir=models_dir, n_jobs=n_jobs
         )
         serialized_dist = serializer.serialize(to_serialize)
 
@@ -496,17 +619,28 @@ class BaseNetwork(object):
         }
         return self._save_to_file(f"{bn_name}.json", outdict)
 
-    def load(self,
-             input_data: Union[str, Dict],
-             models_dir: str = "/"):
+    @profiling.profiled("load")
+    def load(
+        self,
+        input_data: Union[str, Dict],
+        models_dir: str = "/",
+        header_only: bool = False,
+    ):
         """
         Function to load the whole BN from json file.
-        :param input_data: input path to json file with bn.
+        :param input_data: input path to json file or container (see save) with bn.
         :param models_dir: directory with models.
+        :param header_only: set only nodes and edges without parameters
+        (parameters of containers are not read at all).
 
         :return: loading status.
         """
-        if isinstance(input_data, str):
+        container = None
+        reader = serialization_utils.ContainerReader
+        if isinstance(input_data, str) and reader.is_container(input_data):
+            container = reader(input_data)
+            input_dict = container.read_header()
+        elif isinstance(input_data, str):
             with open(input_data) as f:
                 input_dict = json.load(f)
         elif isinstance(input_data, dict):
@@ -517,6 +651,10 @@ class BaseNetwork(object):
 
         self.add_nodes(input_dict["info"])
         self.set_structure(edges=input_dict["edges"])
+        if header_only:
+            return True
+        if container is not None:
+            input_dict["parameters"] = container.read_parameters()
 
         # check compatibility with father network.
         if not self.use_mixture:
@@ -547,6 +685,12 @@ class BaseNetwork(object):
                 )
                 return
 
+        if container is not None:
+            # models of containers are not deserialized until they are used
+            self.set_parameters(parameters=input_dict["parameters"])
+            self._load_weights(input_dict)
+            return True
+
         deserializer = serialization_utils.Deserializer(models_dir)
 
         to_deserialize = {}
@@ -583,7 +727,10 @@ class BaseNetwork(object):
             distributions[serialized_node] = deserialized_parameters[serialized_node]
 
         self.set_parameters(parameters=distributions)
+        self._load_weights(input_dict)
+        return True
 
+    def _load_weights(self, input_dict: Dict[str, Any]):
         if input_dict.get("weights", False):
             str_keys = list(input_dict["weights"].keys())
             tuple_keys = [eval(key) for key in str_keys]
@@ -591,16 +738,25 @@ class BaseNetwork(object):
             for tuple_key in tuple_keys:
                 weights[tuple_key] = input_dict["weights"][str(tuple_key)]
             self.weights = weights
-        return True
 
-    def fit_parameters(self, data: pd.DataFrame, n_jobs: int = 1):
+    @profiling.profiled("fit_parameters")
+    def fit_parameters(
+        self,
+        data: pd.DataFrame,
+        n_jobs: int = 1,
+        sample_weight: Optional[np.ndarray] = None,
+    ):
         """
         Base function for parameter learning
+        sample_weight: weights of rows, e.g. counts of identical rows of data
+        compressed by bamt.preprocess.numpy_pandas.compress_rows
         """
         data = data.copy()
         if data.isnull().values.any():
             logger_network.error("Dataframe contains NaNs.")
             return
+        if sample_weight is not None:
+            sample_weight = np.asarray(sample_weight, dtype=float)
 
         if type(self).__name__ == "CompositeBN":
             data = self._encode_categorical_data(data)
@@ -614,8 +770,16 @@ class BaseNetwork(object):
             ]
             data[columns_names] = data.loc[:, columns_names].astype("str")
 
+        # counts of families of discrete nodes come from one bitmap index of data
+        count_index = CountIndex(data, sample_weight)
+
         def worker(node):
-            return node.fit_parameters(data)
+            kwargs = {} if sample_weight is None else {"sample_weight": sample_weight}
+            if node.type == "Discrete":
+                kwargs["count_index"] = count_index
+            # nodes are timed only when they are fitted in this process (n_jobs=1)
+            with profiling.stage("fit_node", node=node.name):
+                return node.fit_parameters(data, **kwargs)
 
         results = Parallel(n_jobs=n_jobs)(delayed(worker)(node) for node in self.nodes)
 
@@ -625,32 +789,352 @@ class BaseNetwork(object):
         for result, node in zip(results, self.nodes):
             self.distributions[node.name] = result
 
+    def profile(
+        self, allocations: bool = False, callbacks: Optional[List[Callable]] = None
+    ) -> profiling.Profiler:
+        """
+        Profiler of stages of the pipeline (preprocessing, structure and parameters
+        learning, sampling, prediction, ...) and of nodes, to use as a context manager:
+        with bn.profile() as profiler: ...; profiler.report().
+        See bamt.profiling.Profiler.
+        """
+        return profiling.Profiler(allocations=allocations, callbacks=callbacks)
+
     def get_info(self, as_df: bool = True) -> Optional[pd.DataFrame]:
         """Return a table with name, type, parents_type, parents_names"""
         return get_info_(self, as_df)
 
+    def compile(self, force: bool = False) -> Optional[InferencePlan]:
+        """
+        Freeze structure and parameters into an InferencePlan used by sample, predict
+        and log_prob. The plan is kept until nodes, edges or parameters are changed.
+        In-place edits of parameters (e.g. bn.distributions[name]["mean"] = 0) are
+        not detected, call compile(force=True) after them.
+
+        :param force: compile a new plan even if the kept one looks up to date
+        """
+        if not self.distributions:
+            logger_network.error(
+                "Parameter learning wasn't done. Call fit_parameters method"
+            )
+            return None
+        signature = (
+            tuple(map(id, self.nodes)),
+            tuple(map(tuple, self.edges)),
+            tuple(map(id, self.distributions.values())),
+            tuple(self.descriptor.get("signs", {}).items()),
+        )
+        if force or self._compiled is None or self._compiled[0] != signature:
+            # parameters are kept in the cache, so their ids are not reused
+            with profiling.stage("compile"):
+                self._compiled = (
+                    signature,
+                    InferencePlan(self),
+                    tuple(self.distributions.values()),
+                )
+        return self._compiled[1]
+
+    def _is_discrete(self, node_name: str) -> bool:
+        return self.descriptor["types"][node_name] in ["disc", "disc_num"]
+
+    @staticmethod
+    def _evidence_category(value) -> str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def _encode_evidence(
+        self, values, categories: List[str], n: int
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        Encode evidence of discrete node (scalar or array of n values) into codes.
+        Values unknown to the node extend the table of categories.
+        """
+        inverse, uniques = pd.factorize(np.asarray(values, dtype=object).reshape(-1))
+        table = list(categories)
+        index = {category: i for i, category in enumerate(table)}
+        mapping = np.empty(len(uniques) + 1, dtype=np.int64)
+        mapping[-1] = -1  # taken by gaps in evidence
+        for i, value in enumerate(uniques):
+            category = self._evidence_category(value)
+            if category not in index:
+                index[category] = len(table)
+                table.append(category)
+            mapping[i] = index[category]
+
+        codes = np.empty(n, dtype=codes_dtype(len(table)))
+        codes[:] = mapping[inverse] if inverse.shape[0] == n else mapping[inverse[0]]
+        return codes, table
+
+    def _allocate_columns(
+        self,
+        n: int,
+        evidence: Optional[Dict[str, Any]] = None,
+        nodes: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Union[np.ndarray, CodedColumn]]:
+        """
+        Preallocate typed buffers for a batch of n rows:
+        float64 for continuous nodes and compact integer codes with a table of categories
+        for discrete ones. Evidence (scalars or arrays of n values) is written at once.
+        :param nodes: allocate only buffers of these nodes (all nodes by default)
+        """
+        evidence = evidence or {}
+        plan = self.compile()
+        columns = {}
+        for name, is_discrete, categories in zip(
+            plan.names, plan.discrete, plan.categories
+        ):
+            if nodes is not None and name not in nodes:
+                continue
+            if is_discrete:
+                if name in evidence:
+                    codes, categories = self._encode_evidence(
+                        evidence[name], categories, n
+                    )
+                else:
+                    codes = np.full(n, -1, dtype=codes_dtype(len(categories)))
+                columns[name] = CodedColumn(codes, categories)
+            else:
+                buffer = np.full(n, np.nan)
+                if name in evidence:
+                    buffer[:] = evidence[name]
+                columns[name] = buffer
+        return columns
+
+    @staticmethod
+    def _slice_columns(
+        columns: Dict[str, Union[np.ndarray, CodedColumn]],
+        rows: Union[slice, np.ndarray],
+    ) -> Dict[str, Union[np.ndarray, CodedColumn]]:
+        """
+        Take rows from every column (views for slices, copies for masks).
+        """
+        return {
+            name: CodedColumn(column.codes[rows], column.categories)
+            if isinstance(column, CodedColumn)
+            else column[rows]
+            for name, column in columns.items()
+        }
+
+    def _fill_columns(
+        self,
+        columns: Dict[str, Union[np.ndarray, CodedColumn]],
+        skip: Sequence[str] = (),
+        predict: bool = False,
+        progress_bar: bool = False,
+        positive: Sequence[str] = (),
+    ):
+        """
+        Run nodes in topological order over a batch, every node writes into its buffer.
+        Only nodes which have buffers in the batch are run.
+        :param skip: nodes with known values (evidence)
+        :param predict: use point predictions of nodes instead of sampling
+        :param positive: continuous nodes to sample from distributions truncated to [0, inf)
+        """
+        plan = self.compile()
+        steps = [
+            (node, node_info)
+            for node, node_info in zip(plan.nodes, plan.params)
+            if node.name not in skip and node.name in columns
+        ]
+        if progress_bar:
+            steps = tqdm(steps, position=0, leave=True)
+        stage = "predict_node" if predict else "sample_node"
+        for node, node_info in steps:
+            column = columns[node.name]
+            out = column.codes if isinstance(column, CodedColumn) else column
+            with profiling.stage(stage, node=node.name):
+                if predict:
+                    node.predict_batch(node_info, columns, out)
+                elif node.name in positive:
+                    node.choose_batch(node_info, columns, out, positive=True)
+                else:
+                    node.choose_batch(node_info, columns, out)
+
+    def _fill_blocks(
+        self,
+        columns: Dict[str, Union[np.ndarray, CodedColumn]],
+        parall_count: int = 1,
+        **kwargs,
+    ):
+        """
+        Fill a batch with _fill_columns, in parall_count threads
+        (each one fills its own block of rows) if parall_count > 1.
+        """
+        n = self._batch_size(columns)
+        if parall_count > 1 and n > 1:
+            kwargs.pop("progress_bar", None)
+            bounds = np.linspace(0, n, min(parall_count, n) + 1).astype(int)
+            Parallel(n_jobs=parall_count, prefer="threads")(
+                delayed(profiling.propagate(self._fill_columns))(
+                    self._slice_columns(columns, slice(start, stop)), **kwargs
+                )
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            )
+        else:
+            self._fill_columns(columns, **kwargs)
+
+    @staticmethod
+    def _batch_size(columns: Dict[str, Union[np.ndarray, CodedColumn]]) -> int:
+        column = next(iter(columns.values()))
+        return (column.codes if isinstance(column, CodedColumn) else column).shape[0]
+
+    @staticmethod
+    def _compact_columns(
+        columns: Dict[str, Union[np.ndarray, CodedColumn]], valid: np.ndarray
+    ):
+        """
+        Move valid rows to the beginning of buffers in place.
+        """
+        accepted = int(valid.sum())
+        for column in columns.values():
+            buffer = column.codes if isinstance(column, CodedColumn) else column
+            buffer[:accepted] = buffer[valid]
+
+    @staticmethod
+    def _valid_rows(columns: Dict[str, Union[np.ndarray, CodedColumn]]) -> np.ndarray:
+        """
+        Mask of rows without gaps (nan or code -1) in any column.
+        """
+        valid = None
+        for column in columns.values():
+            if isinstance(column, CodedColumn):
+                mask = column.codes >= 0
+            else:
+                mask = ~np.isnan(column)
+            valid = mask if valid is None else valid & mask
+        return valid
+
+    def _relocate_joblib_models(self, models_dir: str):
+        """
+        Point joblib-serialized models of conditional nodes to models_dir.
+        """
+        for node in self.nodes:
+            node_data = self.distributions[node.name]
+            if "hybcprob" not in node_data.keys():
+                continue
+            for obj, obj_data in node_data["hybcprob"].items():
+                if "serialization" in obj_data.keys():
+                    if "gaussian" in node.type.lower():
+                        model_type = "regressor"
+                    else:
+                        model_type = "classifier"
+                    if (
+                        obj_data["serialization"] == "joblib"
+                        and obj_data[f"{model_type}_obj"]
+                    ):
+                        new_path = (
+                            models_dir
+                            + f"\\{node.name.replace(' ', '_')}\\{obj}.joblib.compressed"
+                        )
+                        node_data["hybcprob"][obj][f"{model_type}_obj"] = new_path
+
+    @staticmethod
+    def _columns_to_output(
+        columns: Dict[str, Union[np.ndarray, CodedColumn]],
+        as_df: Union[bool, str],
+    ) -> Union[pd.DataFrame, Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Wrap buffers without copying: dict of arrays (pd.Categorical for discrete nodes)
+        or a DataFrame backed by them. as_df=False keeps the old list of rows.
+        """
+        arrays = {
+            name: pd.Categorical.from_codes(column.codes, categories=column.categories)
+            if isinstance(column, CodedColumn)
+            else column
+            for name, column in columns.items()
+        }
+        if as_df == "columns":
+            return arrays
+        sample_output = pd.DataFrame(arrays, copy=False)
+        if as_df:
+            return sample_output
+        return sample_output.to_dict("records")
+
+    def _sample_columns(
+        self,
+        n: int,
+        evidence: Dict[str, Any],
+        predict: bool = False,
+        parall_count: int = 1,
+        progress_bar: bool = False,
+        filter_neg: bool = True,
+    ) -> Dict[str, Union[np.ndarray, CodedColumn]]:
+        """
+        Fill buffers of n rows with evidence and sampled (or predicted) values of other nodes.
+        Rows which can't be sampled are replaced by new ones until there are n rows.
+        """
+        positive = []
+        if filter_neg:
+            plan = self.compile()
+            positive = [name for name, pos in zip(plan.names, plan.positive) if pos]
+
+        columns = self._allocate_columns(n, evidence)
+        filled = 0
+        # a few rows can be rejected by chance, evidence is impossible
+        # if several rounds in a row give nothing
+        empty_rounds = 0
+        while filled < n and empty_rounds < 10:
+            # rows which are left to sample (views on the tail of buffers)
+            rest = self._slice_columns(columns, slice(filled, n))
+            self._fill_blocks(
+                rest,
+                skip=evidence.keys(),
+                predict=predict,
+                parall_count=parall_count,
+                progress_bar=progress_bar and not predict and not filled,
+                positive=positive,
+            )
+            valid = self._valid_rows(rest)
+            for name in positive:
+                valid &= rest[name] >= 0
+            accepted = int(valid.sum())
+            if accepted < valid.shape[0]:
+                self._compact_columns(rest, valid)
+            filled += accepted
+            if predict:
+                break
+            empty_rounds = 0 if accepted else empty_rounds + 1
+
+        if filled < n:
+            if not predict:
+                logger_network.warning(
+                    f"Only {filled} of {n} rows were sampled. "
+                    f"The rest can't be sampled with given evidence."
+                )
+            columns = self._slice_columns(columns, slice(0, filled))
+        return columns
+
+    @profiling.profiled("sample")
     def sample(
         self,
         n: int,
         models_dir: Optional[str] = None,
         progress_bar: bool = True,
         evidence: Optional[Dict[str, Union[str, int, float]]] = None,
-        as_df: bool = True,
+        as_df: Union[bool, str] = True,
         predict: bool = False,
         parall_count: int = 1,
         filter_neg: bool = True,
         seed: Optional[int] = None,
-    ) -> Union[None, pd.DataFrame, List[Dict[str, Union[str, int, float]]]]:
+    ) -> Union[
+        None, pd.DataFrame, Dict[str, Any], List[Dict[str, Union[str, int, float]]]
+    ]:
         """
-        Sampling from Bayesian Network
+        Sampling from Bayesian Network.
+        Nodes are sampled column by column into preallocated typed buffers
+        (float64 for continuous nodes, integer codes for discrete ones).
         n: int number of samples
         evidence: values for nodes from user
-        parall_count: number of threads. Defaults to 1.
-        filter_neg: either filter negative vals or not.
+        as_df: True - DataFrame backed by sampled buffers (discrete columns are categorical),
+        "columns" - dict of arrays, False - list of rows (dicts)
+        parall_count: number of threads, each one fills its own block of rows. Defaults to 1.
+        filter_neg: sample positive continuous nodes from truncated distributions,
+        rows which still can't be sampled are replaced by new ones until there are n rows.
         seed: seed value to use for random number generator
         """
-        from joblib import Parallel, delayed
-
         random.seed(seed)
         np.random.seed(seed)
 
@@ -659,110 +1143,357 @@ class BaseNetwork(object):
                 "Parameter learning wasn't done. Call fit_parameters method"
             )
             return None
-        if evidence:
-            for node in self.nodes:
-                if (node.type == "Discrete") & (node.name in evidence.keys()):
-                    if not (isinstance(evidence[node.name], str)):
-                        evidence[node.name] = str(int(evidence[node.name]))
-
-        def wrapper():
-            output = {}
-            for node in self.nodes:
-                parents = node.cont_parents + node.disc_parents
-                if evidence and node.name in evidence.keys():
-                    output[node.name] = evidence[node.name]
-                else:
-                    if not parents:
-                        pvals = None
-                    else:
-                        if self.type == "Discrete":
-                            pvals = [str(output[t]) for t in parents]
-                        else:
-                            pvals = [output[t] for t in parents]
+        if models_dir:
+            self._relocate_joblib_models(models_dir)
 
-                        # If any nan from parents, sampling from node blocked.
-                        if any(pd.isnull(pvalue) for pvalue in pvals):
-                            output[node.name] = np.nan
-                            continue
-                    node_data = self.distributions[node.name]
-                    if models_dir and ("hybcprob" in node_data.keys()):
-                        for obj, obj_data in node_data["hybcprob"].items():
-                            if "serialization" in obj_data.keys():
-                                if "gaussian" in node.type.lower():
-                                    model_type = "regressor"
-                                else:
-                                    model_type = "classifier"
-                                if (
-                                    obj_data["serialization"] == "joblib"
-                                    and obj_data[f"{model_type}_obj"]
-                                ):
-                                    new_path = (
-                                        models_dir
-                                        + f"\\{node.name.replace(' ', '_')}\\{obj}.joblib.compressed"
-                                    )
-                                    node_data["hybcprob"][obj][
-                                        f"{model_type}_obj"
-                                    ] = new_path
-                    if predict:
-                        output[node.name] = node.predict(node_data, pvals=pvals)
-                    else:
-                        output[node.name] = node.choose(node_data, pvals=pvals)
-            return output
-
-        if predict:
-            seq = []
-            for _ in tqdm(range(n), position=0, leave=True):
-                result = wrapper()
-                seq.append(result)
-        elif progress_bar:
-            seq = Parallel(n_jobs=parall_count)(
-                delayed(wrapper)() for _ in tqdm(range(n), position=0, leave=True)
+        evidence = evidence or {}
+        columns = self._sample_columns(
+            n, evidence, predict, parall_count, progress_bar, filter_neg
+        )
+
+        if as_df is True and type(self).__name__ == "CompositeBN":
+            return self._decode_categorical_data(self._columns_to_output(columns, True))
+        return self._columns_to_output(columns, as_df)
+
+    def weighted_sample(
+        self,
+        n: int,
+        evidence: Dict[str, Union[str, int, float]],
+        models_dir: Optional[str] = None,
+        progress_bar: bool = True,
+        as_df: Union[bool, str] = True,
+        parall_count: int = 1,
+        filter_neg: bool = True,
+        seed: Optional[int] = None,
+    ) -> Optional[
+        Tuple[
+            Union[pd.DataFrame, Dict[str, Any], List[Dict[str, Any]]], np.ndarray, float
+        ]
+    ]:
+        """
+        Likelihood weighting sampling from Bayesian Network.
+        Evidence nodes are clamped, other nodes are sampled as in sample(),
+        and every row is weighted by likelihood of evidence given sampled parents.
+        Unlike sample(), weighted rows are conditioned on evidence for all nodes,
+        including ancestors of evidence nodes.
+        n: int number of samples
+        evidence: values for nodes from user
+        as_df, parall_count, filter_neg, seed: the same as in sample()
+
+        :return: samples, weights (normalized to sum 1) and effective sample size
+        """
+        random.seed(seed)
+        np.random.seed(seed)
+
+        if not self.distributions.items():
+            logger_network.error(
+                "Parameter learning wasn't done. Call fit_parameters method"
             )
+            return None
+        if models_dir:
+            self._relocate_joblib_models(models_dir)
+
+        columns = self._sample_columns(
+            n, evidence, False, parall_count, progress_bar, filter_neg
+        )
+
+        plan = self.compile()
+        log_weights = np.zeros(self._batch_size(columns))
+        for node, node_info in zip(plan.nodes, plan.params):
+            if node.name in evidence:
+                log_weights += node.log_prob_batch(node_info, columns)
+        log_weights[np.isnan(log_weights)] = -np.inf
+
+        if not np.isfinite(log_weights).any():
+            logger_network.error("Evidence has zero likelihood in all samples.")
+            weights = np.zeros(log_weights.shape[0])
+            ess = 0.0
         else:
-            seq = Parallel(n_jobs=parall_count)(delayed(wrapper)() for _ in range(n))
-
-        # code for debugging, don't remove
-        # seq = []
-        # for _ in tqdm(range(n), position=0, leave=True):
-        #     result = wrapper()
-        #     seq.append(result)
-
-        seq_df = pd.DataFrame.from_dict(seq, orient="columns")
-        seq_df.dropna(inplace=True)
-        cont_nodes = [
-            c.name
-            for c in self.nodes
-            if type(c).__name__
-            not in (
-                "DiscreteNode",
-                "LogitNode",
-                "CompositeDiscreteNode",
-                "ConditionalLogitNode",
+            weights = np.exp(log_weights - log_weights.max())
+            weights /= weights.sum()
+            ess = float(1 / np.sum(weights**2))
+
+        if as_df is True and type(self).__name__ == "CompositeBN":
+            samples = self._decode_categorical_data(
+                self._columns_to_output(columns, True)
             )
-        ]
-        positive_columns = [
-            c for c in cont_nodes if self.descriptor["signs"][c] == "pos"
-        ]
-        if filter_neg:
-            seq_df = seq_df[(seq_df[positive_columns] >= 0).all(axis=1)]
-            seq_df.reset_index(inplace=True, drop=True)
+        else:
+            samples = self._columns_to_output(columns, as_df)
+        return samples, weights, ess
 
-        seq = seq_df.to_dict("records")
-        sample_output = pd.DataFrame.from_dict(seq, orient="columns")
+    def gibbs_sample(
+        self,
+        n_chains: int,
+        evidence: Optional[Dict[str, Union[str, int, float]]] = None,
+        n_iter: int = 500,
+        burn_in: int = 100,
+        thin: int = 1,
+        models_dir: Optional[str] = None,
+        progress_bar: bool = True,
+        as_df: Union[bool, str] = True,
+        filter_neg: bool = True,
+        seed: Optional[int] = None,
+    ) -> Optional[
+        Tuple[
+            Union[pd.DataFrame, Dict[str, Any], List[Dict[str, Any]]],
+            Dict[str, Dict[str, float]],
+        ]
+    ]:
+        """
+        Gibbs sampling from Bayesian Network conditioned on evidence.
+        n_chains chains run in parallel (as rows of arrays), every sweep updates
+        all nodes without evidence given their Markov blankets.
+        n_iter: number of sweeps after burn-in
+        burn_in: number of sweeps to drop
+        thin: keep every thin-th sweep
+        as_df, filter_neg, seed: the same as in sample()
+
+        :return: kept draws of all chains and diagnostics
+        (Gelman-Rubin r_hat of continuous nodes and acceptance rate of Metropolis steps)
+        """
+        random.seed(seed)
+        np.random.seed(seed)
 
-        if as_df:
-            if type(self).__name__ == "CompositeBN":
-                sample_output = self._decode_categorical_data(sample_output)
-            return sample_output
+        if not self.distributions.items():
+            logger_network.error(
+                "Parameter learning wasn't done. Call fit_parameters method"
+            )
+            return None
+        if models_dir:
+            self._relocate_joblib_models(models_dir)
+
+        draws, diagnostics = GibbsSampler(self).run(
+            evidence or {},
+            n_chains,
+            n_iter=n_iter,
+            burn_in=burn_in,
+            thin=thin,
+            filter_neg=filter_neg,
+            progress_bar=progress_bar,
+        )
+        # draws of all chains one after another, chains which failed are dropped
+        columns = {
+            name: CodedColumn(draw.codes.reshape(-1), draw.categories)
+            if isinstance(draw, CodedColumn)
+            else draw.reshape(-1)
+            for name, draw in draws.items()
+        }
+        columns = self._slice_columns(columns, self._valid_rows(columns))
+        if as_df is True and type(self).__name__ == "CompositeBN":
+            samples = self._decode_categorical_data(
+                self._columns_to_output(columns, True)
+            )
         else:
-            return seq
+            samples = self._columns_to_output(columns, as_df)
+        return samples, diagnostics
+
+    def _data_to_columns(
+        self, data: pd.DataFrame
+    ) -> Dict[str, Union[np.ndarray, CodedColumn]]:
+        """
+        Put columns of data into batch buffers (values unknown to discrete nodes
+        extend tables of categories, NaNs become gaps).
+        """
+        return self._allocate_columns(data.shape[0], self._data_to_evidence(data))
+
+    def _data_to_evidence(self, data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Take arrays of values of nodes from data
+        (labels of categorical columns are encoded back for CompositeBN).
+        """
+        evidence = {}
+        for name in self.nodes_names:
+            if name not in data.columns:
+                continue
+            values = data[name].values
+            if name in self.encoders:
+                classes = self.encoders[name].classes_
+                mapping = {c: i for i, c in enumerate(classes)}
+                values = pd.Series(values).map(mapping).values
+            evidence[name] = values
+        return evidence
+
+    def log_prob(
+        self,
+        data: pd.DataFrame,
+        per_node: bool = False,
+        batch_size: Optional[int] = None,
+    ) -> Optional[Union[np.ndarray, pd.DataFrame]]:
+        """
+        Log-likelihood of every row of data under the network
+        (sum of log-probabilities and log-densities of nodes given their parents),
+        e.g. to score rows for anomalies.
+        Rows with gaps get nan, values unknown to discrete nodes give -inf.
+
+        :param data: data with columns for all nodes
+        :param per_node: return contributions of nodes (a column for every node)
+        :param batch_size: number of rows computed at once (all rows by default)
+
+        :return: array of log-likelihoods or DataFrame of contributions of nodes
+        """
+        if not self.distributions:
+            logger_network.error(
+                "Parameter learning wasn't done. Call fit_parameters method"
+            )
+            return None
+        missing = [name for name in self.nodes_names if name not in data.columns]
+        if missing:
+            logger_network.error(f"Data doesn't contain columns of nodes: {missing}")
+            return None
+
+        plan = self.compile()
+        n = data.shape[0]
+        batch_size = batch_size or max(n, 1)
+        contributions = np.empty((n, len(plan)))
+        for start in range(0, n, batch_size):
+            columns = self._data_to_columns(data.iloc[start : start + batch_size])
+            for i, (node, node_info) in enumerate(zip(plan.nodes, plan.params)):
+                contributions[start : start + batch_size, i] = node.log_prob_batch(
+                    node_info, columns
+                )
+
+        if per_node:
+            return pd.DataFrame(
+                contributions, index=data.index, columns=list(plan.names)
+            )
+        log_likelihood = contributions.sum(axis=1)
+        # impossible values make rows impossible even if other nodes can't be evaluated
+        log_likelihood[(contributions == -np.inf).any(axis=1)] = -np.inf
+        return log_likelihood
+
+    def iter_log_prob(
+        self,
+        data: Union[str, Iterable[pd.DataFrame]],
+        chunksize: int = 100000,
+        per_node: bool = False,
+    ) -> Iterator[Union[np.ndarray, pd.DataFrame]]:
+        """
+        Streaming version of log_prob for data which doesn't fit into memory.
+
+        :param data: path to csv file (read by chunks of chunksize rows)
+        or iterable of DataFrames
+        :param per_node: yield contributions of nodes
 
+        :return: generator of log_prob results for every chunk
+        """
+        if isinstance(data, str):
+            data = pd.read_csv(data, chunksize=chunksize)
+        for chunk in data:
+            yield self.log_prob(chunk, per_node=per_node)
+
+    def _query_plan(
+        self, targets: Sequence[str], evidence: Sequence[str], forward: bool = False
+    ) -> List[str]:
+        """
+        Nodes needed for a query (see GraphAnalyzer.requisite_nodes),
+        cached for every compiled plan and signature of a query.
+        """
+        plan = self.compile()
+        if self._query_plans.get("plan") is not plan:
+            self._query_plans = {"plan": plan}
+        key = (frozenset(targets), frozenset(evidence), forward)
+        if key not in self._query_plans:
+            self._query_plans[key] = GraphUtils.GraphAnalyzer(self).requisite_nodes(
+                targets, evidence, forward
+            )
+        return self._query_plans[key]
+
+    def _predict_forward(
+        self,
+        test: pd.DataFrame,
+        columns: List[str],
+        parall_count: int = 1,
+        progress_bar: bool = False,
+    ) -> Dict[str, Union[List[str], List[int], List[float]]]:
+        """
+        Predict columns for all rows of test data at once: evidence is written
+        into batch buffers and ancestors of columns are predicted from their parents
+        in topological order (other nodes don't affect the result and are skipped).
+        Rows which can't be predicted (e.g. unknown categories or negative values
+        of positive nodes) get nan in all columns.
+        """
+        evidence = self._data_to_evidence(test)
+        plan = self._query_plan(columns, evidence.keys(), forward=True)
+        evidence = {name: evidence[name] for name in plan if name in evidence}
+        batch = self._allocate_columns(test.shape[0], evidence, plan)
+        self._fill_blocks(
+            batch,
+            skip=evidence.keys(),
+            predict=True,
+            parall_count=parall_count,
+            progress_bar=progress_bar,
+        )
+        valid = self._valid_rows(batch)
+        compiled = self.compile()
+        for name in plan:
+            if compiled.positive[compiled.index[name]]:
+                valid &= batch[name] >= 0
+
+        preds = {}
+        for name in columns:
+            column = batch[name]
+            if isinstance(column, CodedColumn):
+                categories = column.categories
+                if name in self.encoders:
+                    classes = self.encoders[name].classes_
+                    categories = [classes[int(float(c))] for c in categories]
+                table = np.array(list(categories) + [np.nan], dtype=object)
+                values = table[np.where(valid, column.codes, -1)]
+            else:
+                values = np.where(valid, column, np.nan)
+            preds[name] = list(values)
+        return preds
+
+    def _predict_gibbs(
+        self,
+        test: pd.DataFrame,
+        columns: List[str],
+        progress_bar: bool = False,
+        **gibbs_params,
+    ) -> Dict[str, Union[List[str], List[int], List[float]]]:
+        """
+        Predict columns with Gibbs sampler, every row of test data is a chain.
+        Predictions are posterior means for continuous nodes and modes for discrete ones.
+        """
+        evidence = self._data_to_evidence(test)
+        # nodes which are barren or d-separated from columns are not sampled
+        plan = self._query_plan(columns, evidence.keys())
+        evidence = {name: evidence[name] for name in plan if name in evidence}
+        draws, _ = GibbsSampler(self, plan).run(
+            evidence, test.shape[0], progress_bar=progress_bar, **gibbs_params
+        )
+
+        preds = {}
+        for name in columns:
+            draw = draws[name]
+            if isinstance(draw, CodedColumn):
+                counts = np.zeros((test.shape[0], len(draw.categories) + 1))
+                chains = np.broadcast_to(np.arange(test.shape[0]), draw.codes.shape)
+                # gaps (code -1) are counted in the last column
+                np.add.at(counts, (chains, draw.codes), 1)
+                mode = counts[:, :-1].argmax(axis=1)
+                categories = draw.categories
+                if name in self.encoders:
+                    classes = self.encoders[name].classes_
+                    categories = [classes[int(float(c))] for c in categories]
+                preds[name] = [
+                    categories[code] if counts[i, code] else np.nan
+                    for i, code in enumerate(mode)
+                ]
+            else:
+                with np.errstate(invalid="ignore"):
+                    preds[name] = list(np.nanmean(draw, axis=0))
+        return preds
+
+    @profiling.profiled("predict")
     def predict(
         self,
         test: pd.DataFrame,
         parall_count: int = 1,
         progress_bar: bool = True,
         models_dir: Optional[str] = None,
+        method: str = "forward",
+        gibbs_params: Optional[Dict[str, int]] = None,
     ) -> Dict[str, Union[List[str], List[int], List[float]]]:
         """
         Function to predict columns from given data.
@@ -771,78 +1502,39 @@ class BaseNetwork(object):
 
         Args:
             test (pd.DataFrame): test dataset
-            parall_count (int, optional):number of threads. Defaults to 1.
+            parall_count (int, optional): number of threads, each one predicts
+            its own block of rows. Defaults to 1.
             progress_bar: verbose mode.
+            method: "forward" - nodes are predicted from their parents in topological order,
+            "gibbs" - posterior means (modes for discrete nodes) estimated by Gibbs sampler,
+            so evidence on descendants is taken into account too.
+            gibbs_params: n_iter, burn_in, thin for Gibbs sampler.
 
         Returns:
             predicted data (dict): dict with column as key and predicted data as value
         """
-        if test.isnull().any().any():
+        if test.isnull().values.any():
             logger_network.error("Test data contains NaN values.")
             return {}
 
-        from joblib import Parallel, delayed
-
-        def wrapper(bn, test: pd.DataFrame, columns: List[str], models_dir: str):
-            preds = {column_name: list() for column_name in columns}
-
-            if len(test) == 1:
-                for i in range(test.shape[0]):
-                    test_row = dict(test.iloc[i, :])
-                    for n, key in enumerate(columns):
-                        try:
-                            sample = bn.sample(
-                                1,
-                                evidence=test_row,
-                                predict=True,
-                                progress_bar=False,
-                                models_dir=models_dir,
-                            )
-                            if sample.empty:
-                                preds[key].append(np.nan)
-                                continue
-                            if bn.descriptor["types"][key] == "cont":
-                                if (bn.descriptor["signs"][key] == "pos") & (
-                                    sample.loc[0, key] < 0
-                                ):
-                                    # preds[key].append(np.nan)
-                                    preds[key].append(0)
-                                else:
-                                    preds[key].append(sample.loc[0, key])
-                            else:
-                                preds[key].append(sample.loc[0, key])
-                        except Exception as ex:
-                            logger_network.error(ex)
-                            preds[key].append(np.nan)
-                return preds
-            else:
-                logger_network.error("Wrapper for one row from pandas.DataFrame")
+        if method == "gibbs":
+            if models_dir:
+                self._relocate_joblib_models(models_dir)
+            columns = [name for name in self.nodes_names if name not in test.columns]
+            if not columns:
+                logger_network.error("Test data is the same as train.")
                 return {}
+            return self._predict_gibbs(
+                test, columns, progress_bar=progress_bar, **(gibbs_params or {})
+            )
 
-        columns = list(set(self.nodes_names) - set(test.columns.to_list()))
+        columns = [name for name in self.nodes_names if name not in test.columns]
         if not columns:
             logger_network.error("Test data is the same as train.")
             return {}
-
-        preds = {column_name: list() for column_name in columns}
-
-        if progress_bar:
-            processed_list = Parallel(n_jobs=parall_count)(
-                delayed(wrapper)(self, test.loc[[i]], columns, models_dir)
-                for i in tqdm(test.index, position=0, leave=True)
-            )
-        else:
-            processed_list = Parallel(n_jobs=parall_count)(
-                delayed(wrapper)(self, test.loc[[i]], columns, models_dir)
-                for i in test.index
-            )
-
-        for i in range(test.shape[0]):
-            curr_pred = processed_list[i]
-            for n, key in enumerate(columns):
-                preds[key].append(curr_pred[key][0])
-
-        return preds
+        if models_dir:
+            self._relocate_joblib_models(models_dir)
+        return self._predict_forward(test, columns, parall_count, progress_bar)
 
     def set_classifiers(self, classifiers: Dict[str, object]):
         """
@@ -879,6 +1571,19 @@ class BaseNetwork(object):
                 else:
                     continue
 
+    def set_cpt_storage(self, dtype: str = "float64", mmap_dir: Optional[str] = None):
+        """
+        Store CPTs of discrete nodes with parents as SparseCPT: arrays of
+        probabilities for observed combinations of parents values and a default
+        (uniform) row for the rest, instead of dicts of lists for every combination.
+        Call it before fit_parameters.
+        dtype: type of probabilities (e.g. float32)
+        mmap_dir: directory to keep tables in memory-mapped files
+        """
+        for node in self.nodes:
+            if node.type == "Discrete":
+                node.cpt_storage = {"dtype": dtype, "mmap_dir": mmap_dir}
+
     def plot(self, output: str):
         """
         Visualize a Bayesian Network. Result will be saved
@@ -931,41 +1636,52 @@ class BaseNetwork(object):
 
     def fill_gaps(self, df: pd.DataFrame, **kwargs):
         """
-        Fill NaNs with sampled values.
+        Fill NaNs with predicted values.
+        Rows are grouped by pattern of gaps, rows of a group are predicted at once
+        with their known values as evidence. The input DataFrame is not modified.
 
         :param df: dataframe with NaNs
-        :param kwargs: the same params as bn.predict
+        :param kwargs: the same params as bn.predict (e.g. method="gibbs")
 
         :return df, failed: filled DataFrame and list of failed rows (sometimes predict can return np.nan)
         """
         if not self.distributions:
             logger_network.error("To call this method you must train parameters.")
+            return None
+        kwargs.setdefault("progress_bar", False)
+
+        df = df.copy()
+        gaps = df.isna().values
+        rows = np.flatnonzero(gaps.any(axis=1))
+        if not rows.shape[0]:
+            return df, []
+        patterns, groups = np.unique(gaps[rows], axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+
+        failed_rows = [np.empty(0, dtype=int)]
+        for group, pattern in enumerate(patterns):
+            group_rows = rows[groups == group]
+            evidence = df.iloc[group_rows, np.flatnonzero(~pattern)]
+            result = self.predict(evidence, **kwargs)
+            if not result:
+                continue
 
-        # create a mimic row to get a dataframe from iloc method
-        list = [np.nan for _ in range(df.shape[1])]
-        df.loc["mimic"] = list
-
-        def fill_row(df, i):
-            row = df.iloc[[i, -1], :].drop(["mimic"], axis=0)
-
-            evidences = row.dropna(axis=1)
-
-            return row.index[0], self.predict(evidences, progress_bar=False, **kwargs)
+            failed = np.zeros(group_rows.shape[0], dtype=bool)
+            for values in result.values():
+                failed |= pd.isna(np.asarray(values, dtype=object)).astype(bool)
+            failed_rows.append(group_rows[failed])
 
-        failed = []
-        for index in range(df.shape[0] - 1):
-            if df.iloc[index].isna().any():
-                true_pos, result = fill_row(df, index)
-                if any(pd.isna(v[0]) for v in result.values()):
-                    failed.append(true_pos)
+            for i in np.flatnonzero(pattern):
+                column = df.columns[i]
+                if column not in result:
                     continue
-                else:
-                    for column, value in result.items():
-                        df.loc[true_pos, column] = value[0]
-            else:
-                continue
-        df.drop(failed, inplace=True)
-        return df.drop(["mimic"]), failed
+                values = np.asarray(result[column], dtype=object)[~failed]
+                if pd.api.types.is_numeric_dtype(df[column].dtype):
+                    values = pd.to_numeric(values)
+                df.iloc[group_rows[~failed], i] = values
+
+        failed = list(df.index[np.sort(np.concatenate(failed_rows))])
+        return df.drop(failed), failed
 
     def get_dist(self, node_name: str, pvals: Optional[dict] = None):
         """
@@ -996,7 +1712,9 @@ class BaseNetwork(object):
 
     def _decode_categorical_data(self, data):
         data = data.apply(
-            lambda col: pd.to_numeric(col).astype(int) if col.dtype == "object" else col
+            lambda col: pd.to_numeric(col.astype("object")).astype(int)
+            if col.dtype == "object" or isinstance(col.dtype, pd.CategoricalDtype)
+            else col
         )
         for column, encoder in self.encoders.items():
             data[column] = encoder.inverse_transform(data[column])
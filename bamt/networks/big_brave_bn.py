@@ -1,10 +1,9 @@
-import math
-
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mutual_info_score
 from sklearn.preprocessing import OrdinalEncoder
 
+from bamt.utils.MathUtils import mutual_information_matrix
+
 
 class BigBraveBN:
     def __init__(self):
@@ -16,6 +15,7 @@ class BigBraveBN:
         n_nearest: int = 5,
         threshold: float = 0.3,
         proximity_metric: str = "MI",
+        n_jobs: int = 1,
     ) -> list:
         """Returns list of possible edges for structure learning and sets it into attribute
 
@@ -24,12 +24,15 @@ class BigBraveBN:
             n_nearest (int): Number of nearest neighbors to consider. Default is 5.
             threshold (float): Threshold for selecting edges. Default is 0.3.
             proximity_metric (str): Metric used to calculate proximity. Default is "MI".
+            n_jobs (int): Number of threads computing mutual information. Default is 1.
 
         Returns:
             None: Modifies the object's possible_edges attribute.
         """
         df_copy = df.copy(deep=True)
-        proximity_matrix = self._get_proximity_matrix(df_copy, proximity_metric)
+        proximity_matrix = self._get_proximity_matrix(
+            df_copy, proximity_metric, n_jobs
+        )
         brave_matrix = self._get_brave_matrix(df_copy.columns, proximity_matrix, n_nearest)
 
         threshold_value = brave_matrix.max(numeric_only=True).max() * threshold
@@ -39,67 +42,64 @@ class BigBraveBN:
 
     @staticmethod
     def _get_n_nearest(
-        data: pd.DataFrame, columns: list, corr: bool = False, number_close: int = 5
-    ) -> list:
-        """Returns N nearest neighbors for every column of dataframe."""
-        groups = []
-        for c in columns:
-            close_ind = data[c].sort_values(ascending=not corr).index.tolist()
-            groups.append(close_ind[: number_close + 1])
+        proximity_matrix: pd.DataFrame, number_close: int = 5
+    ) -> np.ndarray:
+        """
+        Returns membership matrix of groups of N nearest neighbors for every column
+        (groups x columns, a column is the most proximal to itself).
+        """
+        values = proximity_matrix.to_numpy(dtype=float)
+        nearest = np.argsort(-values, axis=0, kind="stable")[: number_close + 1]
+        groups = np.zeros(values.shape, dtype=bool)
+        groups[np.arange(values.shape[1])[None, :], nearest] = True
         return groups
 
     @staticmethod
-    def _get_proximity_matrix(df: pd.DataFrame, proximity_metric: str) -> pd.DataFrame:
+    def _get_proximity_matrix(
+        df: pd.DataFrame, proximity_metric: str, n_jobs: int = 1
+    ) -> pd.DataFrame:
         """Returns matrix of proximity for the dataframe."""
-        encoder = OrdinalEncoder()
-        df_coded = df.copy()
-        columns_to_encode = list(df_coded.select_dtypes(include=["category", "object"]))
-        df_coded[columns_to_encode] = encoder.fit_transform(df_coded[columns_to_encode])
-
         if proximity_metric == "MI":
-            df_distance = pd.DataFrame(
-                np.zeros((len(df.columns), len(df.columns))),
+            codes = np.column_stack(
+                [
+                    pd.factorize(df[column], use_na_sentinel=False)[0]
+                    for column in df.columns
+                ]
+            )
+            return pd.DataFrame(
+                mutual_information_matrix(codes, codes.max(axis=0) + 1, n_jobs),
                 columns=df.columns,
                 index=df.columns,
             )
-            for c1 in df.columns:
-                for c2 in df.columns:
-                    dist = mutual_info_score(df_coded[c1].values, df_coded[c2].values)
-                    df_distance.loc[c1, c2] = dist
-            return df_distance
 
         elif proximity_metric == "pearson":
+            encoder = OrdinalEncoder()
+            df_coded = df.copy()
+            columns_to_encode = list(
+                df_coded.select_dtypes(include=["category", "object"])
+            )
+            df_coded[columns_to_encode] = encoder.fit_transform(
+                df_coded[columns_to_encode]
+            )
             return df_coded.corr(method="pearson")
 
     def _get_brave_matrix(
         self, df_columns: pd.Index, proximity_matrix: pd.DataFrame, n_nearest: int = 5
     ) -> pd.DataFrame:
         """Returns matrix of Brave coefficients for the DataFrame."""
-        brave_matrix = pd.DataFrame(
-            np.zeros((len(df_columns), len(df_columns))),
-            columns=df_columns,
-            index=df_columns,
-        )
-        groups = self._get_n_nearest(
-            proximity_matrix, df_columns.tolist(), corr=True, number_close=n_nearest
-        )
-
-        for c1 in df_columns:
-            for c2 in df_columns:
-                a = b = c = d = 0.0
-                if c1 != c2:
-                    for g in groups:
-                        a += (c1 in g) & (c2 in g)
-                        b += (c1 in g) & (c2 not in g)
-                        c += (c1 not in g) & (c2 in g)
-                        d += (c1 not in g) & (c2 not in g)
+        groups = self._get_n_nearest(proximity_matrix, number_close=n_nearest)
+        n_groups = groups.shape[0]
+        members = groups.astype(float)
 
-                    divisor = (math.sqrt((a + c) * (b + d))) * (
-                        math.sqrt((a + b) * (c + d))
-                    )
-                    br = (a * len(groups) + (a + c) * (a + b)) / (
-                        divisor if divisor != 0 else 0.0000000001
-                    )
-                    brave_matrix.loc[c1, c2] = br
+        # numbers of groups with both columns, only the first, only the second, none
+        a = members.T @ members
+        sizes = members.sum(axis=0)
+        b = sizes[:, None] - a
+        c = sizes[None, :] - a
+        d = n_groups - a - b - c
 
-        return brave_matrix
+        divisor = np.sqrt((a + c) * (b + d)) * np.sqrt((a + b) * (c + d))
+        divisor[divisor == 0] = 0.0000000001
+        brave = (a * n_groups + (a + c) * (a + b)) / divisor
+        np.fill_diagonal(brave, 0)
+        return pd.DataFrame(brave, columns=df_columns, index=df_columns)
@@ -3,10 +3,8 @@ from typing import Optional, Dict
 
 import pandas as pd
 
-from bamt.builders.composite_builder import CompositeStructureBuilder, CompositeDefiner
 from bamt.log import logger_network
 from bamt.networks.base import BaseNetwork
-from bamt.utils.composite_utils.MLUtils import MlModels
 
 
 class CompositeBN(BaseNetwork):
@@ -25,6 +23,8 @@ class CompositeBN(BaseNetwork):
         Function for initializing nodes in Bayesian Network
         descriptor: dict with types and signs of nodes
         """
+        from bamt.builders.composite_builder import CompositeDefiner
+
         self.descriptor = descriptor
 
         worker_1 = CompositeDefiner(descriptor=descriptor, regressor=None)
@@ -38,6 +38,8 @@ class CompositeBN(BaseNetwork):
         regressor: Optional[object] = None,
         **kwargs,
     ):
+        from bamt.builders.composite_builder import CompositeStructureBuilder
+
         worker = CompositeStructureBuilder(
             data=data, descriptor=self.descriptor, regressor=regressor
         )
@@ -57,6 +59,8 @@ class CompositeBN(BaseNetwork):
         self.set_models(self.parent_models)
 
     def set_models(self, parent_models):
+        from bamt.utils.composite_utils.MLUtils import MlModels
+
         ml_models = MlModels()
         ml_models_dict = ml_models.dict_models
         for node in self.nodes:
@@ -1,3 +1,10 @@
+from typing import Dict, List, Optional, Tuple, Union, Any
+
+import numpy as np
+import pandas as pd
+
+from bamt.log import logger_network
+from bamt.utils.GaussianUtils import LinearGaussian
 from .base import BaseNetwork
 
 
@@ -13,3 +20,86 @@ class ContinuousBN(BaseNetwork):
         self.has_logit = None
         self.use_mixture = use_mixture
         self.scoring_function = ""
+        self._joint_gaussian = None
+
+    def fit_parameters(
+        self,
+        data: pd.DataFrame,
+        n_jobs: int = 1,
+        sample_weight: Optional[np.ndarray] = None,
+    ):
+        self._joint_gaussian = None
+        return super(ContinuousBN, self).fit_parameters(data, n_jobs, sample_weight)
+
+    def set_parameters(self, parameters: Dict):
+        self._joint_gaussian = None
+        return super(ContinuousBN, self).set_parameters(parameters)
+
+    def compile_gaussian(self, force: bool = False) -> Optional[LinearGaussian]:
+        """
+        Compile a network of Gaussian nodes with linear regressors
+        (the default for ContinuousBN) into the joint multivariate normal distribution.
+        The result is kept until parameters are changed (after in-place edits
+        of distributions call it with force=True).
+
+        :return: joint distribution or None if the network is not linear-Gaussian
+        """
+        if not self.distributions:
+            logger_network.error(
+                "Parameter learning wasn't done. Call fit_parameters method"
+            )
+            return None
+        if force or self._joint_gaussian is None:
+            self._joint_gaussian = LinearGaussian.from_network(self)
+        return self._joint_gaussian
+
+    def posterior(
+        self, evidence: Dict[str, Any]
+    ) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Exact conditional distribution of nodes without evidence
+        in a linear-Gaussian network. Unlike sampling, signs of nodes
+        (truncation of positive nodes) are not taken into account.
+        evidence: values for nodes (scalars or arrays with a value for every query)
+
+        :return: conditional means (a row for every query) and covariance matrix
+        """
+        joint = self.compile_gaussian()
+        if joint is None:
+            return None
+        return joint.condition(evidence)
+
+    def predict(
+        self,
+        test: pd.DataFrame,
+        parall_count: int = 1,
+        progress_bar: bool = True,
+        models_dir: Optional[str] = None,
+        method: str = "forward",
+        gibbs_params: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Union[List[str], List[int], List[float]]]:
+        """
+        The same as BaseNetwork.predict, method="exact" gives conditional means
+        of the joint normal distribution of a linear-Gaussian network
+        (evidence on descendants is taken into account, as with "gibbs").
+        """
+        if method != "exact":
+            return super(ContinuousBN, self).predict(
+                test, parall_count, progress_bar, models_dir, method, gibbs_params
+            )
+        if test.isnull().any().any():
+            logger_network.error("Test data contains NaN values.")
+            return {}
+        columns = [name for name in self.nodes_names if name not in test.columns]
+        if not columns:
+            logger_network.error("Test data is the same as train.")
+            return {}
+
+        evidence = {
+            name: test[name].values for name in test.columns if self[name] is not None
+        }
+        result = self.posterior(evidence)
+        if result is None:
+            return {}
+        means, _ = result
+        return {name: list(means[name].values) for name in columns}
@@ -0,0 +1,88 @@
+from types import MappingProxyType
+from typing import Any, Dict
+
+import numpy as np
+
+from bamt.utils.GraphUtils import toporder
+
+
+class InferencePlan(object):
+    """
+    Frozen plan of inference over a fitted network: nodes in topological order,
+    indexes of their parents, flags for dispatch (discrete and positive nodes),
+    tables of categories and parameters prepared by nodes for batch methods.
+    Sampling, predict and log_prob run against it instead of traversing
+    the network on every call. Plans are immutable and cheap to pickle.
+    """
+
+    __slots__ = (
+        "names",
+        "index",
+        "nodes",
+        "parents",
+        "discrete",
+        "positive",
+        "categories",
+        "params",
+    )
+
+    def __init__(self, bn):
+        by_name = {node.name: node for node in bn.nodes}
+        # bn.nodes are not necessarily sorted, parents are filled before children
+        names = tuple(toporder(bn.nodes, bn.edges, stable=True))
+        nodes = [by_name[name] for name in names]
+        index = {name: i for i, name in enumerate(names)}
+        discrete = np.array([bn._is_discrete(name) for name in names], dtype=bool)
+        signs = bn.descriptor.get("signs", {})
+        positive = np.array(
+            [
+                not is_discrete and signs.get(name) == "pos"
+                for name, is_discrete in zip(names, discrete)
+            ],
+            dtype=bool,
+        )
+        state = {
+            "names": names,
+            "index": index,
+            "nodes": tuple(nodes),
+            "parents": tuple(
+                tuple(index[p] for p in node.cont_parents + node.disc_parents)
+                for node in nodes
+            ),
+            "discrete": discrete,
+            "positive": positive,
+            "categories": tuple(
+                tuple(node.get_categories(bn.distributions[node.name]))
+                if is_discrete
+                else None
+                for node, is_discrete in zip(nodes, discrete)
+            ),
+            "params": tuple(
+                node.compile_params(bn.distributions[node.name]) for node in nodes
+            ),
+        }
+        self.__setstate__(state)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("InferencePlan is immutable, compile the network again.")
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        state["index"] = dict(state["index"])
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for slot in self.__slots__:
+            value = state[slot]
+            if slot == "index":
+                value = MappingProxyType(dict(value))
+            elif isinstance(value, np.ndarray):
+                value = value.copy()
+                value.flags.writeable = False
+            object.__setattr__(self, slot, value)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self):
+        return f"InferencePlan({len(self)} nodes)"
@@ -1,5 +1,34 @@
 import pickle
-from typing import Union
+from typing import Union, Dict, List, Optional, Tuple, Iterator
+
+import numpy as np
+from pandas import DataFrame
+
+from .schema import CodedColumn
+
+Column = Union[np.ndarray, CodedColumn]
+
+
+def codes_dtype(n_categories: int) -> np.dtype:
+    """
+    The smallest integer type for codes of a table with n_categories
+    (the same rule pandas.Categorical uses, so codes are never recast).
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def repeat_rows(data: DataFrame, sample_weight: Optional[np.ndarray]) -> DataFrame:
+    """
+    Rows of data repeated by their weights (rounded to counts of identical rows)
+    for estimators which do not take weights of samples.
+    """
+    if sample_weight is None:
+        return data
+    counts = np.rint(sample_weight).astype(np.int64)
+    return data.iloc[np.repeat(np.arange(data.shape[0]), counts)]
 
 
 class BaseNode(object):
@@ -57,3 +86,127 @@ class BaseNode(object):
     @staticmethod
     def get_dist(node_info, pvals):
         pass
+
+    def compile_params(self, node_info):
+        """
+        Parameters in the form used by batch methods, computed once by
+        BaseNetwork.compile (terms which don't depend on parents values).
+        """
+        return node_info
+
+    def _group_rows(
+        self, columns: Dict[str, Column], n: int
+    ) -> Tuple[np.ndarray, List[List[str]]]:
+        """
+        Split rows of a batch by combinations of discrete parents values.
+        :param columns: batch columns (parents must be CodedColumn)
+        :param n: number of rows
+
+        :return: group number for every row (-1 if any discrete parent has a gap)
+        and combination of values (list of str) for every group.
+        """
+        if not self.disc_parents:
+            return np.zeros(n, dtype=np.intp), [[]]
+
+        parents = [columns[p] for p in self.disc_parents]
+        cards = [len(column.categories) for column in parents]
+        blocked = np.zeros(n, dtype=bool)
+        for column in parents:
+            blocked |= column.codes < 0
+
+        if np.prod(cards, dtype=float) < 2**62:
+            key = np.zeros(n, dtype=np.int64)
+            radix = 1
+            for column, card in zip(parents, cards):
+                key += column.codes.astype(np.int64) * radix
+                radix *= card
+            key[blocked] = -1
+            uniques, groups = np.unique(key, return_inverse=True)
+            combinations_codes = []
+            for value in uniques[uniques >= 0]:
+                codes = []
+                for card in cards:
+                    codes.append(value % card)
+                    value //= card
+                combinations_codes.append(codes)
+        else:
+            stacked = np.column_stack([column.codes for column in parents])
+            stacked[blocked] = -1
+            uniques, groups = np.unique(stacked, axis=0, return_inverse=True)
+            groups = groups.reshape(-1)
+            combinations_codes = [codes for codes in uniques if codes[0] >= 0]
+
+        if blocked.any():
+            # the gap key is the smallest one, so it always takes the first group
+            groups = groups - 1
+        combinations = [
+            [column.categories[code] for column, code in zip(parents, codes)]
+            for codes in combinations_codes
+        ]
+        return groups, combinations
+
+    @staticmethod
+    def _iter_groups(
+        groups: np.ndarray, n_groups: int
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield group number and indexes of its rows (rows of group -1 are skipped).
+        """
+        order = np.argsort(groups, kind="stable")
+        bounds = np.searchsorted(groups[order], np.arange(n_groups + 1))
+        for group in range(n_groups):
+            if bounds[group] != bounds[group + 1]:
+                yield group, order[bounds[group] : bounds[group + 1]]
+
+    @staticmethod
+    def _stack_columns(
+        columns: Dict[str, Column], names: List[str], n: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stack columns into float matrix, discrete values are cast to numbers.
+
+        :return: matrix and mask of rows with gaps.
+        """
+        matrix = np.empty((n, len(names)))
+        for i, name in enumerate(names):
+            column = columns[name]
+            if isinstance(column, CodedColumn):
+                # the last item is taken by code -1
+                table = np.append(np.asarray(column.categories, dtype=float), np.nan)
+                matrix[:, i] = table[column.codes]
+            else:
+                matrix[:, i] = column
+        return matrix, np.isnan(matrix).any(axis=1)
+
+    @staticmethod
+    def _log_prob_codes(probs: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Log-probability of code in every row of probabilities matrix
+        (-inf for codes out of the matrix, e.g. values unknown to the node).
+        """
+        known = codes < probs.shape[1]
+        picked = probs[np.arange(codes.shape[0]), np.where(known, codes, 0)]
+        with np.errstate(divide="ignore"):
+            return np.where(known, np.log(picked), -np.inf)
+
+    @staticmethod
+    def _class_positions(classes: list, values: np.ndarray) -> np.ndarray:
+        """
+        Positions of values (e.g. predictions of a classifier) in the list of classes,
+        -1 for values which are not there.
+        """
+        classes = np.asarray(classes)
+        order = np.argsort(classes, kind="stable")
+        positions = np.searchsorted(classes, values, sorter=order)
+        positions = order[np.minimum(positions, order.shape[0] - 1)]
+        return np.where(classes[positions] == values, positions, -1)
+
+    @staticmethod
+    def _sample_codes(probs: np.ndarray) -> np.ndarray:
+        """
+        Draw a category index for every row of probabilities matrix.
+        """
+        cumulative = np.cumsum(probs, axis=1)
+        rand = np.random.random((probs.shape[0], 1))
+        codes = (cumulative < rand).sum(axis=1)
+        return np.minimum(codes, probs.shape[1] - 1)
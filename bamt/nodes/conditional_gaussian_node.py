@@ -1,7 +1,7 @@
 import itertools
 import math
 import random
-from typing import Dict, Optional, List, Union
+from typing import Dict, Optional, List, Union, Tuple
 
 import numpy as np
 from pandas import DataFrame
@@ -9,7 +9,8 @@ from sklearn import linear_model
 from sklearn.base import clone
 from sklearn.metrics import root_mean_squared_error as rmse
 
-from .base import BaseNode
+from bamt.utils.MathUtils import norm_logpdf, truncnorm_positive
+from .base import BaseNode, Column
 from .schema import CondGaussParams
 
 
@@ -25,9 +26,13 @@ class ConditionalGaussianNode(BaseNode):
         self.regressor = regressor
         self.type = "ConditionalGaussian" + f" ({type(self.regressor).__name__})"
 
-    def fit_parameters(self, data: DataFrame) -> Dict[str, Dict[str, CondGaussParams]]:
+    def fit_parameters(
+        self, data: DataFrame, sample_weight: Optional[np.ndarray] = None
+    ) -> Dict[str, Dict[str, CondGaussParams]]:
         """
         Train params for Conditional Gaussian Node.
+        sample_weight: weights of rows (counts of identical rows), passed to
+        the regressor
         Return:
         {"hybcprob": {<combination of outputs from discrete parents> : CondGaussParams}}
         """
@@ -43,16 +48,20 @@ class ConditionalGaussianNode(BaseNode):
             for col, val in zip(self.disc_parents, comb):
                 mask = (mask) & (data[col] == val)
             new_data = data[mask]
+            weights = None if sample_weight is None else sample_weight[mask]
+            kwargs = {} if weights is None else {"sample_weight": weights}
             key_comb = [str(x) for x in comb]
             if new_data.shape[0] > 0:
                 if self.cont_parents:
                     model = clone(self.regressor)
                     model.fit(
-                        new_data[self.cont_parents].values, new_data[self.name].values
+                        new_data[self.cont_parents].values,
+                        new_data[self.name].values,
+                        **kwargs,
                     )
                     predicted_value = model.predict(new_data[self.cont_parents].values)
                     variance = rmse(
-                        new_data[self.name].values, predicted_value
+                        new_data[self.name].values, predicted_value, **kwargs
                     )
                     hycprob[str(key_comb)] = {
                         "variance": variance,
@@ -62,8 +71,10 @@ class ConditionalGaussianNode(BaseNode):
                         "serialization": None,
                     }
                 else:
-                    mean_base = np.mean(new_data[self.name].values)
-                    variance = np.var(new_data[self.name].values)
+                    mean_base = np.average(new_data[self.name].values, weights=weights)
+                    variance = np.average(
+                        (new_data[self.name].values - mean_base) ** 2, weights=weights
+                    )
                     hycprob[str(key_comb)] = {
                         "variance": variance,
                         "mean": mean_base,
@@ -171,3 +182,84 @@ class ConditionalGaussianNode(BaseNode):
                     return np.nan
         else:
             return lgdistribution["mean"]
+
+    def _batch_dist(
+        self,
+        node_info: Dict[str, Dict[str, CondGaussParams]],
+        columns: Dict[str, Column],
+        n: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Conditional means and deviations for a batch
+        (nan for rows which can't be sampled).
+        """
+        cond_mean = np.full(n, np.nan)
+        std = np.full(n, np.nan)
+        if self.cont_parents:
+            pvals, blocked = self._stack_columns(columns, self.cont_parents, n)
+        groups, combinations = self._group_rows(columns, n)
+
+        for group, rows in self._iter_groups(groups, len(combinations)):
+            lgdistribution = node_info["hybcprob"].get(str(combinations[group]))
+            if lgdistribution is None:
+                continue
+            if self.cont_parents:
+                if not lgdistribution["regressor"]:
+                    continue
+                rows = rows[~blocked[rows]]
+                if rows.shape[0] == 0:
+                    continue
+                model = lgdistribution["regressor_obj"]
+                cond_mean[rows] = model.predict(pvals[rows])
+                std[rows] = lgdistribution["variance"]
+            else:
+                cond_mean[rows] = lgdistribution["mean"]
+                std[rows] = math.sqrt(lgdistribution["variance"])
+        return cond_mean, std
+
+    def choose_batch(
+        self,
+        node_info: Dict[str, Dict[str, CondGaussParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        positive: bool = False,
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with sampled values for a batch of rows.
+        params:
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: float buffer to write into (nan for blocked rows)
+        positive: draw from distribution truncated to [0, inf)
+        """
+        cond_mean, std = self._batch_dist(node_info, columns, out.shape[0])
+        if positive:
+            out[:] = truncnorm_positive(cond_mean, std, out.shape[0])
+        else:
+            out[:] = cond_mean + std * np.random.standard_normal(out.shape[0])
+        return out
+
+    def predict_batch(
+        self,
+        node_info: Dict[str, Dict[str, CondGaussParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Vectorized predict: conditional means for a batch of rows.
+        """
+        out[:], _ = self._batch_dist(node_info, columns, out.shape[0])
+        return out
+
+    def log_prob_batch(
+        self,
+        node_info: Dict[str, Dict[str, CondGaussParams]],
+        columns: Dict[str, Column],
+    ) -> np.ndarray:
+        """
+        Log-densities of node values in a batch given values of parents
+        (nan for rows with gaps).
+        """
+        values = columns[self.name]
+        cond_mean, std = self._batch_dist(node_info, columns, values.shape[0])
+        return norm_logpdf(values, cond_mean, std)
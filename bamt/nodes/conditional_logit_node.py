@@ -3,11 +3,11 @@ import random
 from typing import Optional, List, Union, Dict
 
 import numpy as np
-from pandas import DataFrame
+from pandas import DataFrame, isna
 from sklearn import linear_model
 from sklearn.base import clone
 
-from .base import BaseNode
+from .base import BaseNode, Column
 from .schema import LogitParams
 
 
@@ -25,9 +25,13 @@ class ConditionalLogitNode(BaseNode):
         self.classifier = classifier
         self.type = "ConditionalLogit" + f" ({type(self.classifier).__name__})"
 
-    def fit_parameters(self, data: DataFrame) -> Dict[str, Dict[str, LogitParams]]:
+    def fit_parameters(
+        self, data: DataFrame, sample_weight: Optional[np.ndarray] = None
+    ) -> Dict[str, Dict[str, LogitParams]]:
         """
         Train params on data
+        sample_weight: weights of rows (counts of identical rows), passed to
+        the classifier
         Return:
         {"hybcprob": {<combination of outputs from discrete parents> : LogitParams}}
         """
@@ -50,9 +54,13 @@ class ConditionalLogitNode(BaseNode):
                 model = clone(self.classifier)
                 values = set(new_data[self.name])
                 if len(values) > 1:
+                    kwargs = {}
+                    if sample_weight is not None:
+                        kwargs["sample_weight"] = sample_weight[mask]
                     model.fit(
                         X=new_data[self.cont_parents].values,
                         y=new_data[self.name].values,
+                        **kwargs,
                     )
                     classes = list(model.classes_)
                     hycprob[str(key_comb)] = {
@@ -170,3 +178,121 @@ class ConditionalLogitNode(BaseNode):
 
         else:
             return str(lgdistribution["classes"][0])
+
+    @staticmethod
+    def get_categories(node_info: Dict[str, Dict[str, LogitParams]]) -> List[str]:
+        """
+        Table of values of all combinations, codes of batch methods point to it.
+        """
+        categories = {}
+        for lgdistribution in node_info["hybcprob"].values():
+            for c in lgdistribution["classes"]:
+                if not isna(c):
+                    categories.setdefault(str(c), len(categories))
+        return list(categories)
+
+    def _batch_codes(
+        self,
+        node_info: Dict[str, Dict[str, LogitParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        predict: bool,
+    ) -> np.ndarray:
+        n = out.shape[0]
+        # the table of the batch column, if there is one, is the same as get_categories
+        if self.name in columns:
+            categories = columns[self.name].categories
+        else:
+            categories = self.get_categories(node_info)
+        index = {c: i for i, c in enumerate(categories)}
+        pvals, blocked = self._stack_columns(columns, self.cont_parents, n)
+        groups, combinations = self._group_rows(columns, n)
+        out[:] = -1
+
+        for group, rows in self._iter_groups(groups, len(combinations)):
+            lgdistribution = node_info["hybcprob"].get(str(combinations[group]))
+            if lgdistribution is None:
+                continue
+            classes = lgdistribution["classes"]
+            if any(isna(c) for c in classes):
+                continue
+            rows = rows[~blocked[rows]]
+            if rows.shape[0] == 0:
+                continue
+            codes = np.array([index[str(c)] for c in classes])
+
+            if len(classes) > 1:
+                model = lgdistribution["classifier_obj"]
+                if predict:
+                    pred = model.predict(pvals[rows])
+                    positions = self._class_positions(classes, pred)
+                    out[rows] = np.where(positions >= 0, codes[positions], -1)
+                else:
+                    probs = model.predict_proba(pvals[rows])
+                    out[rows] = codes[self._sample_codes(probs)]
+            else:
+                out[rows] = codes[0]
+        return out
+
+    def choose_batch(
+        self,
+        node_info: Dict[str, Dict[str, LogitParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with codes of sampled values for a batch of rows.
+        params:
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: codes buffer to write into (-1 for blocked rows)
+        """
+        return self._batch_codes(node_info, columns, out, predict=False)
+
+    def predict_batch(
+        self,
+        node_info: Dict[str, Dict[str, LogitParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Vectorized predict: predicted classes codes for a batch of rows.
+        """
+        return self._batch_codes(node_info, columns, out, predict=True)
+
+    def log_prob_batch(
+        self, node_info: Dict[str, Dict[str, LogitParams]], columns: Dict[str, Column]
+    ) -> np.ndarray:
+        """
+        Log-probabilities of node values in a batch given values of parents
+        (nan for rows with gaps or unknown combinations of parents).
+        """
+        column = columns[self.name]
+        n = column.codes.shape[0]
+        index = {c: i for i, c in enumerate(column.categories)}
+        pvals, blocked = self._stack_columns(columns, self.cont_parents, n)
+        groups, combinations = self._group_rows(columns, n)
+        log_prob = np.full(n, np.nan)
+
+        for group, rows in self._iter_groups(groups, len(combinations)):
+            lgdistribution = node_info["hybcprob"].get(str(combinations[group]))
+            if lgdistribution is None:
+                continue
+            classes = lgdistribution["classes"]
+            if any(isna(c) for c in classes):
+                continue
+            rows = rows[~blocked[rows] & (column.codes[rows] >= 0)]
+            if rows.shape[0] == 0:
+                continue
+            # codes of the batch to indexes of classes of the combination
+            local = np.full(len(column.categories), len(classes))
+            for i, c in enumerate(classes):
+                local[index[str(c)]] = i
+
+            if len(classes) > 1:
+                model = lgdistribution["classifier_obj"]
+                probs = model.predict_proba(pvals[rows])
+            else:
+                probs = np.ones((rows.shape[0], 1))
+            log_prob[rows] = self._log_prob_codes(probs, local[column.codes[rows]])
+        return log_prob
@@ -5,8 +5,14 @@ import numpy as np
 from gmr import GMM
 from pandas import DataFrame
 
-from bamt.utils.MathUtils import component
-from .base import BaseNode
+from bamt.utils.MathUtils import (
+    component,
+    gmm_condition_batch,
+    gmm_conditioning,
+    gmm_logpdf_batch,
+    gmm_sample_batch,
+)
+from .base import BaseNode, Column, repeat_rows
 from .schema import CondMixtureGaussParams
 
 
@@ -20,13 +26,16 @@ class ConditionalMixtureGaussianNode(BaseNode):
         self.type = "ConditionalMixtureGaussian"
 
     def fit_parameters(
-        self, data: DataFrame
+        self, data: DataFrame, sample_weight: Optional[np.ndarray] = None
     ) -> Dict[str, Dict[str, CondMixtureGaussParams]]:
         """
         Train params for Conditional Mixture Gaussian Node.
+        sample_weight: weights of rows (counts of identical rows), mixtures are
+        fitted on rows repeated by them
         Return:
         {"hybcprob": {<combination of outputs from discrete parents> : CondMixtureGaussParams}}
         """
+        data = repeat_rows(data, sample_weight)
         hycprob = dict()
         values = []
         combinations = []
@@ -225,3 +234,117 @@ class ConditionalMixtureGaussianNode(BaseNode):
         else:
             sample = np.nan
         return sample
+
+    def compile_params(
+        self, node_info: Dict[str, Dict[str, CondMixtureGaussParams]]
+    ) -> Dict:
+        hybcprob = {}
+        for comb, lgdistribution in node_info["hybcprob"].items():
+            if len(lgdistribution["coef"]) != 0:
+                lgdistribution = dict(
+                    lgdistribution,
+                    conditioning=gmm_conditioning(
+                        lgdistribution["coef"],
+                        lgdistribution["mean"],
+                        lgdistribution["covars"],
+                    ),
+                )
+            hybcprob[comb] = lgdistribution
+        return dict(node_info, hybcprob=hybcprob)
+
+    def _batch_fill(
+        self,
+        node_info: Dict[str, Dict[str, CondMixtureGaussParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        predict: bool,
+        positive: bool = False,
+    ) -> np.ndarray:
+        n = out.shape[0]
+        out[:] = np.nan
+        pvals, blocked = self._stack_columns(columns, self.cont_parents, n)
+        groups, combinations = self._group_rows(columns, n)
+
+        for group, rows in self._iter_groups(groups, len(combinations)):
+            lgdistribution = node_info["hybcprob"].get(str(combinations[group]))
+            if lgdistribution is None or len(lgdistribution["coef"]) == 0:
+                continue
+            rows = rows[~blocked[rows]]
+            if rows.shape[0] == 0:
+                continue
+
+            priors, means, variances = gmm_condition_batch(
+                lgdistribution["coef"],
+                lgdistribution["mean"],
+                lgdistribution["covars"],
+                pvals[rows],
+                lgdistribution.get("conditioning"),
+            )
+            if predict:
+                out[rows] = (priors * means).sum(axis=1)
+            else:
+                out[rows] = gmm_sample_batch(priors, means, variances, positive)
+        return out
+
+    def choose_batch(
+        self,
+        node_info: Dict[str, Dict[str, CondMixtureGaussParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        positive: bool = False,
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with sampled values for a batch of rows.
+        params:
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: float buffer to write into (nan for blocked rows)
+        positive: draw from distribution truncated to [0, inf)
+        """
+        return self._batch_fill(
+            node_info, columns, out, predict=False, positive=positive
+        )
+
+    def predict_batch(
+        self,
+        node_info: Dict[str, Dict[str, CondMixtureGaussParams]],
+        columns: Dict[str, Column],
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Vectorized predict: means of conditional mixtures for a batch of rows.
+        """
+        return self._batch_fill(node_info, columns, out, predict=True)
+
+    def log_prob_batch(
+        self,
+        node_info: Dict[str, Dict[str, CondMixtureGaussParams]],
+        columns: Dict[str, Column],
+    ) -> np.ndarray:
+        """
+        Log-densities of node values in a batch given values of parents
+        (nan for rows with gaps or unknown combinations of parents).
+        """
+        values = columns[self.name]
+        n = values.shape[0]
+        log_prob = np.full(n, np.nan)
+        pvals, blocked = self._stack_columns(columns, self.cont_parents, n)
+        groups, combinations = self._group_rows(columns, n)
+
+        for group, rows in self._iter_groups(groups, len(combinations)):
+            lgdistribution = node_info["hybcprob"].get(str(combinations[group]))
+            if lgdistribution is None or len(lgdistribution["coef"]) == 0:
+                continue
+            rows = rows[~blocked[rows] & ~np.isnan(values[rows])]
+            if rows.shape[0] == 0:
+                continue
+
+            priors, means, variances = gmm_condition_batch(
+                lgdistribution["coef"],
+                lgdistribution["mean"],
+                lgdistribution["covars"],
+                pvals[rows],
+                lgdistribution.get("conditioning"),
+            )
+            log_prob[rows] = gmm_logpdf_batch(priors, means, variances, values[rows])
+        return log_prob
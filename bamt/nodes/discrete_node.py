@@ -1,11 +1,13 @@
 import random
 from itertools import product
-from typing import Type, Dict, Union, List
+from typing import Type, Dict, Union, List, Optional
 
 import numpy as np
-from pandas import DataFrame, crosstab
+from pandas import DataFrame, Series, crosstab
 
-from .base import BaseNode
+from bamt.utils.CPTUtils import SparseCPT
+from bamt.utils.CountUtils import CountIndex
+from .base import BaseNode, Column
 from .schema import DiscreteParams
 
 
@@ -17,23 +19,51 @@ class DiscreteNode(BaseNode):
     def __init__(self, name):
         super(DiscreteNode, self).__init__(name)
         self.type = "Discrete"
-
-    def fit_parameters(self, data: DataFrame, num_workers: int = 1):
+        # options of SparseCPT (dtype, mmap_dir), None for dict of lists
+        self.cpt_storage = None
+
+    def fit_parameters(
+        self,
+        data: DataFrame,
+        num_workers: int = 1,
+        sample_weight: Optional[np.ndarray] = None,
+        count_index: Optional[CountIndex] = None,
+    ):
         """
         Train params for Discrete Node
         data: DataFrame to train on
         num_workers: number of Parallel Workers
+        sample_weight: weights of rows (counts of identical rows), None for ones
+        count_index: bitmap count index of data (with the same weights), sparse
+        tables (cpt_storage) are counted from its observed combinations
         Method returns probas dict with the following format {[<combinations>: value]}
         and vals, list of appeared values in combinations
         """
 
         def worker(node: Type[BaseNode]) -> DiscreteParams:
             parents = node.disc_parents + node.cont_parents
-            dist = data[node.name].value_counts(normalize=True).sort_index()
+            if sample_weight is None:
+                dist = data[node.name].value_counts(normalize=True).sort_index()
+            else:
+                dist = Series(sample_weight, index=data.index).groupby(data[node.name])
+                dist = dist.sum() / dist.sum().sum()
             vals = [str(i) for i in dist.index.to_list()]
 
             if not parents:
                 cprob = dist.to_list()
+            elif node.cpt_storage is not None and count_index is not None:
+                cprob = SparseCPT.from_index(
+                    count_index, node.name, parents, dist.index, **node.cpt_storage
+                )
+            elif node.cpt_storage is not None:
+                cprob = SparseCPT.from_data(
+                    data,
+                    node.name,
+                    parents,
+                    dist.index,
+                    sample_weight=sample_weight,
+                    **node.cpt_storage,
+                )
             else:
                 cprob = {
                     str([str(i) for i in comb]): [1 / len(vals) for _ in vals]
@@ -43,6 +73,8 @@ class DiscreteNode(BaseNode):
                 conditional_dist = crosstab(
                     data[node.name].to_list(),
                     [data[p] for p in parents],
+                    values=sample_weight,
+                    aggfunc=None if sample_weight is None else "sum",
                     normalize="columns",
                 ).T
                 tight_form = conditional_dist.to_dict("tight")
@@ -111,3 +143,84 @@ class DiscreteNode(BaseNode):
         else:
             max_ind = random.choice(indices)
         return vals[max_ind]
+
+    @staticmethod
+    def get_categories(node_info: DiscreteParams) -> List[str]:
+        """
+        Table of values, codes of batch methods point to it.
+        """
+        return list(node_info["vals"])
+
+    def _batch_probs(self, node_info: DiscreteParams, columns: Dict[str, Column], n):
+        """
+        Return group of every row and matrix of probabilities for every group.
+        Unknown combinations of parents get nan probabilities.
+        """
+        groups, combinations = self._group_rows(columns, n)
+        if not self.disc_parents:
+            return groups, np.array([node_info["cprob"]], dtype=float)
+        if isinstance(node_info["cprob"], SparseCPT):
+            return groups, node_info["cprob"].rows(combinations)
+
+        probs = np.full((len(combinations), len(node_info["vals"])), np.nan)
+        for i, comb in enumerate(combinations):
+            dist = node_info["cprob"].get(str(comb))
+            if dist is not None:
+                probs[i] = dist
+        return groups, probs
+
+    def choose_batch(
+        self, node_info: DiscreteParams, columns: Dict[str, Column], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with codes of sampled values for a batch of rows.
+        params:
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: codes buffer to write into (-1 for blocked rows)
+        """
+        groups, probs = self._batch_probs(node_info, columns, out.shape[0])
+        out[:] = -1
+        for group, rows in self._iter_groups(groups, probs.shape[0]):
+            dist = probs[group]
+            if np.isnan(dist).any():
+                continue
+            rindex = np.searchsorted(np.cumsum(dist), np.random.random(rows.shape[0]))
+            out[rows] = np.minimum(rindex, len(dist) - 1)
+        return out
+
+    def predict_batch(
+        self, node_info: DiscreteParams, columns: Dict[str, Column], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized predict: the most probable value for a batch of rows
+        (ties are broken randomly).
+        """
+        groups, probs = self._batch_probs(node_info, columns, out.shape[0])
+        out[:] = -1
+        for group, rows in self._iter_groups(groups, probs.shape[0]):
+            dist = probs[group]
+            if np.isnan(dist).any():
+                continue
+            indices = np.flatnonzero(dist == dist.max())
+            if len(indices) == 1:
+                out[rows] = indices[0]
+            else:
+                out[rows] = np.random.choice(indices, size=rows.shape[0])
+        return out
+
+    def log_prob_batch(
+        self, node_info: DiscreteParams, columns: Dict[str, Column]
+    ) -> np.ndarray:
+        """
+        Log-probabilities of node values in a batch given values of parents
+        (nan for rows with gaps or unknown combinations of parents).
+        """
+        codes = columns[self.name].codes
+        groups, probs = self._batch_probs(node_info, columns, codes.shape[0])
+        log_prob = np.full(codes.shape[0], np.nan)
+        for group, rows in self._iter_groups(groups, probs.shape[0]):
+            rows = rows[codes[rows] >= 0]
+            dist = np.broadcast_to(probs[group], (rows.shape[0], probs.shape[1]))
+            log_prob[rows] = self._log_prob_codes(dist, codes[rows])
+        return log_prob
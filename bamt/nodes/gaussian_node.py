@@ -1,13 +1,14 @@
 import math
 import random
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Union
 
 import numpy as np
 from pandas import DataFrame
 from sklearn import linear_model
 from sklearn.metrics import root_mean_squared_error as rmse
 
-from .base import BaseNode
+from bamt.utils.MathUtils import norm_logpdf, truncnorm_positive
+from .base import BaseNode, Column
 from .schema import GaussianParams
 
 
@@ -23,14 +24,24 @@ class GaussianNode(BaseNode):
         self.regressor = regressor
         self.type = "Gaussian" + f" ({type(self.regressor).__name__})"
 
-    def fit_parameters(self, data: DataFrame, **kwargs) -> GaussianParams:
+    def fit_parameters(
+        self, data: DataFrame, sample_weight: Optional[np.ndarray] = None, **kwargs
+    ) -> GaussianParams:
+        """
+        sample_weight: weights of rows (counts of identical rows), passed to
+        the regressor
+        """
         parents = self.cont_parents
         if type(self).__name__ == "CompositeContinuousNode":
             parents = parents + self.disc_parents
         if parents:
+            if sample_weight is not None:
+                kwargs["sample_weight"] = sample_weight
             self.regressor.fit(data[parents].values, data[self.name].values, **kwargs)
             predicted_value = self.regressor.predict(data[parents].values)
-            variance = rmse(data[self.name].values, predicted_value)
+            variance = rmse(
+                data[self.name].values, predicted_value, sample_weight=sample_weight
+            )
             return {
                 "mean": np.nan,
                 "regressor_obj": self.regressor,
@@ -39,8 +50,10 @@ class GaussianNode(BaseNode):
                 "serialization": None,
             }
         else:
-            mean_base = np.mean(data[self.name].values)
-            variance = np.var(data[self.name].values)
+            mean_base = np.average(data[self.name].values, weights=sample_weight)
+            variance = np.average(
+                (data[self.name].values - mean_base) ** 2, weights=sample_weight
+            )
             return {
                 "mean": mean_base,
                 "regressor_obj": None,
@@ -94,3 +107,64 @@ class GaussianNode(BaseNode):
             return pred
         else:
             return node_info["mean"]
+
+    def _batch_dist(
+        self, node_info: GaussianParams, columns: Dict[str, Column], n: int
+    ) -> Tuple[Union[np.ndarray, float], float]:
+        """
+        Conditional means (nan for rows with gaps in parents) and deviation for a batch.
+        """
+        parents = self.cont_parents
+        if type(self).__name__ == "CompositeContinuousNode":
+            parents = parents + self.disc_parents
+        if not parents:
+            return node_info["mean"], math.sqrt(node_info["variance"])
+
+        pvals, blocked = self._stack_columns(columns, parents, n)
+        cond_mean = np.full(n, np.nan)
+        if not blocked.all():
+            model = node_info["regressor_obj"]
+            cond_mean[~blocked] = model.predict(pvals[~blocked])
+        return cond_mean, node_info["variance"]
+
+    def choose_batch(
+        self,
+        node_info: GaussianParams,
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        positive: bool = False,
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with sampled values for a batch of rows.
+        params:
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: float buffer to write into (nan for blocked rows)
+        positive: draw from distribution truncated to [0, inf)
+        """
+        cond_mean, var = self._batch_dist(node_info, columns, out.shape[0])
+        if positive:
+            out[:] = truncnorm_positive(cond_mean, var, out.shape[0])
+        else:
+            out[:] = cond_mean + var * np.random.standard_normal(out.shape[0])
+        return out
+
+    def predict_batch(
+        self, node_info: GaussianParams, columns: Dict[str, Column], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized predict: conditional means for a batch of rows.
+        """
+        out[:], _ = self._batch_dist(node_info, columns, out.shape[0])
+        return out
+
+    def log_prob_batch(
+        self, node_info: GaussianParams, columns: Dict[str, Column]
+    ) -> np.ndarray:
+        """
+        Log-densities of node values in a batch given values of parents
+        (nan for rows with gaps).
+        """
+        values = columns[self.name]
+        cond_mean, std = self._batch_dist(node_info, columns, values.shape[0])
+        return norm_logpdf(values, cond_mean, std)
@@ -1,11 +1,11 @@
 import random
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Dict, Tuple
 
 import numpy as np
 from pandas import DataFrame
 from sklearn import linear_model
 
-from .base import BaseNode
+from .base import BaseNode, Column
 from .schema import LogitParams
 
 
@@ -23,8 +23,16 @@ class LogitNode(BaseNode):
         self.classifier = classifier
         self.type = "Logit" + f" ({type(self.classifier).__name__})"
 
-    def fit_parameters(self, data: DataFrame, **kwargs) -> LogitParams:
+    def fit_parameters(
+        self, data: DataFrame, sample_weight: Optional[np.ndarray] = None, **kwargs
+    ) -> LogitParams:
+        """
+        sample_weight: weights of rows (counts of identical rows), passed to
+        the classifier
+        """
         parents = self.cont_parents + self.disc_parents
+        if sample_weight is not None:
+            kwargs["sample_weight"] = sample_weight
         self.classifier.fit(X=data[parents].values, y=data[self.name].values, **kwargs)
 
         return {
@@ -89,3 +97,80 @@ class LogitNode(BaseNode):
 
         else:
             return str(node_info["classes"][0])
+
+    @staticmethod
+    def get_categories(node_info: LogitParams) -> List[str]:
+        """
+        Table of values, codes of batch methods point to it.
+        """
+        return [str(c) for c in node_info["classes"]]
+
+    def _batch_parents(
+        self, columns: Dict[str, Column], n: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return self._stack_columns(columns, self.cont_parents + self.disc_parents, n)
+
+    def choose_batch(
+        self, node_info: LogitParams, columns: Dict[str, Column], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with codes of sampled values for a batch of rows.
+        params:
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: codes buffer to write into (-1 for blocked rows)
+        """
+        pvals, blocked = self._batch_parents(columns, out.shape[0])
+        out[:] = -1
+        rows = np.flatnonzero(~blocked)
+        if rows.shape[0] == 0:
+            return out
+
+        if len(node_info["classes"]) > 1:
+            model = node_info["classifier_obj"]
+            out[rows] = self._sample_codes(model.predict_proba(pvals[rows]))
+        else:
+            out[rows] = 0
+        return out
+
+    def predict_batch(
+        self, node_info: LogitParams, columns: Dict[str, Column], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Vectorized predict: predicted classes codes for a batch of rows.
+        """
+        pvals, blocked = self._batch_parents(columns, out.shape[0])
+        out[:] = -1
+        rows = np.flatnonzero(~blocked)
+        if rows.shape[0] == 0:
+            return out
+
+        if len(node_info["classes"]) > 1:
+            model = node_info["classifier_obj"]
+            pred = model.predict(pvals[rows])
+            out[rows] = self._class_positions(node_info["classes"], pred)
+        else:
+            out[rows] = 0
+        return out
+
+    def log_prob_batch(
+        self, node_info: LogitParams, columns: Dict[str, Column]
+    ) -> np.ndarray:
+        """
+        Log-probabilities of node values in a batch given values of parents
+        (nan for rows with gaps).
+        """
+        codes = columns[self.name].codes
+        pvals, blocked = self._batch_parents(columns, codes.shape[0])
+        log_prob = np.full(codes.shape[0], np.nan)
+        rows = np.flatnonzero(~blocked & (codes >= 0))
+        if rows.shape[0] == 0:
+            return log_prob
+
+        if len(node_info["classes"]) > 1:
+            model = node_info["classifier_obj"]
+            probs = model.predict_proba(pvals[rows])
+        else:
+            probs = np.ones((rows.shape[0], 1))
+        log_prob[rows] = self._log_prob_codes(probs, codes[rows])
+        return log_prob
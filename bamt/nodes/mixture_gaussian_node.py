@@ -1,11 +1,17 @@
-from typing import Union, List, Optional
+from typing import Union, List, Optional, Dict
 
 import numpy as np
 from gmr import GMM
 from pandas import DataFrame
 
-from bamt.utils.MathUtils import component
-from .base import BaseNode
+from bamt.utils.MathUtils import (
+    component,
+    gmm_condition_batch,
+    gmm_conditioning,
+    gmm_logpdf_batch,
+    gmm_sample_batch,
+)
+from .base import BaseNode, Column, repeat_rows
 from .schema import MixtureGaussianParams
 
 
@@ -18,10 +24,15 @@ class MixtureGaussianNode(BaseNode):
         super(MixtureGaussianNode, self).__init__(name)
         self.type = "MixtureGaussian"
 
-    def fit_parameters(self, data: DataFrame) -> MixtureGaussianParams:
+    def fit_parameters(
+        self, data: DataFrame, sample_weight: Optional[np.ndarray] = None
+    ) -> MixtureGaussianParams:
         """
         Train params for Mixture Gaussian Node
+        sample_weight: weights of rows (counts of identical rows), mixtures are
+        fitted on rows repeated by them
         """
+        data = repeat_rows(data, sample_weight)
         parents = self.disc_parents + self.cont_parents
         if not parents:
             n_comp = int(
@@ -152,3 +163,99 @@ class MixtureGaussianNode(BaseNode):
         else:
             sample = np.nan
         return sample
+
+    def compile_params(self, node_info: MixtureGaussianParams) -> Dict:
+        if len(node_info["coef"]) == 0:
+            return node_info
+        return dict(
+            node_info,
+            conditioning=gmm_conditioning(
+                node_info["coef"], node_info["mean"], node_info["covars"]
+            ),
+        )
+
+    def _batch_fill(
+        self,
+        node_info: MixtureGaussianParams,
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        predict: bool,
+        positive: bool = False,
+    ) -> np.ndarray:
+        out[:] = np.nan
+        if len(node_info["coef"]) == 0:
+            return out
+        pvals, blocked = self._stack_columns(columns, self.cont_parents, out.shape[0])
+        rows = np.flatnonzero(~blocked)
+        if rows.shape[0] == 0:
+            return out
+
+        priors, means, variances = gmm_condition_batch(
+            node_info["coef"],
+            node_info["mean"],
+            node_info["covars"],
+            pvals[rows],
+            node_info.get("conditioning"),
+        )
+        if predict:
+            out[rows] = (priors * means).sum(axis=1)
+        else:
+            out[rows] = gmm_sample_batch(priors, means, variances, positive)
+        return out
+
+    def choose_batch(
+        self,
+        node_info: MixtureGaussianParams,
+        columns: Dict[str, Column],
+        out: np.ndarray,
+        positive: bool = False,
+    ) -> np.ndarray:
+        """
+        Vectorized choose: fill out with sampled values for a batch of rows.
+        node_info: nodes info from distributions
+        columns: batch columns of parents
+        out: float buffer to write into (nan for blocked rows)
+        positive: draw from distribution truncated to [0, inf)
+        """
+        return self._batch_fill(
+            node_info, columns, out, predict=False, positive=positive
+        )
+
+    def predict_batch(
+        self,
+        node_info: MixtureGaussianParams,
+        columns: Dict[str, Column],
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Vectorized predict: means of conditional mixtures for a batch of rows.
+        """
+        return self._batch_fill(node_info, columns, out, predict=True)
+
+    def log_prob_batch(
+        self, node_info: MixtureGaussianParams, columns: Dict[str, Column]
+    ) -> np.ndarray:
+        """
+        Log-densities of node values in a batch given values of parents
+        (nan for rows with gaps).
+        """
+        values = columns[self.name]
+        log_prob = np.full(values.shape[0], np.nan)
+        if len(node_info["coef"]) == 0:
+            return log_prob
+        pvals, blocked = self._stack_columns(
+            columns, self.cont_parents, values.shape[0]
+        )
+        rows = np.flatnonzero(~blocked & ~np.isnan(values))
+        if rows.shape[0] == 0:
+            return log_prob
+
+        priors, means, variances = gmm_condition_batch(
+            node_info["coef"],
+            node_info["mean"],
+            node_info["covars"],
+            pvals[rows],
+            node_info.get("conditioning"),
+        )
+        log_prob[rows] = gmm_logpdf_batch(priors, means, variances, values[rows])
+        return log_prob
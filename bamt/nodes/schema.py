@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Union, TypedDict, Optional
+from typing import Dict, List, Any, Union, TypedDict, Optional, NamedTuple
 
 from numpy import ndarray
 
@@ -45,3 +45,13 @@ class LogitParams(TypedDict):
 
 class HybcprobParams(TypedDict):
     hybcprob: Dict[str, CondGaussParams]
+
+
+class CodedColumn(NamedTuple):
+    """
+    Discrete column of a batch: integer codes into a table of categories.
+    Code -1 marks a gap (missing or blocked value).
+    """
+
+    codes: ndarray
+    categories: List[str]
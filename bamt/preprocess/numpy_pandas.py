@@ -1,6 +1,8 @@
 # currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 # parentdir = os.path.dirname(currentdir)
 # sys.path.insert(0,parentdir)
+from typing import Tuple
+
 import numpy as np
 import pandas as pd
 
@@ -40,7 +42,19 @@ def get_type_numpy(data: np.array):
     -- You may have problems with confusing rows and columns
     """
     arr = data.T
+    if np.issubdtype(arr.dtype, np.integer):
+        is_integer = np.ones(arr.shape[:1], dtype=bool)
+    elif np.issubdtype(arr.dtype, np.floating):
+        # finite values equal to their floor, as float.is_integer
+        integer = np.isfinite(arr) & (arr == np.floor(arr))
+        is_integer = integer if arr.ndim == 1 else integer.all(axis=1)
+    else:
+        return _get_type_elementwise(arr)
+    return {i: "disc" if value else "cont" for i, value in enumerate(is_integer)}
+
 
+def _get_type_elementwise(arr: np.array):
+    """get_type_numpy for arrays of other (object) dtypes, value by value"""
     column_type = {}
     for i, row in enumerate(arr):
         if row.ndim == 0 or row.T.ndim == 0:
@@ -55,3 +69,19 @@ def get_type_numpy(data: np.array):
             print("get_type_numpy: Incorrect type of row")
             print(row)
     return column_type
+
+
+def compress_rows(data: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Function to collapse identical rows of data into unique rows with counts
+    Args:
+        data (pd.DataFrame): input dataset
+
+    Returns:
+        unique rows (in order of first appearance, index is reset) and
+        their counts, to be passed as sample_weight to add_edges,
+        fit_parameters and calculate_weights
+    """
+    counts = data.groupby(list(data.columns), sort=False, dropna=False).size()
+    unique = counts.index.to_frame(index=False)
+    unique = unique.astype(data.dtypes.to_dict())
+    return unique, counts.to_numpy()
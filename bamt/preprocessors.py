@@ -2,6 +2,7 @@ from typing import Tuple, Dict
 
 from pandas import DataFrame
 
+from bamt import profiling
 from bamt.log import logger_preprocessor
 from bamt.utils import GraphUtils as gru
 
@@ -106,6 +107,7 @@ class Preprocessor(BasePreprocessor):
         if not columns_disc:
             logger_preprocessor.info("No one column is discrete")
 
+    @profiling.profiled("preprocess")
     def apply(self, data: DataFrame) -> Tuple[DataFrame, Dict]:
         """
         Apply pipeline
@@ -0,0 +1,266 @@
+"""
+Profiling of the pipeline: wall time, calls and peak memory of stages
+(preprocessing, structure learning, parameters learning, sampling, ...)
+and of nodes, counters of the hill climbing (iterations, candidates,
+score cache hits/misses, cycle checks).
+
+    with Profiler(allocations=True) as profiler:
+        bn.add_edges(discretized_data, scoring_function=("BIC",))
+        bn.fit_parameters(data)
+        bn.sample(1000)
+    profiler.report()
+    profiler.save_chrome_trace("trace.json")  # chrome://tracing, Perfetto
+
+Instrumented code calls stage, count and profiled of this module; without an active
+profiler they do nothing but check a context variable. The active profiler is
+scoped to the context (thread or task) which entered it, worker threads of
+instrumented code get it through propagate.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+_active = contextvars.ContextVar("bamt_profiler", default=None)
+
+# tracemalloc has one peak for the process, stages open in any profiler or thread
+# take the peak before it is reset by a nested stage
+_open_stages = []
+_memory_lock = threading.Lock()
+
+
+class _NullStage(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    __slots__ = ("profiler", "name", "args", "start", "memory", "peak")
+
+    def __init__(self, profiler: "Profiler", name: str, args: Dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.memory = None
+
+    def __enter__(self):
+        if self.profiler.allocations and tracemalloc.is_tracing():
+            with _memory_lock:
+                current, peak = tracemalloc.get_traced_memory()
+                for stage in _open_stages:
+                    stage.peak = max(stage.peak, peak)
+                tracemalloc.reset_peak()
+                self.memory = self.peak = current
+                _open_stages.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        peak_memory = None
+        if self.memory is not None:
+            with _memory_lock:
+                peak = tracemalloc.get_traced_memory()[1]
+                for stage in _open_stages:
+                    stage.peak = max(stage.peak, peak)
+                _open_stages.remove(self)
+            peak_memory = self.peak - self.memory
+        self.profiler._add_event(
+            self.name, self.start, end - self.start, self.args, peak_memory
+        )
+        return False
+
+
+class Profiler(object):
+    """
+    Collector of events of stages and counters. Activated as a context manager
+    in the current context (the previous active profiler is restored on exit).
+    """
+
+    def __init__(
+        self, allocations: bool = False, callbacks: Optional[Sequence[Callable]] = None
+    ):
+        """
+        :param allocations: trace allocations with tracemalloc (slows the code down),
+        events get the peak of traced memory above its value at the start of stages
+        :param callbacks: functions called with every finished event (dict with
+        name, start, duration, thread, args, peak_memory)
+        """
+        self.allocations = allocations
+        self.callbacks = list(callbacks or [])
+        self.events = []
+        self.counters = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._tokens = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._tokens.append(_active.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        _active.reset(self._tokens.pop())
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def stage(self, name: str, **args) -> _Stage:
+        return _Stage(self, name, args)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _add_event(self, name, start, duration, args, peak_memory):
+        event = {
+            "name": name,
+            "start": start - self._origin,
+            "duration": duration,
+            "thread": threading.get_ident(),
+            "args": args,
+            "peak_memory": peak_memory,
+        }
+        # list.append is atomic, events of threads are not lost
+        self.events.append(event)
+        for callback in self.callbacks:
+            callback(event)
+
+    @staticmethod
+    def _summary(events: List[Dict]) -> Dict:
+        durations = [event["duration"] for event in events]
+        summary = {
+            "calls": len(events),
+            "total": sum(durations),
+            "mean": sum(durations) / len(durations),
+            "max": max(durations),
+        }
+        peaks = [e["peak_memory"] for e in events if e["peak_memory"] is not None]
+        if peaks:
+            summary["peak_memory"] = max(peaks)
+        return summary
+
+    def report(self) -> Dict:
+        """
+        Structured report: summaries (calls, total, mean and max time in seconds,
+        max peak memory in bytes) of stages, of stages per node and counters.
+        """
+        stages, nodes = {}, {}
+        for event in self.events:
+            stages.setdefault(event["name"], []).append(event)
+            node = event["args"].get("node")
+            if node is not None:
+                nodes.setdefault(node, {}).setdefault(event["name"], []).append(event)
+        return {
+            "stages": {name: self._summary(e) for name, e in stages.items()},
+            "nodes": {
+                node: {name: self._summary(e) for name, e in node_stages.items()}
+                for node, node_stages in nodes.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def chrome_trace(self) -> Dict:
+        """Events in Chrome trace event format (complete events, times in us)."""
+        pid = os.getpid()
+        events = []
+        for event in self.events:
+            args = {key: str(value) for key, value in event["args"].items()}
+            if event["peak_memory"] is not None:
+                args["peak_memory"] = event["peak_memory"]
+            events.append(
+                {
+                    "name": event["name"],
+                    "cat": "bamt",
+                    "ph": "X",
+                    "ts": event["start"] * 1e6,
+                    "dur": event["duration"] * 1e6,
+                    "pid": pid,
+                    "tid": event["thread"],
+                    "args": args,
+                }
+            )
+        if self.counters:
+            end = max((e["start"] + e["duration"] for e in self.events), default=0)
+            events.append(
+                {
+                    "name": "counters",
+                    "ph": "C",
+                    "ts": end * 1e6,
+                    "pid": pid,
+                    "args": dict(self.counters),
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path: str):
+        with open(path, "w") as out:
+            json.dump(self.chrome_trace(), out)
+
+
+def active() -> Optional[Profiler]:
+    return _active.get()
+
+
+def stage(name: str, **args):
+    """Context manager timing a stage, args (e.g. node) are saved with the event."""
+    profiler = _active.get()
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name, **args)
+
+
+def count(name: str, n: int = 1):
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.count(name, n)
+
+
+def propagate(func: Callable) -> Callable:
+    """func run with the active profiler of the caller (in worker threads)."""
+    profiler = _active.get()
+    if profiler is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _active.set(profiler)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+
+    return wrapper
+
+
+def profiled(name: str):
+    """Decorator timing calls of a function as the stage name."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -26,10 +26,9 @@ Strategies to improve Greedy Hill-Climbing:
     of these steps.
 """
 
+from bamt import profiling
 from bamt.external.pyBN.classes.bayesnet import BayesNet
-from bamt.external.pyBN.utils.graph import would_cause_cycle
-from bamt.mi_entropy_gauss import mi_gauss
-from bamt.redef_info_scores import log_lik_local, BIC_local, AIC_local
+from bamt.redef_info_scores import LocalScore
 
 
 def hc(
@@ -42,6 +41,9 @@ def hc(
     init_edges=None,
     remove_geo_edges=True,
     black_list=None,
+    candidates=None,
+    refresh_candidates=0,
+    sample_weight=None,
 ):
     """
     Greedy Hill Climbing search proceeds by choosing the move
@@ -100,12 +102,23 @@ def hc(
     *restriction* : a list of 2-tuples
         For MMHC algorithm, the list of allowable edge additions.
 
+    *candidates* : a dict, where key = node, val = list of candidate parents
+        Sparse candidate sets: only these additions (and reversals) are scored.
+
+    *refresh_candidates* : an integer
+        Every refresh_candidates iterations (and at convergence) candidates of
+        nodes whose parents changed are selected again: current parents and
+        nodes giving the best score gain as a new parent. 0 disables it.
+
+    *sample_weight* : an array of weights of rows
+        Counts of identical rows (see compress_rows), scores are the same
+        as of data with rows repeated.
+
     Returns
     -------
     *bn* : a BayesNet object
 
     """
-    nrow = data.shape[0]
     ncol = data.shape[1]
 
     names = range(ncol)
@@ -121,18 +134,85 @@ def hc(
 
     bn = BayesNet(c_dict)
 
-    mutual_information = mi_gauss
-    if metric == "BIC":
-        mutual_information = BIC_local
-    if metric == "AIC":
-        mutual_information = AIC_local
-    if metric == "LL":
-        mutual_information = log_lik_local
-
     data = data.values
+    mutual_information = LocalScore(data, metric, sample_weight)
+    nrow = mutual_information.gaussian.n
 
     cache = dict()
 
+    def score(columns):
+        if columns not in cache:
+            cache[columns] = mutual_information(columns)
+        return cache[columns]
+
+    def causes_cycle(u, v, reverse=False):
+        """Adding u -> v (reversing v -> u) makes a cycle if v reaches u."""
+        stack, seen = [v], {v}
+        while stack:
+            node = stack.pop()
+            for child in c_dict[node]:
+                if reverse and node == v and child == u:
+                    continue
+                if child == u:
+                    return True
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return False
+
+    restriction = None if restriction is None else set(restriction)
+    black_list = None if black_list is None else set(black_list)
+    nodes = list(bn.nodes())
+    order = {node: i for i, node in enumerate(nodes)}
+
+    def candidate_pairs():
+        return sorted(
+            ((u, v) for v in names for u in candidates[v]),
+            key=lambda pair: (order[pair[0]], order[pair[1]]),
+        )
+
+    def select_candidates(v):
+        """Current parents and the best new parents by score gain."""
+        old_cols = (v,) + tuple(p_dict[v])
+        gains = [
+            (nrow * (score(old_cols) - score(old_cols + (u,))), u)
+            for u in nodes
+            if u != v and u not in p_dict[v]
+        ]
+        gains.sort(key=lambda gain: -gain[0])
+        n_new = max(sizes[v] - len(p_dict[v]), 0)
+        return list(p_dict[v]) + [u for _, u in gains[:n_new]]
+
+    if candidates is not None:
+        candidates = {v: list(candidates.get(v, [])) for v in names}
+        sizes = {v: len(parents) for v, parents in candidates.items()}
+        additions = candidate_pairs()
+    else:
+        additions = [(u, v) for u in nodes for v in nodes]
+    changed = set()
+
+    # counters for profiling, scores are computed on cache misses
+    profiler = profiling.active()
+    candidates_count, lookups, misses = 0, [0], [0]
+    if profiler is not None:
+        local_score = mutual_information
+
+        def mutual_information(columns):
+            misses[0] += 1
+            return local_score(columns)
+
+        cached_score = score
+
+        def score(columns):
+            lookups[0] += 1
+            return cached_score(columns)
+
+        check_cycle = causes_cycle
+
+        def causes_cycle(*args, **kwargs):
+            profiler.count("hc_cycle_checks")
+            return check_cycle(*args, **kwargs)
+
     _iter = 0
     improvement = True
 
@@ -144,110 +224,98 @@ def hc(
             print("ITERATION: ", _iter)
 
         ### TEST ARC ADDITIONS ###
-        for u in bn.nodes():
-            for v in bn.nodes():
+        for u, v in additions:
+            if (
+                v not in c_dict[u]
+                and u != v
+                and not causes_cycle(u, v)
+                and len(p_dict[v]) != 3
+            ):
+                # FOR MMHC ALGORITHM -> Edge Restrictions
                 if (
-                    v not in c_dict[u]
-                    and u != v
-                    and not would_cause_cycle(c_dict, u, v)
-                    and len(p_dict[v]) != 3
+                    (init_nodes is None or not (v in init_nodes))
+                    and (restriction is None or (u, v) in restriction)
+                    and (black_list is None or not ((u, v) in black_list))
                 ):
-                    # FOR MMHC ALGORITHM -> Edge Restrictions
-                    if (
-                        (init_nodes is None or not (v in init_nodes))
-                        and (restriction is None or (u, v) in restriction)
-                        and (black_list is None or not ((u, v) in black_list))
-                    ):
-                        # SCORE FOR 'V' -> gaining a parent
-                        # without 'u' as parent
-                        old_cols = (v,) + tuple(p_dict[v])
-                        if old_cols not in cache:
-                            cache[old_cols] = mutual_information(data[:, old_cols])
-                        mi_old = cache[old_cols]
-                        new_cols = old_cols + (u,)  # with'u' as parent
-                        if new_cols not in cache:
-                            cache[new_cols] = mutual_information(data[:, new_cols])
-                        mi_new = cache[new_cols]
-                        delta_score = nrow * (mi_old - mi_new)
-
-                        if delta_score > max_delta:
-                            if debug:
-                                print("Improved Arc Addition: ", (u, v))
-                                print("Delta Score: ", delta_score)
-                            max_delta = delta_score
-                            max_operation = "Addition"
-                            max_arc = (u, v)
-
-        # ### TEST ARC DELETIONS ###
-        for u in bn.nodes():
-            for v in bn.nodes():
-                if v in c_dict[u]:
-                    # SCORE FOR 'V' -> losing a parent
-                    old_cols = (v,) + tuple(p_dict[v])  # with 'u' as parent
-                    if old_cols not in cache:
-                        cache[old_cols] = mutual_information(data[:, old_cols])
-                    mi_old = cache[old_cols]
-                    new_cols = tuple([i for i in old_cols if i != u])
-                    if new_cols not in cache:
-                        cache[new_cols] = mutual_information(data[:, new_cols])
-                    mi_new = cache[new_cols]
+                    # SCORE FOR 'V' -> gaining a parent
+                    if profiler is not None:
+                        candidates_count += 1
+                    # without 'u' as parent
+                    old_cols = (v,) + tuple(p_dict[v])
+                    mi_old = score(old_cols)
+                    new_cols = old_cols + (u,)  # with'u' as parent
+                    mi_new = score(new_cols)
                     delta_score = nrow * (mi_old - mi_new)
 
                     if delta_score > max_delta:
-                        if init_edges is None:
-                            if debug:
-                                print("Improved Arc Deletion: ", (u, v))
-                                print("Delta Score: ", delta_score)
-                            max_delta = delta_score
-                            max_operation = "Deletion"
-                            max_arc = (u, v)
-                        else:
-                            if (u, v) in init_edges:
-                                if remove_geo_edges:
-                                    if debug:
-                                        print("Improved Arc Deletion: ", (u, v))
-                                        print("Delta Score: ", delta_score)
-                                    max_delta = delta_score
-                                    max_operation = "Deletion"
-                                    max_arc = (u, v)
-                            else:
+                        if debug:
+                            print("Improved Arc Addition: ", (u, v))
+                            print("Delta Score: ", delta_score)
+                        max_delta = delta_score
+                        max_operation = "Addition"
+                        max_arc = (u, v)
+
+        # ### TEST ARC DELETIONS ###
+        for u in nodes:
+            for v in sorted(c_dict[u], key=order.get):
+                # SCORE FOR 'V' -> losing a parent
+                if profiler is not None:
+                    candidates_count += 1
+                old_cols = (v,) + tuple(p_dict[v])  # with 'u' as parent
+                mi_old = score(old_cols)
+                new_cols = tuple([i for i in old_cols if i != u])
+                mi_new = score(new_cols)
+                delta_score = nrow * (mi_old - mi_new)
+
+                if delta_score > max_delta:
+                    if init_edges is None:
+                        if debug:
+                            print("Improved Arc Deletion: ", (u, v))
+                            print("Delta Score: ", delta_score)
+                        max_delta = delta_score
+                        max_operation = "Deletion"
+                        max_arc = (u, v)
+                    else:
+                        if (u, v) in init_edges:
+                            if remove_geo_edges:
                                 if debug:
                                     print("Improved Arc Deletion: ", (u, v))
                                     print("Delta Score: ", delta_score)
                                 max_delta = delta_score
                                 max_operation = "Deletion"
                                 max_arc = (u, v)
+                        else:
+                            if debug:
+                                print("Improved Arc Deletion: ", (u, v))
+                                print("Delta Score: ", delta_score)
+                            max_delta = delta_score
+                            max_operation = "Deletion"
+                            max_arc = (u, v)
 
         # ### TEST ARC REVERSALS ###
-        for u in bn.nodes():
-            for v in bn.nodes():
+        for u in nodes:
+            for v in sorted(c_dict[u], key=order.get):
                 if (
-                    v in c_dict[u]
-                    and not would_cause_cycle(c_dict, v, u, reverse=True)
+                    not causes_cycle(v, u, reverse=True)
                     and len(p_dict[u]) != 3
                     and (init_nodes is None or not (u in init_nodes))
+                    and (candidates is None or v in candidates[u])
                     and (restriction is None or (v, u) in restriction)
                     and (black_list is None or not ((v, u) in black_list))
                 ):
+                    if profiler is not None:
+                        candidates_count += 1
                     old_cols = (u,) + tuple(p_dict[v])  # without 'v' as parent
-                    if old_cols not in cache:
-                        cache[old_cols] = mutual_information(data[:, old_cols])
-                    mi_old = cache[old_cols]
+                    mi_old = score(old_cols)
                     new_cols = old_cols + (v,)  # with 'v' as parent
-                    if new_cols not in cache:
-                        cache[new_cols] = mutual_information(data[:, new_cols])
-                    mi_new = cache[new_cols]
+                    mi_new = score(new_cols)
                     delta1 = -1 * nrow * (mi_old - mi_new)
                     # SCORE FOR 'V' -> losing 'u' as parent
                     old_cols = (v,) + tuple(p_dict[v])  # with 'u' as parent
-                    if old_cols not in cache:
-                        cache[old_cols] = mutual_information(data[:, old_cols])
-                    mi_old = cache[old_cols]
+                    mi_old = score(old_cols)
                     # without 'u' as parent
                     new_cols = tuple([u for i in old_cols if i != u])
-                    if new_cols not in cache:
-                        cache[new_cols] = mutual_information(data[:, new_cols])
-                    mi_new = cache[new_cols]
+                    mi_new = score(new_cols)
                     delta2 = nrow * (mi_old - mi_new)
                     # COMBINED DELTA-SCORES
                     delta_score = delta1 + delta2
@@ -299,11 +367,29 @@ def hc(
                 p_dict[v].remove(u)
                 c_dict[v].append(u)
                 p_dict[u].append(v)
+            changed.update((u, v) if max_operation == "Reversal" else (v,))
 
         else:
             if debug:
                 print("No Improvement on Iter: ", _iter)
 
+        ### REFRESH CANDIDATES ###
+        if (
+            candidates is not None
+            and refresh_candidates
+            and changed
+            and (not improvement or (_iter + 1) % refresh_candidates == 0)
+        ):
+            for node in sorted(changed, key=order.get):
+                selected = select_candidates(node)
+                if set(selected) != set(candidates[node]):
+                    if debug:
+                        print("NEW CANDIDATES: ", node, selected)
+                    candidates[node] = selected
+                    improvement = True
+            changed = set()
+            additions = candidate_pairs()
+
         ### TEST FOR MAX ITERATION ###
         _iter += 1
         if _iter > max_iter:
@@ -311,6 +397,12 @@ def hc(
                 print("Max Iteration Reached")
             break
 
+    if profiler is not None:
+        profiler.count("hc_iterations", _iter)
+        profiler.count("hc_candidates", candidates_count)
+        profiler.count("hc_score_cache_hits", lookups[0] - misses[0])
+        profiler.count("hc_score_cache_misses", misses[0])
+
     bn = BayesNet(c_dict)
 
     return bn
@@ -1,13 +1,24 @@
 import sys
 import warnings
 from copy import copy
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 
-from bamt.mi_entropy_gauss import mi_gauss as mutual_information, entropy_all as entropy
+from bamt.external.pyBN.utils.independence_tests import (
+    entropy as discrete_entropy,
+    mutual_information as discrete_mutual_information,
+)
+from bamt.mi_entropy_gauss import (
+    GaussianStatistics,
+    entropy_var,
+    mi_gauss as mutual_information,
+    entropy_all as entropy,
+)
 from bamt.preprocess.graph import edges_to_dict
 from bamt.preprocess.numpy_pandas import get_type_numpy
+from bamt.utils.CountUtils import CountIndex
 
 
 def info_score(edges: list, data: pd.DataFrame, method="LL"):
@@ -177,3 +188,83 @@ def AIC_local(data, method="AIC"):
     log_score = log_lik_local(data, method=method)
     penalty = num_params(data)
     return log_score - penalty
+
+
+class LocalScore(object):
+    """
+    Local score (MI, LL, BIC or AIC) of families of columns of one array,
+    called with a tuple (child, *parents). Families with continuous columns
+    are scored from sufficient statistics of the data (GaussianStatistics),
+    discrete families by counts of observed combinations of values taken from
+    a bitmap count index (CountIndex).
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        metric="MI",
+        sample_weight: Optional[np.ndarray] = None,
+    ):
+        """
+        :param sample_weight: weights of rows (counts of identical rows),
+        scores are the same as of data with rows repeated
+        """
+        self.data = data
+        self.metric = metric
+        self.function = {
+            "BIC": BIC_local,
+            "AIC": AIC_local,
+            "LL": log_lik_local,
+        }.get(metric, mutual_information)
+        self.method = metric if self.function is not mutual_information else "MI"
+        self.sample_weight = sample_weight
+        self.gaussian = GaussianStatistics(data, sample_weight)
+        self.counts = CountIndex(data, sample_weight)
+        self._node_entropies = {}
+
+    def node_entropy(self, column: int) -> float:
+        """entropy term of log_lik_local, the same for all families of the child"""
+        if column not in self._node_entropies:
+            values = self.data[:, column]
+            # entropy_all takes the type of a single column by its first value
+            if get_type_numpy(values[:1])[0] == "disc":
+                cells, counts = self.counts.cells((column,), decode=True)
+                self._node_entropies[column] = discrete_entropy(
+                    cells.astype(np.int64), counts
+                )
+            else:
+                self._node_entropies[column] = entropy_var(self.gaussian.var[column])
+        return self._node_entropies[column]
+
+    def num_params(self, columns) -> int:
+        """num_params of the family with numbers of discrete values from the index"""
+        prod = 1
+        for column in columns:
+            if not self.gaussian.continuous[column]:
+                prod *= self.counts.card(column)
+        n_continuous = int(self.gaussian.continuous[list(columns)].sum())
+        return prod * n_continuous if n_continuous else prod
+
+    def __call__(self, columns):
+        if self.gaussian.n <= 1:
+            return self.function(self.data[:, columns])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            if self.gaussian.is_continuous(columns):
+                mi = self.gaussian.mi(tuple(columns), self.method)
+            else:
+                # scores of the observed combinations weighted by their counts
+                # are the scores of the rows
+                cells, counts = self.counts.cells(columns, decode=True)
+                mi = discrete_mutual_information(
+                    cells.astype(np.int64), weights=counts
+                )
+            if self.function is mutual_information:
+                return mi
+            NROW = self.gaussian.n
+            log_score = NROW * (mi - self.node_entropy(columns[0]))
+        if self.metric == "BIC":
+            return log_score - 0.5 * self.num_params(columns) * np.log(NROW)
+        if self.metric == "AIC":
+            return log_score - self.num_params(columns)
+        return log_score
@@ -0,0 +1,208 @@
+import ast
+import os
+import uuid
+from collections.abc import Mapping
+from itertools import product
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Categorical
+
+from bamt.utils.CountUtils import CountIndex
+
+
+class SparseCPT(Mapping):
+    """
+    Conditional probability table of a discrete node stored as an array.
+    Only observed combinations of parents values have rows, the rest combinations
+    of known values share a default (uniform) row. The table can be backed by
+    a memory-mapped file. It is a read-only mapping with the same keys as cprob
+    dict of DiscreteNode (str of list of parents values), rows are arrays.
+    """
+
+    def __init__(
+        self,
+        parents_values: Sequence[Sequence[str]],
+        keys: Sequence[str],
+        table: np.ndarray,
+        default: Sequence[float],
+    ):
+        self.parents_values = [list(values) for values in parents_values]
+        self.keys_list = list(keys)
+        self.index = {key: i for i, key in enumerate(self.keys_list)}
+        self.table = table
+        self.default = np.asarray(default, dtype=table.dtype)
+        self._known = [set(values) for values in self.parents_values]
+
+    @classmethod
+    def from_data(
+        cls,
+        data: DataFrame,
+        name: str,
+        parents: List[str],
+        categories: Sequence,
+        dtype: str = "float64",
+        mmap_dir: Optional[str] = None,
+        sample_weight: Optional[np.ndarray] = None,
+    ) -> "SparseCPT":
+        """
+        Count observed combinations of parents values without enumerating all of them.
+        :param categories: values of the node (order of columns of the table)
+        :param dtype: type of probabilities
+        :param mmap_dir: directory to store the table in (name_<uuid>.npy),
+        the table is memory-mapped then
+        :param sample_weight: weights of rows (counts of identical rows)
+        """
+        codes = Categorical(data[name], categories=categories).codes.astype(np.int64)
+        grouped = data.groupby(parents, sort=True)
+        groups = grouped.ngroup().values.astype(np.int64)
+        combinations = grouped.size().index
+
+        n_vals = len(categories)
+        counts = np.bincount(
+            groups * n_vals + codes,
+            weights=sample_weight,
+            minlength=len(combinations) * n_vals,
+        ).reshape(len(combinations), n_vals)
+        table = (counts / counts.sum(axis=1, keepdims=True)).astype(dtype)
+
+        if len(parents) == 1:
+            combinations = [(comb,) for comb in combinations]
+        keys = [str([str(i) for i in comb]) for comb in combinations]
+        parents_values = [[str(i) for i in data[p].unique()] for p in parents]
+        default = np.full(n_vals, 1 / n_vals)
+
+        return cls(parents_values, keys, cls._store(table, name, mmap_dir), default)
+
+    @classmethod
+    def from_index(
+        cls,
+        index: CountIndex,
+        name: str,
+        parents: List[str],
+        categories: Sequence,
+        dtype: str = "float64",
+        mmap_dir: Optional[str] = None,
+    ) -> "SparseCPT":
+        """
+        The same table as from_data counted from observed cells of a count index
+        (of the data with the same weights).
+        :param index: count index of the data
+        """
+        cells, counts = index.cells(parents + [name])
+        # cells are sorted by codes of parents, that is by sorted parents values
+        combinations, rows = np.unique(cells[:, :-1], axis=0, return_inverse=True)
+        columns = pd.Index(categories).get_indexer(index.values[name])[cells[:, -1]]
+
+        n_vals = len(categories)
+        table = np.zeros((combinations.shape[0], n_vals))
+        np.add.at(table, (rows.ravel(), columns), counts)
+        table = (table / table.sum(axis=1, keepdims=True)).astype(dtype)
+
+        values = [index.values[p] for p in parents]
+        keys = [
+            str([str(v[code]) for v, code in zip(values, codes)])
+            for codes in combinations
+        ]
+        parents_values = [
+            [str(i) for i in index.values[p][pd.unique(index.codes[p])]]
+            for p in parents
+        ]
+        default = np.full(n_vals, 1 / n_vals)
+        return cls(parents_values, keys, cls._store(table, name, mmap_dir), default)
+
+    @staticmethod
+    def _store(table: np.ndarray, name: str, mmap_dir: Optional[str]) -> np.ndarray:
+        """Save the table to mmap_dir and memory-map it (if mmap_dir is given)."""
+        if mmap_dir is None:
+            return table
+        os.makedirs(mmap_dir, exist_ok=True)
+        # tables of nodes with the same name (of other networks) don't collide
+        filename = f"{name.replace(' ', '_')}_{uuid.uuid4().hex}.npy"
+        path = os.path.join(mmap_dir, filename)
+        np.save(path, table)
+        return np.load(path, mmap_mode="r")
+
+    @classmethod
+    def _from_file(cls, parents_values, keys, path, default):
+        return cls(parents_values, keys, np.load(path, mmap_mode="r"), default)
+
+    def __reduce__(self):
+        filename = getattr(self.table, "filename", None)
+        if filename is not None:
+            # memory-mapped tables are opened again instead of being copied
+            return self._from_file, (
+                self.parents_values,
+                self.keys_list,
+                filename,
+                self.default,
+            )
+        return type(self), (
+            self.parents_values,
+            self.keys_list,
+            self.table,
+            self.default,
+        )
+
+    def _is_known(self, combination: Sequence[str]) -> bool:
+        return len(combination) == len(self._known) and all(
+            value in known for value, known in zip(combination, self._known)
+        )
+
+    def row(self, combination: Sequence[str]) -> Optional[np.ndarray]:
+        """
+        Probabilities for a combination of parents values (list of str),
+        None for unknown values.
+        """
+        i = self.index.get(str(list(combination)))
+        if i is not None:
+            return self.table[i]
+        if self._is_known(combination):
+            return self.default
+        return None
+
+    def rows(self, combinations: Sequence[Sequence[str]]) -> np.ndarray:
+        """
+        Matrix of probabilities for combinations, unknown ones get nan.
+        """
+        probs = np.full((len(combinations), self.default.shape[0]), np.nan)
+        for i, combination in enumerate(combinations):
+            dist = self.row(combination)
+            if dist is not None:
+                probs[i] = dist
+        return probs
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        i = self.index.get(key)
+        if i is not None:
+            return self.table[i]
+        try:
+            combination = ast.literal_eval(key)
+        except (ValueError, SyntaxError):
+            raise KeyError(key)
+        if isinstance(combination, list) and self._is_known(combination):
+            return self.default
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for combination in product(*self.parents_values):
+            yield str(list(combination))
+
+    def __len__(self) -> int:
+        return int(np.prod([len(values) for values in self.parents_values]))
+
+    def to_dict(self) -> dict:
+        """
+        Inflate to the cprob dict of DiscreteNode (e.g. to save in json).
+        """
+        default = self.default.tolist()
+        result = {key: list(default) for key in self}
+        result.update(zip(self.keys_list, self.table.tolist()))
+        return result
+
+    def __repr__(self):
+        return (
+            f"SparseCPT({len(self.keys_list)} observed of {len(self)} combinations, "
+            f"{self.table.dtype})"
+        )
@@ -0,0 +1,213 @@
+"""
+Bitmap count index of a dataset for repeated conjunctive count queries
+(joint counts of values of a few columns) of structure and parameter learning.
+Every (column, value) has a packed bitmap of rows, counts of a conjunction of
+values are popcounts of ANDs of bitmaps. Only non-empty conjunctions are
+extended by the next column and conjunctions of prefixes of queried columns
+are cached, so a family (child, *parents) extended by one more parent costs
+one AND of cached bitmaps. Columns of many values have no bitmaps, conjunctions
+with them or with many candidate combinations are grouped from codes of rows
+instead (in memory linear in the number of rows):
+
+    index = CountIndex(data)
+    cells, counts = index.cells(["Cancer", "Smoker", "Pollution"])
+"""
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Numbers of set bits of uint64 words (SWAR)."""
+    words = words - ((words >> np.uint64(1)) & _M1)
+    words = (words & _M2) + ((words >> np.uint64(2)) & _M2)
+    words = (words + (words >> np.uint64(4))) & _M4
+    return (words * _H01) >> np.uint64(56)
+
+
+class CountIndex(object):
+    """
+    Bitmap index of columns of a DataFrame (by names) or of a 2-D array
+    (by positions). Columns are coded (in sorted order of values) and given
+    bitmaps on their first query.
+    """
+
+    def __init__(
+        self,
+        data: Union[pd.DataFrame, np.ndarray],
+        weights: Optional[np.ndarray] = None,
+        max_card: int = 64,
+        max_cells: int = 256,
+        max_bytes: int = 2**28,
+    ):
+        """
+        :param weights: weights of rows (counts of identical rows), counts are sums
+        of weights then
+        :param max_card: columns of more values are not given bitmaps
+        :param max_cells: conjunctions are extended by ANDs of bitmaps while they have
+        at most max_cells candidate combinations, the rest are grouped from codes
+        :param max_bytes: size of cached conjunctions, the least recently used ones
+        are dropped above it
+        """
+        self.data = data
+        self.n = data.shape[0]
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        self.max_card = max_card
+        self.max_cells = max_cells
+        self.max_bytes = max_bytes
+        self.values = {}
+        self.codes = {}
+        self._bitmaps = {}
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+
+    def _column(self, column: Hashable) -> np.ndarray:
+        if isinstance(self.data, pd.DataFrame):
+            return self.data[column]
+        return self.data[:, column]
+
+    def _encode(self, column: Hashable) -> np.ndarray:
+        """Codes of rows of the column."""
+        if column not in self.codes:
+            codes, values = pd.factorize(
+                self._column(column), sort=True, use_na_sentinel=False
+            )
+            self.values[column] = np.asarray(values)
+            self.codes[column] = codes.astype(np.int64, copy=False)
+        return self.codes[column]
+
+    def card(self, column: Hashable) -> int:
+        self._encode(column)
+        return len(self.values[column])
+
+    def _pack(self, codes: np.ndarray, card: int) -> np.ndarray:
+        """Bitmaps of codes 0, ..., card - 1, row i is bit i % 64 of word i // 64."""
+        rows = np.arange(self.n)
+        bitmaps = np.zeros((card, -(-self.n // 64)), dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), (rows % 64).astype(np.uint64))
+        np.bitwise_or.at(bitmaps, (codes, rows // 64), bits)
+        return bitmaps
+
+    def bitmaps(self, column: Hashable) -> Optional[np.ndarray]:
+        """
+        Bitmaps of rows of values of the column (as rows of uint64 words),
+        None for columns of more than max_card values.
+        """
+        if column not in self._bitmaps:
+            codes, card = self._encode(column), self.card(column)
+            self._bitmaps[column] = (
+                self._pack(codes, card) if card <= self.max_card else None
+            )
+        return self._bitmaps[column]
+
+    def _counts(self, bitmaps: np.ndarray) -> np.ndarray:
+        if self.weights is None:
+            return popcount(bitmaps).sum(axis=1).astype(np.int64)
+        rows = np.unpackbits(
+            bitmaps.astype("<u8", copy=False).view(np.uint8),
+            axis=1,
+            count=self.n,
+            bitorder="little",
+        )
+        return rows @ self.weights
+
+    def _group(
+        self, columns: Tuple, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Codes of observed combinations of columns (in lexicographic order) and
+        labels of rows by them. rows are labels of the prefix columns[:-1] if known.
+        """
+        if rows is None:
+            rows, rest = self._encode(columns[0]), columns[1:]
+        else:
+            rest = columns[-1:]
+        first = np.arange(self.n)
+        for column in rest:
+            # labels stay below the number of rows, so they do not overflow
+            labels = rows * self.card(column) + self._encode(column)
+            _, first, rows = np.unique(labels, return_index=True, return_inverse=True)
+        keys = np.column_stack([self._encode(column)[first] for column in columns])
+        return keys, rows.ravel()
+
+    def _conjunction(self, columns: Tuple) -> Tuple:
+        """
+        Codes, bitmaps (None for grouped ones), labels of rows (None for ones with
+        bitmaps) and counts of non-empty conjunctions of values of columns.
+        """
+        if columns in self._cache:
+            self._cache.move_to_end(columns)
+            return self._cache[columns]
+        bitmaps = self.bitmaps(columns[-1])
+        card = self.card(columns[-1])
+        rows = None
+        if len(columns) == 1:
+            keys = np.arange(card)[:, None]
+            if bitmaps is None:
+                rows = self._encode(columns[0])
+        else:
+            prefix_keys, prefix, prefix_rows, _ = self._conjunction(columns[:-1])
+            if (
+                prefix is not None
+                and bitmaps is not None
+                and prefix_keys.shape[0] * card <= self.max_cells
+            ):
+                bitmaps = (prefix[:, None, :] & bitmaps[None, :, :]).reshape(
+                    -1, bitmaps.shape[1]
+                )
+                keys = np.column_stack(
+                    [
+                        np.repeat(prefix_keys, card, axis=0),
+                        np.tile(np.arange(card), prefix_keys.shape[0]),
+                    ]
+                )
+                nonempty = bitmaps.any(axis=1)
+                keys, bitmaps = keys[nonempty], bitmaps[nonempty]
+            else:
+                keys, rows = self._group(columns, prefix_rows)
+                bitmaps = None
+        if rows is None:
+            counts = self._counts(bitmaps)
+        else:
+            counts = np.bincount(rows, weights=self.weights, minlength=keys.shape[0])
+        entry = (keys, bitmaps, rows, counts)
+
+        self._cache[columns] = entry
+        self._cache_bytes += self._nbytes(entry)
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            self._cache_bytes -= self._nbytes(self._cache.popitem(last=False)[1])
+        return entry
+
+    @staticmethod
+    def _nbytes(entry: Tuple) -> int:
+        return sum(array.nbytes for array in entry if array is not None)
+
+    def cells(
+        self, columns: Sequence[Hashable], decode: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Observed combinations of values of columns (in lexicographic order of codes)
+        and their counts, the sparse contingency table of columns.
+        :param decode: return values of columns (of their common type) instead
+        of their codes
+        """
+        keys, _, _, counts = self._conjunction(tuple(columns))
+        if decode:
+            keys = np.column_stack(
+                [self.values[column][keys[:, i]] for i, column in enumerate(columns)]
+            )
+        return keys, counts
+
+    def table(self, columns: Sequence[Hashable]) -> np.ndarray:
+        """Dense contingency table of columns (axes in order of columns)."""
+        keys, counts = self.cells(columns)
+        table = np.zeros([self.card(column) for column in columns], dtype=counts.dtype)
+        table[tuple(keys.T)] = counts
+        return table
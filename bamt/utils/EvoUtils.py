@@ -1,4 +1,5 @@
 import random
+from typing import Dict, List
 
 import pandas as pd
 from golem.core.dag.convert import graph_structure_as_nx_graph
@@ -114,3 +115,52 @@ def has_only_whitelist_edges(graph, whitelist):
         if edge not in whitelist:
             raise ValueError("Graph contains non-whitelisted edges")
     return True
+
+
+def has_only_skeleton_edges(skeleton: Dict[str, List[str]]):
+    """Constraint of graphs: every edge joins neighbours of the skeleton."""
+
+    def has_only_skeleton_edges_rule(graph):
+        nx_graph, labels = graph_structure_as_nx_graph(graph)
+        for parent, child in nx_graph.edges():
+            if str(labels[parent]) not in skeleton.get(str(labels[child]), ()):
+                raise ValueError("Graph contains edges out of the skeleton")
+        return True
+
+    return has_only_skeleton_edges_rule
+
+
+def skeleton_mutation_add(skeleton: Dict[str, List[str]]):
+    """Mutation adding an edge between neighbours of the skeleton."""
+
+    def custom_mutation_add_skeleton(graph: CustomGraphModel, **kwargs):
+        nodes = {str(node): node for node in graph.nodes}
+        pairs = [
+            (nodes[child], nodes[parent])
+            for child in nodes
+            for parent in skeleton.get(child, [])
+            if parent in nodes
+        ]
+        if not pairs:
+            return graph
+        num_mut = 100
+        try:
+            for _ in range(num_mut):
+                random_node, other_random_node = random.choice(pairs)
+                if other_random_node in random_node.nodes_from:
+                    continue
+                nodes_not_cycling = random_node.descriptive_id not in [
+                    n.descriptive_id
+                    for n in ordered_subnodes_hierarchy(other_random_node)
+                ] and other_random_node.descriptive_id not in [
+                    n.descriptive_id for n in ordered_subnodes_hierarchy(random_node)
+                ]
+                if nodes_not_cycling:
+                    random_node.nodes_from.append(other_random_node)
+                    break
+
+        except Exception as ex:
+            print(f"Incorrect connection: {ex}")
+        return graph
+
+    return custom_mutation_add_skeleton
@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+
+from bamt.log import logger_network
+from bamt.utils.GraphUtils import toporder
+
+
+class LinearGaussian(object):
+    """
+    Joint multivariate normal distribution of a linear-Gaussian network.
+    Conditional distributions are computed in closed form, factorizations are cached
+    for every set of evidence nodes, so repeated queries with the same pattern
+    of evidence cost only matrix products.
+    """
+
+    def __init__(self, names: List[str], mean: np.ndarray, cov: np.ndarray):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.mean = mean
+        self.cov = cov
+        self._patterns = {}
+
+    @classmethod
+    def from_network(cls, bn) -> Optional["LinearGaussian"]:
+        """
+        Compile fitted Gaussian nodes with linear regressors into joint distribution:
+        x = c + Bx + e, so mean = (I - B)^-1 c and cov = (I - B)^-1 D (I - B)^-T,
+        where D is a diagonal of residual variances.
+
+        :return: joint distribution or None if some node is not linear-Gaussian
+        """
+        # nodes are compiled in topological order, so I - B is unit lower triangular
+        order = toporder(bn.nodes, bn.edges)
+        nodes = {node.name: node for node in bn.nodes}
+        index = {name: i for i, name in enumerate(order)}
+        n = len(order)
+        intercept = np.zeros(n)
+        coefs = np.zeros((n, n))
+        noise = np.zeros(n)
+        for i, name in enumerate(order):
+            node = nodes[name]
+            node_info = bn.distributions.get(node.name, {})
+            if not node.type.startswith("Gaussian") or node.disc_parents:
+                logger_network.error(
+                    f"Node {node.name} is not linear-Gaussian ({node.type})."
+                )
+                return None
+            if not node.cont_parents:
+                intercept[i] = node_info["mean"]
+                noise[i] = node_info["variance"]
+                continue
+
+            model = node_info["regressor_obj"]
+            if not hasattr(model, "coef_") or not hasattr(model, "intercept_"):
+                logger_network.error(
+                    f"Regressor of node {node.name} is not linear "
+                    f"({node_info['regressor']})."
+                )
+                return None
+            intercept[i] = np.ravel(model.intercept_)[0]
+            for parent, coef in zip(node.cont_parents, np.ravel(model.coef_)):
+                coefs[i, index[parent]] = coef
+            # for nodes with parents variance is stored as a standard deviation
+            noise[i] = node_info["variance"] ** 2
+
+        transform = solve_triangular(
+            np.eye(n) - coefs, np.eye(n), lower=True, unit_diagonal=True
+        )
+        mean = transform @ intercept
+        cov = (transform * noise) @ transform.T
+        # back to the order of nodes of the network
+        names = bn.nodes_names
+        positions = [index[name] for name in names]
+        return cls(names, mean[positions], cov[np.ix_(positions, positions)])
+
+    def _pattern(self, observed: Tuple[str, ...]) -> Dict[str, Any]:
+        """
+        Gain and conditional covariance of free nodes given observed ones.
+        """
+        if observed in self._patterns:
+            return self._patterns[observed]
+
+        obs = np.array([self.index[name] for name in observed], dtype=int)
+        free = np.array(
+            [i for i, name in enumerate(self.names) if name not in observed], dtype=int
+        )
+        cov_fo = self.cov[np.ix_(free, obs)]
+        cov_ff = self.cov[np.ix_(free, free)]
+        if obs.shape[0]:
+            cov_oo = self.cov[np.ix_(obs, obs)]
+            try:
+                gain = cho_solve(cho_factor(cov_oo, lower=True), cov_fo.T).T
+            except np.linalg.LinAlgError:
+                # degenerate evidence (e.g. nodes without noise)
+                gain = cov_fo @ np.linalg.pinv(cov_oo)
+            cov_ff = cov_ff - gain @ cov_fo.T
+        else:
+            gain = np.zeros((free.shape[0], 0))
+
+        pattern = {"obs": obs, "free": free, "gain": gain, "cov": cov_ff}
+        self._patterns[observed] = pattern
+        return pattern
+
+    def condition(
+        self, evidence: Dict[str, Any]
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Conditional distribution of nodes without evidence.
+        evidence: values for nodes (scalars or arrays with a value for every query)
+
+        :return: conditional means (a row for every query) and conditional covariance
+        (the same for all queries with this set of evidence nodes)
+        """
+        observed = tuple(name for name in self.names if name in evidence)
+        pattern = self._pattern(observed)
+        values = [
+            np.asarray(evidence[name], dtype=float).reshape(-1) for name in observed
+        ]
+        if observed:
+            n = max(value.shape[0] for value in values)
+            values = np.column_stack([np.broadcast_to(value, n) for value in values])
+            deviation = values - self.mean[pattern["obs"]]
+            means = self.mean[pattern["free"]] + deviation @ pattern["gain"].T
+        else:
+            means = self.mean[pattern["free"]][np.newaxis, :]
+
+        free = [self.names[i] for i in pattern["free"]]
+        return (
+            pd.DataFrame(means, columns=free),
+            pd.DataFrame(pattern["cov"], index=free, columns=free),
+        )
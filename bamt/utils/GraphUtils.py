@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple, Type
+from typing import Dict, List, Sequence, Set, Tuple, Type
 
 import networkx as nx
 from pandas import DataFrame
@@ -21,7 +21,7 @@ def nodes_types(data: DataFrame) -> Dict[str, str]:
 
     column_type = dict()
     for c in data.columns.to_list():
-        disc = ["str", "O", "b", "categorical", "object", "bool"]
+        disc = ["str", "O", "b", "categorical", "category", "object", "bool"]
         disc_numerical = ["int32", "int64"]
         cont = ["float32", "float64"]
         if data[c].dtype.name in disc:
@@ -65,13 +65,20 @@ def get_descriptor(data) -> Dict[str, Dict[str, str]]:
     return {"types": nodes_types(data), "signs": nodes_signs(nodes_types(data), data)}
 
 
-def toporder(nodes: List[Type[BaseNode]], edges: List[Tuple]) -> List[List[str]]:
+def toporder(
+    nodes: List[Type[BaseNode]], edges: List[Tuple], stable: bool = False
+) -> List[List[str]]:
     """
     Function for topological sorting
+    stable: keep the order of nodes where edges allow it
+    (nodes which are already sorted are not reordered)
     """
     G = nx.DiGraph()
     G.add_nodes_from([node.name for node in nodes])
     G.add_edges_from(edges)
+    if stable:
+        position = {node.name: i for i, node in enumerate(nodes)}
+        return list(nx.lexicographical_topological_sort(G, key=position.get))
     return list(nx.topological_sort(G))
 
 
@@ -84,6 +91,7 @@ class GraphAnalyzer(object):
         self.bn = bn
 
     def _isolate_structure(self, nodes):
+        nodes = set(nodes)
         isolated_edges = []
         for edge in self.bn.edges:
             if edge[0] in nodes and edge[1] in nodes:
@@ -156,3 +164,70 @@ class GraphAnalyzer(object):
         nodes = list(set(nodes + with_nodes))
 
         return {"nodes": nodes, "edges": self._isolate_structure(nodes + with_nodes)}
+
+    def _parents(self) -> Dict[str, List[str]]:
+        return {
+            node.name: node.cont_parents + node.disc_parents for node in self.bn.nodes
+        }
+
+    def _toporder(self, names: Set[str]) -> List[str]:
+        """Names in topological order (nodes of bn are not necessarily sorted)."""
+        order = toporder(self.bn.nodes, self.bn.edges, stable=True)
+        return [name for name in order if name in names]
+
+    def requisite_nodes(
+        self, targets: Sequence[str], evidence: Sequence[str], forward: bool = False
+    ) -> List[str]:
+        """
+        Minimal subnetwork to answer a query about targets given evidence.
+        Barren nodes (without targets and evidence among descendants) are dropped,
+        then nodes d-separated from targets by evidence (components of the moral
+        graph of the rest without evidence nodes, which don't contain targets).
+        :param forward: the query is forward propagation from parents to children,
+        so only ancestors of targets up to evidence nodes are needed.
+
+        :return: names of nodes in topological order
+        """
+        parents = self._parents()
+        evidence = set(evidence)
+
+        if forward:
+            required = set()
+            stack = list(targets)
+            while stack:
+                name = stack.pop()
+                if name in required:
+                    continue
+                required.add(name)
+                if name not in evidence:
+                    stack.extend(parents[name])
+            return self._toporder(required)
+
+        # ancestral set: the rest of nodes are barren
+        ancestral = set()
+        stack = list(targets) + list(evidence)
+        while stack:
+            name = stack.pop()
+            if name not in ancestral:
+                ancestral.add(name)
+                stack.extend(parents[name])
+
+        moral = {name: set() for name in ancestral}
+        for name in ancestral:
+            family = parents[name]
+            for parent in family:
+                moral[name].add(parent)
+                moral[parent].add(name)
+                moral[parent].update(p for p in family if p != parent)
+
+        # evidence nodes are reached but block paths
+        required = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in required:
+                continue
+            required.add(name)
+            if name not in evidence:
+                stack.extend(moral[name])
+        return self._toporder(required)
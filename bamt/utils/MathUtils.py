@@ -1,7 +1,9 @@
 import math
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from scipy import stats
+from scipy.special import logsumexp
 from scipy.stats.distributions import chi2
 from sklearn.mixture import GaussianMixture
 
@@ -122,6 +124,421 @@ def component(data, columns, method):
     return n
 
 
+def gmm_conditioning(priors, means, covariances) -> Dict[str, Any]:
+    """
+    Terms of conditioning of a gaussian mixture over [node, *parents] on parents
+    which don't depend on parents values (computed once for gmm_condition_batch).
+
+    :return: dict with coefficients of regression of node on parents, conditional
+    variances and terms of log-densities of parents in every component
+    """
+    priors = np.asarray(priors, dtype=float)
+    means = np.asarray(means, dtype=float)
+    covariances = np.asarray(covariances, dtype=float)
+    n_comp = priors.shape[0]
+    n_parents = means.shape[1] - 1
+
+    coefs = np.zeros((n_comp, n_parents))
+    variances = covariances[:, 0, 0].copy()
+    whitening = []
+    kernels = []
+    tolerances = np.zeros(n_comp)
+    with np.errstate(divide="ignore"):
+        log_norms = np.log(priors)
+    for k in range(n_comp):
+        if not n_parents:
+            whitening.append(np.zeros((0, 0)))
+            kernels.append(np.zeros((0, 0)))
+            continue
+        cov_xx = covariances[k, 1:, 1:]
+        cov_yx = covariances[k, 0, 1:]
+        coefs[k] = np.linalg.pinv(cov_xx) @ cov_yx
+        variances[k] = max(covariances[k, 0, 0] - cov_yx @ coefs[k], 0.0)
+        # pseudo-inverse of singular covariances (as multivariate_normal does),
+        # values out of the support of a singular component have zero density
+        spectrum, vectors = np.linalg.eigh(cov_xx)
+        eps = 1e6 * np.finfo(float).eps * np.abs(spectrum).max()
+        keep = spectrum > eps
+        whitening.append(vectors[:, keep] / np.sqrt(spectrum[keep]))
+        kernels.append(vectors[:, ~keep])
+        tolerances[k] = 1e3 * eps
+        log_norms[k] -= 0.5 * (
+            keep.sum() * np.log(2 * np.pi) + np.log(spectrum[keep]).sum()
+        )
+    return {
+        "priors": priors,
+        "means": means,
+        "coefs": coefs,
+        "variances": variances,
+        "whitening": whitening,
+        "kernels": kernels,
+        "tolerances": tolerances,
+        "log_norms": log_norms,
+    }
+
+
+def gmm_condition_batch(
+    priors,
+    means,
+    covariances,
+    pvals: np.ndarray,
+    conditioning: Optional[Dict[str, Any]] = None,
+):
+    """
+    Condition a gaussian mixture over [node, *parents] on parents values
+    for a batch of rows at once (row by row it is gmr.GMM.condition).
+
+    :param priors, means, covariances: mixture parameters
+    :param pvals: matrix of parents values (n_rows, n_parents), may have 0 columns
+    :param conditioning: precomputed gmm_conditioning of the mixture
+
+    :return: priors (n_rows, n_comp), means (n_rows, n_comp) and variances (n_comp,)
+    of conditional components.
+    """
+    if conditioning is None:
+        conditioning = gmm_conditioning(priors, means, covariances)
+    priors = conditioning["priors"]
+    means = conditioning["means"]
+    n_rows, n_parents = pvals.shape
+    n_comp = priors.shape[0]
+
+    if n_parents == 0:
+        return (
+            np.broadcast_to(priors, (n_rows, n_comp)),
+            np.broadcast_to(means[:, 0], (n_rows, n_comp)),
+            conditioning["variances"],
+        )
+
+    cond_means = np.empty((n_rows, n_comp))
+    log_priors = np.empty((n_rows, n_comp))
+    for k in range(n_comp):
+        deviation = pvals - means[k, 1:]
+        cond_means[:, k] = means[k, 0] + deviation @ conditioning["coefs"][k]
+        whitened = deviation @ conditioning["whitening"][k]
+        log_priors[:, k] = conditioning["log_norms"][k] - 0.5 * np.einsum(
+            "ij,ij->i", whitened, whitened
+        )
+        kernel = conditioning["kernels"][k]
+        if kernel.shape[1]:
+            residual = np.linalg.norm(deviation @ kernel, axis=1)
+            log_priors[residual >= conditioning["tolerances"][k], k] = -np.inf
+    log_priors -= logsumexp(log_priors, axis=1, keepdims=True)
+    return np.exp(log_priors), cond_means, conditioning["variances"]
+
+
+def truncnorm_positive(mean, std, n: int) -> np.ndarray:
+    """
+    Draw n values of normal distributions N(mean, std) truncated to [0, inf).
+    Degenerate distributions (std = 0) return mean as is.
+    """
+    mean = np.broadcast_to(np.asarray(mean, dtype=float), (n,))
+    std = np.broadcast_to(np.asarray(std, dtype=float), (n,))
+    values = mean.copy()
+    rows = (std > 0) & ~np.isnan(mean)
+    if rows.any():
+        values[rows] = stats.truncnorm.rvs(
+            -mean[rows] / std[rows], np.inf, loc=mean[rows], scale=std[rows]
+        )
+    return values
+
+
+def gmm_sample_batch(
+    priors: np.ndarray,
+    means: np.ndarray,
+    variances: np.ndarray,
+    positive: bool = False,
+):
+    """
+    Draw one value per row from one-dimensional mixtures given by gmm_condition_batch.
+    If positive, mixtures are truncated to [0, inf): components are chosen by their
+    mass over zero and drawn from truncated normals (nan if there is no such mass).
+    """
+    n_rows = priors.shape[0]
+    std = np.broadcast_to(np.sqrt(variances), means.shape)
+    if positive:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mass = np.where(std > 0, stats.norm.cdf(means / std), means >= 0)
+            priors = priors * mass
+            priors = priors / priors.sum(axis=1, keepdims=True)
+    cumulative = np.cumsum(priors, axis=1)
+    comp = (cumulative < np.random.random((n_rows, 1))).sum(axis=1)
+    comp = np.minimum(comp, priors.shape[1] - 1)
+    rows = np.arange(n_rows)
+    if positive:
+        values = truncnorm_positive(means[rows, comp], std[rows, comp], n_rows)
+        values[np.isnan(cumulative[:, -1])] = np.nan
+        return values
+    return means[rows, comp] + std[rows, comp] * np.random.standard_normal(n_rows)
+
+
+def norm_logpdf(values, mean, std) -> np.ndarray:
+    """
+    Log-density of normal distributions.
+    Degenerate distributions (std = 0) are point masses: 0 at mean, -inf elsewhere.
+    """
+    values, mean, std = np.broadcast_arrays(
+        np.asarray(values, dtype=float),
+        np.asarray(mean, dtype=float),
+        np.asarray(std, dtype=float),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_pdf = stats.norm.logpdf(values, mean, std)
+    degenerate = std == 0
+    log_pdf[degenerate] = np.where(values[degenerate] == mean[degenerate], 0, -np.inf)
+    return log_pdf
+
+
+def gmm_logpdf_batch(
+    priors: np.ndarray, means: np.ndarray, variances: np.ndarray, values: np.ndarray
+) -> np.ndarray:
+    """
+    Log-density of value in every row under one-dimensional mixtures
+    given by gmm_condition_batch.
+    """
+    std = np.broadcast_to(np.sqrt(variances), means.shape)
+    with np.errstate(divide="ignore"):
+        log_priors = np.log(priors)
+    log_pdf = norm_logpdf(values[:, np.newaxis], means, std)
+    return logsumexp(log_priors + log_pdf, axis=1)
+
+
+def entropy_counts(counts: np.ndarray) -> float:
+    """Entropy (bits) of the distribution given by a table of counts."""
+    counts = counts[counts > 0]
+    p = counts / counts.sum()
+    return float(-np.sum(p * np.log2(p)))
+
+
+class FamilyTable(object):
+    """
+    Joint counts of a node and its parents (columns of integer codes) and
+    entropies of its marginals. Marginals are summed out of the joint table,
+    or counted directly if the joint table would be larger than max_size.
+    """
+
+    max_size = 2**22
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        cards: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+    ):
+        """
+        :param codes: rows x family members, values in [0, cards)
+        :param weights: weights of rows (counts of identical rows), None for ones
+        """
+        self.codes = codes
+        self.cards = np.asarray(cards)
+        self.weights = weights
+        self.joint = None
+        if np.prod(self.cards, dtype=float) <= self.max_size:
+            index = np.ravel_multi_index(codes.T, self.cards)
+            self.joint = np.bincount(
+                index, weights=weights, minlength=int(np.prod(self.cards))
+            )
+            self.joint = self.joint.reshape(self.cards)
+        self._entropies = {}
+
+    def marginal(self, axes: Tuple[int, ...]) -> np.ndarray:
+        if self.joint is not None:
+            drop = tuple(i for i in range(self.cards.shape[0]) if i not in axes)
+            return self.joint.sum(axis=drop)
+        cards = self.cards[list(axes)]
+        index = np.ravel_multi_index(self.codes[:, list(axes)].T, cards)
+        return np.bincount(index, weights=self.weights, minlength=int(np.prod(cards)))
+
+    def entropy(self, *axes: int) -> float:
+        axes = tuple(sorted(axes))
+        if axes not in self._entropies:
+            self._entropies[axes] = entropy_counts(self.marginal(axes).ravel())
+        return self._entropies[axes]
+
+    def link_strengths(self) -> List[float]:
+        """
+        Strength of links from parents (axes 1, 2, ...) to the node (axis 0):
+        I(node; parent) / H(node) for one parent, otherwise average over other parents
+        of I(node; parent | other) divided by average of H(node | other).
+        """
+        n_parents = self.cards.shape[0] - 1
+        if n_parents == 1:
+            mi = self.entropy(0) + self.entropy(1) - self.entropy(0, 1)
+            return [np.float64(mi) / self.entropy(0)]
+        strengths = []
+        for parent in range(1, n_parents + 1):
+            others = [i for i in range(1, n_parents + 1) if i != parent]
+            cmi = [
+                self.entropy(0, other)
+                + self.entropy(parent, other)
+                - self.entropy(0, parent, other)
+                - self.entropy(other)
+                for other in others
+            ]
+            conditional_entropy = [
+                self.entropy(0, other) - self.entropy(other) for other in others
+            ]
+            strengths.append(np.mean(cmi) / (np.mean(conditional_entropy) + 1e-8))
+        return strengths
+
+
+def _xlogx(counts: np.ndarray) -> np.ndarray:
+    counts = counts.astype(float)
+    return counts * np.log(np.where(counts > 0, counts, 1))
+
+
+def _one_hot(codes: np.ndarray, cards: np.ndarray, columns: np.ndarray, dtype):
+    offsets = np.concatenate([[0], np.cumsum(cards[columns])[:-1]])
+    matrix = np.zeros((codes.shape[0], int(cards[columns].sum())), dtype=dtype)
+    matrix[np.arange(codes.shape[0])[:, None], codes[:, columns] + offsets] = 1
+    return matrix, offsets
+
+
+def _joint_xlogx_blocks(
+    codes: np.ndarray,
+    cards: np.ndarray,
+    left: np.ndarray,
+    right: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Sums of c * log(c) over joint tables of pairs of left and right columns,
+    the tables are blocks of the product of one-hot matrices.
+    """
+    n = codes.shape[0]
+    # sums of zeros and ones are exact in float32 up to 2 ** 24
+    dtype = np.float32 if n < 2**24 and weights is None else np.float64
+    rows = max(1, 2**23 // int(cards[left].sum() + cards[right].sum()))
+    counts = 0
+    for start in range(0, n, rows):
+        chunk = codes[start : start + rows]
+        left_matrix, left_offsets = _one_hot(chunk, cards, left, dtype)
+        right_matrix, right_offsets = _one_hot(chunk, cards, right, dtype)
+        if weights is not None:
+            left_matrix *= weights[start : start + rows, None]
+        counts = counts + (left_matrix.T @ right_matrix).astype(float)
+    counts = np.add.reduceat(_xlogx(counts), left_offsets, axis=0)
+    return np.add.reduceat(counts, right_offsets, axis=1)
+
+
+def _joint_xlogx_row(
+    codes: np.ndarray,
+    cards: np.ndarray,
+    i: int,
+    others: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Sums of c * log(c) over joint tables of column i with other columns."""
+    n = codes.shape[0]
+    sizes = cards[i] * cards[others]
+    result = np.empty(others.shape[0])
+
+    # tables not larger than the data are counted together, one after another
+    dense = np.flatnonzero(sizes <= n)
+    block = max(1, 2**22 // n)
+    for start in range(0, dense.shape[0], block):
+        chunk = dense[start : start + block]
+        columns = others[chunk]
+        offsets = np.concatenate([[0], np.cumsum(sizes[chunk])[:-1]])
+        index = codes[:, i, None] * cards[columns] + codes[:, columns] + offsets
+        counts = np.bincount(
+            index.ravel(),
+            weights=None if weights is None else np.repeat(weights, chunk.shape[0]),
+            minlength=int(sizes[chunk].sum()),
+        )
+        result[chunk] = np.add.reduceat(_xlogx(counts), offsets)
+    for k in np.flatnonzero(sizes > n):
+        index = codes[:, i] * cards[others[k]] + codes[:, others[k]]
+        if weights is None:
+            counts = np.unique(index, return_counts=True)[1]
+        else:
+            inverse = np.unique(index, return_inverse=True)[1]
+            counts = np.bincount(inverse.ravel(), weights=weights)
+        result[k] = _xlogx(counts).sum()
+    return result
+
+
+def mutual_information_matrix(
+    codes: np.ndarray,
+    cards: np.ndarray,
+    n_jobs: int = 1,
+    max_card: int = 16,
+    weights: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Pairwise mutual information (nats, as sklearn mutual_info_score) of columns
+    of integer codes, entropies are on the diagonal. Every pair is counted once:
+    joint tables of pairs of columns with at most max_card values are blocks of
+    products of one-hot matrices, the others are counted with bincount.
+    Blocks and rows of the matrix are computed by threads.
+    :param codes: rows x columns, values in [0, cards)
+    :param weights: weights of rows (counts of identical rows), None for ones
+    """
+    from joblib import Parallel, delayed
+
+    m = codes.shape[1]
+    n = codes.shape[0] if weights is None else np.sum(weights)
+    codes = codes.astype(np.int64)
+    cards = np.asarray(cards, dtype=np.int64)
+    wide = cards > max_card
+    narrow = np.flatnonzero(~wide)
+    width = max(1, 2048 // int(cards[narrow].max())) if narrow.shape[0] else 1
+    blocks = [narrow[start : start + width] for start in range(0, len(narrow), width)]
+    pairs = [(p, q) for p in range(len(blocks)) for q in range(p, len(blocks))]
+    rows = []
+    for i in range(m - 1):
+        others = np.arange(i + 1, m)
+        others = others if wide[i] else others[wide[others]]
+        if others.shape[0]:
+            rows.append((i, others))
+
+    parallel = Parallel(n_jobs=n_jobs, prefer="threads")
+    joint = np.empty((m, m))
+    for (p, q), values in zip(
+        pairs,
+        parallel(
+            delayed(_joint_xlogx_blocks)(codes, cards, blocks[p], blocks[q], weights)
+            for p, q in pairs
+        ),
+    ):
+        joint[np.ix_(blocks[p], blocks[q])] = values
+        joint[np.ix_(blocks[q], blocks[p])] = values.T
+    for (i, others), values in zip(
+        rows,
+        parallel(
+            delayed(_joint_xlogx_row)(codes, cards, i, others, weights)
+            for i, others in rows
+        ),
+    ):
+        joint[i, others] = joint[others, i] = values
+
+    entropies = np.array(
+        [
+            np.log(n) - _xlogx(np.bincount(codes[:, j], weights=weights)).sum() / n
+            for j in range(m)
+        ]
+    )
+    matrix = entropies[:, None] + entropies[None, :] - (np.log(n) - joint / n)
+    matrix = np.clip(matrix, 0, None)
+    np.fill_diagonal(matrix, entropies)
+    return matrix
+
+
+def gelman_rubin(draws: np.ndarray) -> float:
+    """
+    Gelman-Rubin potential scale reduction factor for draws (draws x chains).
+    Values close to 1 mean that chains have mixed.
+    """
+    n_draws, n_chains = draws.shape
+    if n_draws < 2 or n_chains < 2:
+        return np.nan
+    within = np.nanvar(draws, axis=0, ddof=1).mean()
+    between = n_draws * np.nanvar(np.nanmean(draws, axis=0), ddof=1)
+    if not within > 0:
+        return np.nan
+    pooled = (n_draws - 1) / n_draws * within + between / n_draws
+    return float(np.sqrt(pooled / within))
+
+
 def _child_dict(net: list):
     res_dict = dict()
     for e0, e1 in net:
@@ -150,6 +567,8 @@ def precision_recall(pred_net: list, true_net: list, decimal=4):
     pred_len = len(pred_net)
     true_len = len(true_net)
     shd = pred_len + true_len - corr_undirected - corr_dir
+    # empty networks (e.g. learnt on independent nodes) get zero scores
+    pred_len, true_len = max(pred_len, 1), max(true_len, 1)
     return {
         "AP": round(corr_undirected / pred_len, decimal),
         "AR": round(corr_undirected / true_len, decimal),
@@ -0,0 +1,225 @@
+from typing import Dict, Tuple, Any, Union, Optional, Sequence
+
+import numpy as np
+from tqdm import tqdm
+
+from bamt.log import logger_network
+from bamt.nodes.schema import CodedColumn
+from bamt.utils.GraphUtils import GraphAnalyzer
+from bamt.utils.MathUtils import gelman_rubin
+
+
+class GibbsSampler(object):
+    """
+    Gibbs sampler over a fitted network.
+    Every row of a batch is a separate chain, one step updates a node in all chains at once
+    given its Markov blanket. Discrete nodes are drawn from the exact full conditional,
+    continuous nodes make a Metropolis step with proposal from their own distribution,
+    so only likelihoods of children decide on acceptance.
+    Sampling can be restricted to a subnetwork (e.g. from GraphAnalyzer.requisite_nodes)
+    which contains parents of all its nodes without evidence.
+    """
+
+    def __init__(self, bn, nodes: Optional[Sequence[str]] = None):
+        self.bn = bn
+        plan = bn.compile()
+        nodes = set(plan.names if nodes is None else nodes)
+        self.nodes = [node for node in plan.nodes if node.name in nodes]
+        self.params = {
+            name: node_info
+            for name, node_info in zip(plan.names, plan.params)
+            if name in nodes
+        }
+        analyzer = GraphAnalyzer(bn)
+        self.children = {}
+        for node in self.nodes:
+            blanket = analyzer.markov_blanket(node.name)
+            self.children[node.name] = [
+                child
+                for parent, child in blanket["edges"]
+                if parent == node.name and child in nodes
+            ]
+
+    def _children_log_prob(
+        self, node_name: str, columns: Dict[str, Union[np.ndarray, CodedColumn]]
+    ) -> np.ndarray:
+        log_prob = 0
+        for child in self.children[node_name]:
+            log_prob = log_prob + self.bn[child].log_prob_batch(
+                self.params[child], columns
+            )
+        return log_prob
+
+    def _update_discrete(
+        self, node, columns: Dict[str, Union[np.ndarray, CodedColumn]]
+    ):
+        node_info = self.params[node.name]
+        codes = columns[node.name].codes
+        current = codes.copy()
+        if not self.children[node.name]:
+            node.choose_batch(node_info, columns, codes)
+            codes[codes < 0] = current[codes < 0]
+            return
+
+        log_probs = np.empty((codes.shape[0], len(columns[node.name].categories)))
+        for code in range(log_probs.shape[1]):
+            codes[:] = code
+            log_probs[:, code] = node.log_prob_batch(
+                node_info, columns
+            ) + self._children_log_prob(node.name, columns)
+        log_probs[np.isnan(log_probs)] = -np.inf
+
+        codes[:] = current
+        rows = np.isfinite(log_probs).any(axis=1)
+        probs = np.exp(log_probs[rows] - log_probs[rows].max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        codes[rows] = node._sample_codes(probs)
+
+    def _update_continuous(
+        self,
+        node,
+        columns: Dict[str, Union[np.ndarray, CodedColumn]],
+        positive: bool,
+    ) -> int:
+        """
+        :return: number of accepted proposals
+        """
+        node_info = self.params[node.name]
+        values = columns[node.name]
+        proposal = np.empty(values.shape[0])
+        if positive:
+            node.choose_batch(node_info, columns, proposal, positive=True)
+        else:
+            node.choose_batch(node_info, columns, proposal)
+
+        accept = ~np.isnan(proposal)
+        if self.children[node.name]:
+            current = values.copy()
+            log_old = self._children_log_prob(node.name, columns)
+            values[:] = proposal
+            log_new = self._children_log_prob(node.name, columns)
+            values[:] = current
+
+            log_old = np.where(np.isnan(log_old), -np.inf, log_old)
+            log_new = np.where(np.isnan(log_new), -np.inf, log_new)
+            with np.errstate(invalid="ignore"):
+                log_ratio = log_new - log_old
+            accept &= np.log(np.random.random(values.shape[0])) < np.nan_to_num(
+                log_ratio, nan=-np.inf
+            )
+        values[accept] = proposal[accept]
+        return int(accept.sum())
+
+    def _init_chains(
+        self,
+        columns: Dict[str, Union[np.ndarray, CodedColumn]],
+        evidence: Dict[str, Any],
+        positive: list,
+        max_tries: int = 10,
+    ):
+        """
+        Start chains from forward samples, chains which can't be sampled are drawn again.
+        """
+        rows = np.arange(self.bn._batch_size(columns))
+        for _ in range(max_tries):
+            batch = self.bn._slice_columns(columns, rows)
+            self.bn._fill_columns(batch, skip=evidence.keys(), positive=positive)
+            for name, column in batch.items():
+                if isinstance(column, CodedColumn):
+                    columns[name].codes[rows] = column.codes
+                else:
+                    columns[name][rows] = column
+            rows = rows[~self.bn._valid_rows(batch)]
+            if not rows.shape[0]:
+                return
+        logger_network.warning(
+            f"{rows.shape[0]} chains can't be started with given evidence."
+        )
+
+    def run(
+        self,
+        evidence: Dict[str, Any],
+        n_chains: int,
+        n_iter: int = 500,
+        burn_in: int = 100,
+        thin: int = 1,
+        filter_neg: bool = True,
+        progress_bar: bool = False,
+    ) -> Tuple[
+        Dict[str, Union[np.ndarray, CodedColumn]], Dict[str, Dict[str, float]]
+    ]:
+        """
+        Run n_chains chains for burn_in + n_iter sweeps over nodes without evidence.
+        evidence: values for nodes (scalars or arrays with a value for every chain)
+        thin: keep every thin-th sweep after burn-in
+
+        :return: draws of nodes as arrays (draws x chains), codes for discrete nodes,
+        and diagnostics: Gelman-Rubin statistic (r_hat) of continuous nodes
+        (meaningful if chains share evidence) and acceptance rate of Metropolis steps.
+        """
+        free = [node for node in self.nodes if node.name not in evidence]
+        positive = []
+        if filter_neg:
+            positive = [
+                node.name
+                for node in free
+                if not self.bn._is_discrete(node.name)
+                and self.bn.descriptor["signs"].get(node.name) == "pos"
+            ]
+
+        columns = self.bn._allocate_columns(
+            n_chains, evidence, [node.name for node in self.nodes]
+        )
+        self._init_chains(columns, evidence, positive)
+
+        n_draws = (n_iter + thin - 1) // thin
+        draws = {}
+        for name, column in columns.items():
+            if isinstance(column, CodedColumn):
+                draws[name] = CodedColumn(
+                    np.broadcast_to(column.codes, (n_draws, n_chains)).copy(),
+                    column.categories,
+                )
+            else:
+                draws[name] = np.broadcast_to(column, (n_draws, n_chains)).copy()
+
+        accepted = {
+            node.name: 0
+            for node in free
+            if not self.bn._is_discrete(node.name) and self.children[node.name]
+        }
+        sweeps = range(burn_in + n_iter)
+        if progress_bar:
+            sweeps = tqdm(sweeps, position=0, leave=True)
+        for sweep in sweeps:
+            for node in free:
+                if self.bn._is_discrete(node.name):
+                    self._update_discrete(node, columns)
+                else:
+                    n_accepted = self._update_continuous(
+                        node, columns, node.name in positive
+                    )
+                    if node.name in accepted and sweep >= burn_in:
+                        accepted[node.name] += n_accepted
+
+            if sweep >= burn_in and (sweep - burn_in) % thin == 0:
+                draw = (sweep - burn_in) // thin
+                for node in free:
+                    column = columns[node.name]
+                    if isinstance(column, CodedColumn):
+                        draws[node.name].codes[draw] = column.codes
+                    else:
+                        draws[node.name][draw] = column
+
+        diagnostics = {
+            "r_hat": {
+                node.name: gelman_rubin(draws[node.name])
+                for node in free
+                if not self.bn._is_discrete(node.name)
+            },
+            "acceptance": {
+                name: count / max(n_iter * n_chains, 1)
+                for name, count in accepted.items()
+            },
+        }
+        return draws, diagnostics
@@ -0,0 +1,253 @@
+"""
+Constraint-based skeleton discovery: PC-stable and MMPC with conditional
+independence tests over BAMT node types. Discrete tests (G or chi-square)
+run on integer codes, tests of only continuous nodes are Fisher z tests of
+partial correlations. The skeleton restricts score-based search (hybrid MMHC):
+
+    neighbours = skeleton(data, info["types"], method="MMPC")
+    bn.add_edges(data, params={"candidates": neighbours})
+"""
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import stats
+
+
+class CITester(object):
+    """
+    Conditional independence tests of columns of the data (by their positions).
+    Data is coded into integers and the correlation matrix is computed once.
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        types: Dict[str, str],
+        statistic: str = "g2",
+        n_bins: int = 5,
+    ):
+        """
+        :param types: types of nodes (cont, disc, disc_num)
+        :param statistic: statistic of discrete tests, "g2" or "chi2"
+        :param n_bins: continuous nodes with more values are coded by quantile bins
+        in discrete tests (with discrete nodes)
+        """
+        self.n = data.shape[0]
+        self.statistic = statistic
+        self.continuous = np.array([types[c] == "cont" for c in data.columns])
+        codes = []
+        for c, continuous in zip(data.columns, self.continuous):
+            column = data[c]
+            if continuous and column.nunique() > n_bins:
+                column = pd.qcut(column.rank(method="first"), n_bins)
+            codes.append(pd.factorize(column, use_na_sentinel=False)[0])
+        self.codes = np.column_stack(codes)
+        self.corr = None
+        if self.continuous.any():
+            values = data.loc[:, self.continuous].to_numpy(dtype=float)
+            self.corr = np.full((data.shape[1], data.shape[1]), np.nan)
+            index = np.flatnonzero(self.continuous)
+            self.corr[np.ix_(index, index)] = np.atleast_2d(
+                np.corrcoef(values, rowvar=False)
+            )
+
+    def _cells(self, columns: Sequence[int]) -> np.ndarray:
+        """Codes of observed combinations of values of columns."""
+        if not len(columns):
+            return np.zeros(self.n, dtype=np.int64)
+        key = self.codes[:, columns[0]].astype(np.int64)
+        for column in columns[1:]:
+            key = key * (self.codes[:, column].max() + 1) + self.codes[:, column]
+            key = pd.factorize(key)[0]
+        return key
+
+    def discrete(self, x: int, y: int, z: Sequence[int]) -> float:
+        """p-value of G or chi-square test of x and y independence given z."""
+        z_cells = self._cells(list(z))
+        xz = pd.factorize(z_cells * (self.codes[:, x].max() + 1) + self.codes[:, x])[0]
+        yz = pd.factorize(z_cells * (self.codes[:, y].max() + 1) + self.codes[:, y])[0]
+        xyz = pd.factorize(xz.astype(np.int64) * (yz.max() + 1) + yz)[0]
+
+        # counts of the cell, z, xz and yz of every row
+        n_xyz = np.bincount(xyz)[xyz]
+        n_z = np.bincount(z_cells)[z_cells]
+        ratio = n_xyz * n_z / (np.bincount(xz)[xz] * np.bincount(yz)[yz])
+        if self.statistic == "chi2":
+            # sum over cells of (n - e) ** 2 / e is sum over rows of n / e - n
+            value = ratio.sum() - self.n
+        else:
+            value = 2 * np.log(ratio).sum()
+
+        n_x = np.unique(self.codes[:, x]).shape[0]
+        n_y = np.unique(self.codes[:, y]).shape[0]
+        dof = max((n_x - 1) * (n_y - 1) * (z_cells.max() + 1), 1)
+        return float(stats.chi2.sf(value, dof))
+
+    def partial_correlation(self, x: int, y: int, zs: Sequence[Tuple]) -> np.ndarray:
+        """
+        p-values of Fisher z tests of x and y given each of conditioning sets
+        (of the same size, continuous nodes).
+        """
+        index = np.array([(x, y) + tuple(z) for z in zs])
+        sub = self.corr[index[:, :, None], index[:, None, :]]
+        precision = np.linalg.pinv(sub)
+        r = -precision[:, 0, 1] / np.sqrt(precision[:, 0, 0] * precision[:, 1, 1])
+        r = np.clip(r, -1 + 1e-12, 1 - 1e-12)
+        dof = max(self.n - index.shape[1] - 1, 1)
+        z_stat = np.sqrt(dof) * np.arctanh(r)
+        return 2 * stats.norm.sf(np.abs(z_stat))
+
+    def separate(
+        self, x: int, y: int, zs: Sequence[Tuple], alpha: float
+    ) -> Optional[Tuple]:
+        """
+        A conditioning set making x and y independent (at alpha) or None.
+        Tests of continuous nodes are computed in one batch (the set with the highest
+        p-value is taken), discrete ones stop at the first independence.
+        """
+        continuous = self.continuous[[x, y]].all()
+        batch = [z for z in zs if continuous and self.continuous[list(z)].all()]
+        if batch:
+            p_values = self.partial_correlation(x, y, batch)
+            if p_values.max() > alpha:
+                return batch[int(np.argmax(p_values))]
+        for z in zs:
+            if not (continuous and self.continuous[list(z)].all()):
+                if self.discrete(x, y, z) > alpha:
+                    return z
+        return None
+
+    def p_value(self, x: int, y: int, z: Tuple) -> float:
+        if self.continuous[[x, y]].all() and self.continuous[list(z)].all():
+            return float(self.partial_correlation(x, y, [z])[0])
+        return self.discrete(x, y, z)
+
+
+def pc_stable(
+    tester: CITester, alpha: float = 0.05, max_cond: int = 3, n_jobs: int = 1
+) -> Tuple[List[set], Dict[Tuple[int, int], Tuple]]:
+    """
+    Skeleton phase of PC-stable: on each level (size of conditioning sets)
+    adjacencies are fixed, edges are tested in parallel and removed after the level.
+    :return: adjacency sets of columns and separating sets of removed edges
+    """
+    m = tester.codes.shape[1]
+    adjacency = [set(range(m)) - {i} for i in range(m)]
+    sepsets = {}
+    parallel = Parallel(n_jobs=n_jobs, prefer="threads")
+    for level in range(max_cond + 1):
+        frozen = [sorted(a) for a in adjacency]
+        edges = [
+            (x, y)
+            for x in range(m)
+            for y in frozen[x]
+            if x < y and max(len(frozen[x]), len(frozen[y])) - 1 >= level
+        ]
+        if not edges:
+            break
+
+        def conditioning_sets(x, y):
+            sets = list(combinations([a for a in frozen[x] if a != y], level))
+            seen = set(sets)
+            sets += [
+                z
+                for z in combinations([a for a in frozen[y] if a != x], level)
+                if z not in seen
+            ]
+            return sets
+
+        results = parallel(
+            delayed(tester.separate)(x, y, conditioning_sets(x, y), alpha)
+            for x, y in edges
+        )
+        for (x, y), z in zip(edges, results):
+            if z is not None:
+                adjacency[x].discard(y)
+                adjacency[y].discard(x)
+                sepsets[(x, y)] = z
+    return adjacency, sepsets
+
+
+def _mmpc_target(tester: CITester, t: int, alpha: float, max_cond: int) -> List[int]:
+    """Parents and children of t by MMPC (forward max-min heuristic, then backward)."""
+    m = tester.codes.shape[1]
+    # max p-value over tested conditioning sets is the min association
+    p_max = {x: tester.p_value(x, t, ()) for x in range(m) if x != t}
+    remaining = {x for x, p in p_max.items() if p <= alpha}
+    cpc = []
+    while remaining:
+        best = min(remaining, key=lambda x: (p_max[x], x))
+        remaining.discard(best)
+        cpc.append(best)
+        for x in sorted(remaining):
+            others = cpc[:-1]
+            for size in range(min(max_cond - 1, len(others)) + 1):
+                for z in combinations(others, size):
+                    p_max[x] = max(p_max[x], tester.p_value(x, t, z + (best,)))
+                    if p_max[x] > alpha:
+                        break
+                if p_max[x] > alpha:
+                    break
+        remaining = {x for x in remaining if p_max[x] <= alpha}
+
+    for x in list(cpc):
+        others = [c for c in cpc if c != x]
+        independent = any(
+            tester.p_value(x, t, z) > alpha
+            for size in range(1, min(max_cond, len(others)) + 1)
+            for z in combinations(others, size)
+        )
+        if independent:
+            cpc.remove(x)
+    return cpc
+
+
+def mmpc(
+    tester: CITester, alpha: float = 0.05, max_cond: int = 3, n_jobs: int = 1
+) -> List[set]:
+    """
+    Skeleton by MMPC: parents and children of every node are found in parallel,
+    x and y are adjacent if each is in the set of the other.
+    """
+    m = tester.codes.shape[1]
+    pc = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_mmpc_target)(tester, t, alpha, max_cond) for t in range(m)
+    )
+    return [{x for x in pc[t] if t in pc[x]} for t in range(m)]
+
+
+def skeleton(
+    data: pd.DataFrame,
+    types: Dict[str, str],
+    method: str = "PC",
+    alpha: float = 0.05,
+    max_cond: int = 3,
+    statistic: str = "g2",
+    n_bins: int = 5,
+    n_jobs: int = 1,
+) -> Dict[str, List[str]]:
+    """
+    Undirected skeleton of the data as neighbours of nodes.
+    :param types: types of nodes (descriptor["types"])
+    :param method: "PC" (PC-stable) or "MMPC"
+    :param alpha: significance level of tests
+    :param max_cond: maximal size of conditioning sets
+    :param statistic: statistic of discrete tests, "g2" or "chi2"
+    :param n_bins: number of quantile bins of continuous nodes in discrete tests
+    :param n_jobs: number of threads testing edges (nodes for MMPC)
+    """
+    tester = CITester(data, types, statistic, n_bins)
+    if method == "PC":
+        adjacency, _ = pc_stable(tester, alpha, max_cond, n_jobs)
+    elif method == "MMPC":
+        adjacency = mmpc(tester, alpha, max_cond, n_jobs)
+    else:
+        raise ValueError(f"Unknown skeleton method {method}")
+    columns = data.columns.to_list()
+    return {
+        columns[i]: [columns[j] for j in sorted(neighbours)]
+        for i, neighbours in enumerate(adjacency)
+    }
@@ -0,0 +1,236 @@
+"""
+Random networks with known structure and parameters, and large datasets sampled
+from them, for scaling tests of structure learning, parameters learning and inference.
+
+    bn = random_network(500, max_in_degree=3, disc_share=0.5, seed=1)
+    data = synthetic_data(bn, 10**6, seed=1)
+    ...
+    precision_recall(learnt_bn.edges, bn.edges)
+"""
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+
+def random_dag(
+    n_nodes: int,
+    max_in_degree: int = 3,
+    disc_share: float = 0.5,
+    logit_share: float = 0.0,
+    seed: Optional[int] = None,
+    prefix: str = "X",
+) -> Tuple[Dict[str, Dict[str, str]], List[Tuple[str, str]]]:
+    """
+    Random DAG: nodes are named prefix0, prefix1, ... in topological order,
+    each node takes from 0 to max_in_degree parents among previous nodes.
+    :param disc_share: share of discrete nodes
+    :param logit_share: share of discrete nodes that can have continuous parents
+    (logit nodes), other discrete nodes have only discrete parents
+    :return: info (descriptor with types and signs) and edges
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"{prefix}{i}" for i in range(n_nodes)]
+    is_disc = rng.random(n_nodes) < disc_share
+    logit = rng.random(n_nodes) < logit_share
+    info = {
+        "types": {n: "disc" if d else "cont" for n, d in zip(names, is_disc)},
+        "signs": {n: "neg" for n, d in zip(names, is_disc) if not d},
+    }
+
+    edges = []
+    disc_before = []
+    for i, name in enumerate(names):
+        candidates = disc_before if is_disc[i] and not logit[i] else range(i)
+        k = min(rng.integers(0, max_in_degree + 1), len(candidates))
+        if k:
+            parents = rng.choice(len(candidates), size=k, replace=False)
+            edges.extend((names[candidates[j]], name) for j in sorted(parents))
+        if is_disc[i]:
+            disc_before.append(i)
+    return info, edges
+
+
+def _linear(rng, node, n_features: int, classes: Optional[List[str]] = None):
+    """Regressor (classifier if classes are given) of the node, random coefficients."""
+    if classes is None:
+        model = clone(node.regressor)
+        # sum of parents is scaled to keep variance bounded along the chains
+        model.coef_ = rng.uniform(0.5, 1.5, n_features) * rng.choice(
+            [-1, 1], n_features
+        ) / n_features
+        model.intercept_ = rng.normal(0, 1)
+    else:
+        model = clone(node.classifier)
+        rows = 1 if len(classes) == 2 else len(classes)
+        model.coef_ = rng.normal(0, 1, (rows, n_features))
+        model.intercept_ = rng.normal(0, 1, rows)
+        model.classes_ = np.array(classes)
+    model.n_features_in_ = n_features
+    return model
+
+
+def _gaussian(rng, node, vals) -> Dict:
+    if node.cont_parents:
+        return {
+            "mean": np.nan,
+            "regressor_obj": _linear(rng, node, len(node.cont_parents)),
+            "regressor": type(node.regressor).__name__,
+            # as in GaussianNode, with parents it is std of residuals
+            "variance": rng.uniform(0.5, 1.5),
+            "serialization": None,
+        }
+    return {
+        "mean": rng.normal(0, 3),
+        "regressor_obj": None,
+        "regressor": None,
+        "variance": rng.uniform(0.5, 2),
+        "serialization": None,
+    }
+
+
+def _logit(rng, node, vals) -> Dict:
+    return {
+        "classes": vals[node.name],
+        "classifier_obj": _linear(rng, node, len(node.cont_parents), vals[node.name]),
+        "classifier": type(node.classifier).__name__,
+        "serialization": None,
+    }
+
+
+def _mixture(rng, node, vals, n_components: Sequence[int]) -> Dict:
+    n_comp = rng.integers(n_components[0], n_components[1] + 1)
+    dim = 1 + len(node.cont_parents)
+    means = rng.normal(0, 1, (n_comp, dim))
+    means[:, 0] *= 3
+    factors = rng.normal(0, 1, (n_comp, dim, dim))
+    covars = factors @ factors.transpose(0, 2, 1) / dim + 0.5 * np.eye(dim)
+    return {
+        "mean": means.tolist(),
+        "coef": rng.dirichlet(np.full(n_comp, 2.0)).tolist(),
+        "covars": covars.tolist(),
+    }
+
+
+def _node_parameters(rng, node, vals, alpha, n_components) -> Dict:
+    """
+    :param vals: values of discrete nodes
+    """
+    kind = type(node).__name__
+    combinations = product(*[vals[p] for p in node.disc_parents])
+    if kind == "DiscreteNode":
+        n_vals = len(vals[node.name])
+        if not node.disc_parents:
+            cprob = rng.dirichlet(np.full(n_vals, alpha)).tolist()
+        else:
+            cprob = {
+                str(list(comb)): rng.dirichlet(np.full(n_vals, alpha)).tolist()
+                for comb in combinations
+            }
+        return {"cprob": cprob, "vals": vals[node.name]}
+
+    generators = {
+        "Gaussian": _gaussian,
+        "Logit": _logit,
+        "MixtureGaussian": lambda *args: _mixture(*args, n_components),
+    }
+    name = kind[: -len("Node")]
+    if name in generators:
+        return generators[name](rng, node, vals)
+    generator = generators[name[len("Conditional") :]]
+    return {
+        "hybcprob": {
+            str(list(comb)): generator(rng, node, vals) for comb in combinations
+        }
+    }
+
+
+def random_network(
+    n_nodes: int = 100,
+    max_in_degree: int = 3,
+    disc_share: float = 0.5,
+    logit_share: float = 0.0,
+    mixture_share: float = 0.0,
+    cardinality: Tuple[int, int] = (2, 4),
+    n_components: Tuple[int, int] = (1, 3),
+    alpha: float = 1.0,
+    seed: Optional[int] = None,
+):
+    """
+    Bayesian network with random structure (see random_dag) and random parameters
+    in the distributions schema: dirichlet CPTs, linear regressions and
+    logistic regressions with random coefficients, random gaussian mixtures.
+    The network type follows the types of nodes (Discrete, Continuous or Hybrid).
+    :param mixture_share: share of continuous nodes that are (conditional) mixtures
+    :param cardinality: range of numbers of values of discrete nodes (inclusive)
+    :param n_components: range of numbers of components of mixtures (inclusive)
+    :param alpha: concentration of dirichlet distribution of CPTs rows
+    """
+    from bamt.networks.continuous_bn import ContinuousBN
+    from bamt.networks.discrete_bn import DiscreteBN
+    from bamt.networks.hybrid_bn import HybridBN
+    from bamt.nodes.conditional_gaussian_node import ConditionalGaussianNode
+    from bamt.nodes.gaussian_node import GaussianNode
+
+    rng = np.random.default_rng(seed)
+    info, edges = random_dag(
+        n_nodes, max_in_degree, disc_share, logit_share, seed=rng.integers(2**32)
+    )
+    types = set(info["types"].values())
+    use_mixture = mixture_share > 0
+    if types == {"disc"}:
+        bn = DiscreteBN()
+    elif types == {"cont"}:
+        bn = ContinuousBN(use_mixture=use_mixture)
+    else:
+        bn = HybridBN(has_logit=logit_share > 0, use_mixture=use_mixture)
+    bn.add_nodes(info)
+    bn.set_structure(edges=edges)
+
+    # with use_mixture all continuous nodes are mixtures, the rest are replaced back
+    if use_mixture:
+        for i, node in enumerate(bn.nodes):
+            if "Mixture" in node.type and rng.random() >= mixture_share:
+                if node.disc_parents:
+                    gaussian = ConditionalGaussianNode(name=node.name)
+                else:
+                    gaussian = GaussianNode(name=node.name)
+                gaussian.disc_parents = node.disc_parents
+                gaussian.cont_parents = node.cont_parents
+                gaussian.children = node.children
+                bn.nodes[i] = gaussian
+
+    vals = {
+        name: [str(v) for v in range(rng.integers(cardinality[0], cardinality[1] + 1))]
+        for name, node_type in info["types"].items()
+        if node_type == "disc"
+    }
+    bn.set_parameters(
+        {
+            node.name: _node_parameters(rng, node, vals, alpha, n_components)
+            for node in bn.nodes
+        }
+    )
+    return bn
+
+
+def synthetic_data(
+    bn, n: int, seed: Optional[int] = None, chunk_size: int = 10**5
+) -> pd.DataFrame:
+    """
+    Sample n rows from the network with the vectorized sampler by chunks
+    (to bound memory of intermediate buffers).
+    """
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for start in range(0, n, chunk_size):
+        chunks.append(
+            bn.sample(
+                min(chunk_size, n - start),
+                progress_bar=False,
+                seed=int(rng.integers(2**31)),
+            )
+        )
+    return pd.concat(chunks, ignore_index=True)
@@ -1,39 +1,41 @@
+import hashlib
+import io
+import json
 import os
 import pickle
-from typing import Union, Tuple
+import shutil
+import threading
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Union, Tuple
 
 import joblib
+import numpy as np
 
 import bamt.utils.check_utils as check_utils
 from bamt.log import logger_nodes
+from bamt.utils.CPTUtils import SparseCPT
 
 
 class ModelsSerializer:
-    def __init__(self, bn_name, models_dir):
+    # models with larger pickles are stored in compressed files in models_dir
+    inline_limit = 2**20
+
+    def __init__(self, bn_name, models_dir, n_jobs: int = 1):
         self.bn_name = bn_name
         self.models_dir = models_dir
+        self.n_jobs = n_jobs
         self.serialization = None
+        # serialized models by digests of their pickles
+        self._stored = {}
+        self._lock = threading.Lock()
 
         if os.path.isdir(models_dir):
             if bn_name in os.listdir(models_dir):
                 raise AssertionError(f"Name must be unique. | {os.listdir(models_dir)}")
 
-    @staticmethod
-    def choose_serialization(model) -> Tuple[str, Union[Exception, int]]:
-        try:
-            ex_b = pickle.dumps(model, protocol=4)
-            model_ser = ex_b.decode("latin1").replace("'", '"')
-
-            if type(model).__name__ == "CatBoostRegressor":
-                a = model_ser.encode("latin1")
-            else:
-                a = model_ser.replace('"', "'").encode("latin1")
-
-            classifier_body = pickle.loads(a)
-            return "pickle", 1
-        except Exception:
-            return "joblib", -1
-
     def get_path_joblib(self, models_dir, node_name: str) -> str:
         """
         Args:
@@ -48,83 +50,116 @@ class ModelsSerializer:
 
         if not os.path.isdir(path):
             os.makedirs(
-                os.path.join(models_dir, self.bn_name, f"{node_name.replace(' ', '_')}")
+                os.path.join(models_dir, self.bn_name, f"{node_name.replace(' ', '_')}"),
+                exist_ok=True,
             )
         return path
 
-    def serialize_instance(self, instance: dict, model_type, node_name, specific=False):
-        """Every distribution contains a dict with params with models"""
-        model_ser = None
+    def _destination(self, node_name: str, specific=False) -> str:
+        path = self.get_path_joblib(
+            models_dir=self.models_dir, node_name=node_name.replace(" ", "_")
+        )
+        if not specific:
+            destination = f"{node_name.replace(' ', '_')}.joblib.compressed"
+        else:
+            destination = f"{specific}.joblib.compressed"
+        return os.path.abspath(os.path.join(path, destination))
 
+    def _store(self, data: bytes, node_name: str, specific=False) -> Tuple[str, str]:
+        """
+        Store pickled model inline (latin1 string) or in a compressed file,
+        byte-identical models are stored once.
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            stored = self._stored.get(digest)
+        if stored is not None:
+            return stored
+
+        if len(data) <= self.inline_limit:
+            stored = "pickle", data.decode("latin1")
+        else:
+            path = self._destination(node_name, specific)
+            # the same format as joblib.dump(..., compress=True), joblib.load reads it
+            with open(path, "wb") as out:
+                out.write(zlib.compress(data, 3))
+            stored = "joblib", path
+        with self._lock:
+            return self._stored.setdefault(digest, stored)
+
+    def serialize_instance(self, instance: dict, model_type, node_name, specific=False):
+        """
+        Every distribution contains a dict with params with models.
+        Return a copy of the dict with serialized model (the dict is not changed).
+        """
         model = instance[f"{model_type}_obj"]
+        if isinstance(model, LazyModel):
+            model = model.load()
         if not check_utils.is_model(model):
             return instance
 
-        serialization, status = self.choose_serialization(model)
-        if status == -1:
+        try:
+            data = pickle.dumps(model, protocol=4)
+        except Exception:
             logger_nodes.warning(
                 f"{node_name}:{'' if not specific else specific}::Pickle failed. BAMT will use Joblib."
             )
-        if serialization == "pickle":
-            ex_b = pickle.dumps(model, protocol=4)
-            model_ser = ex_b.decode("latin1")
-        elif serialization == "joblib":
-            path = self.get_path_joblib(
-                models_dir=self.models_dir, node_name=node_name.replace(" ", "_")
-            )
-            if not specific:
-                destination = f"{node_name.replace(' ', '_')}.joblib.compressed"
-            else:
-                destination = f"{specific}.joblib.compressed"
-            path = os.path.abspath(os.path.join(path, destination))
+            path = self._destination(node_name, specific)
             joblib.dump(model, path, compress=True, protocol=4)
+            serialization, model_ser = "joblib", path
         else:
-            logger_nodes.error("Serialization detection failed.")
-            return
+            serialization, model_ser = self._store(data, node_name, specific)
+
+        instance = dict(instance)
         instance["serialization"] = serialization
-        instance[f"{model_type}_obj"] = model_ser or path
+        instance[f"{model_type}_obj"] = model_ser
         return instance
 
     def serialize(self, distributions):
         result = {}
+        tasks = []
         for node_name, [node_type, dist] in distributions.items():
             result[node_name] = {}
             model_type = "regressor" if "Gaussian" in node_type else "classifier"
             if "Conditional" in node_type:
                 result[node_name]["hybcprob"] = {}
                 for combination, dist_nested in dist["hybcprob"].items():
-                    instance_serialized = self.serialize_instance(
-                        instance=dist_nested,
-                        model_type=model_type,
-                        node_name=node_name,
-                        specific=combination,
-                    )
-                    result[node_name]["hybcprob"][combination] = instance_serialized
+                    tasks.append((dist_nested, model_type, node_name, combination))
             else:
-                instance_serialized = self.serialize_instance(
-                    instance=dist, model_type=model_type, node_name=node_name
-                )
-                result[node_name] = instance_serialized
+                tasks.append((dist, model_type, node_name, False))
+
+        # models are independent, pickling and compression of big ones run in threads
+        with ThreadPoolExecutor(max(self.n_jobs, 1)) as pool:
+            serialized = pool.map(lambda task: self.serialize_instance(*task), tasks)
+            for (_, _, node_name, combination), instance in zip(tasks, serialized):
+                if combination is False:
+                    result[node_name] = instance
+                else:
+                    result[node_name]["hybcprob"][combination] = instance
         return result
 
 
 class Deserializer:
     def __init__(self, models_dir):
         self.models_dir = models_dir
+        # models stored once (see ModelsSerializer) are loaded once as well
+        self._models = {}
 
-    @staticmethod
-    def deserialize_instance(instance: dict, model_type):
+    def deserialize_instance(self, instance: dict, model_type):
         model_repr = instance[f"{model_type}_obj"]
         if model_repr is None:
             return instance
 
         serialization = instance["serialization"]
 
-        if serialization == "pickle":
-            bytes_model = model_repr.encode("latin1")
-            model = pickle.loads(bytes_model)
-        else:
-            model = joblib.load(model_repr)
+        model = self._models.get((serialization, model_repr))
+        if model is None:
+            if serialization == "pickle":
+                bytes_model = model_repr.encode("latin1")
+                model = pickle.loads(bytes_model)
+            else:
+                model = joblib.load(model_repr)
+            self._models[serialization, model_repr] = model
 
         instance[f"{model_type}_obj"] = model
         return instance
@@ -148,3 +183,284 @@ class Deserializer:
                 )
                 result[node_name] = instance_deserialized
         return result
+
+
+def _restore(model):
+    return model
+
+
+class LazyModel(object):
+    """
+    Proxy of a model stored in a container, the model is loaded on first use
+    (any attribute access). Pickling and copying give the model itself.
+    """
+
+    __slots__ = ("source", "member", "_model")
+    _lock = threading.Lock()
+
+    def __init__(self, source: "ContainerReader", member: str):
+        self.source = source
+        self.member = member
+        self._model = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self.source.read_model(self.member)
+        return self._model
+
+    def __getattr__(self, name: str):
+        if name in LazyModel.__slots__:
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __reduce__(self):
+        return _restore, (self.load(),)
+
+    def __repr__(self):
+        if self.loaded:
+            return repr(self._model)
+        return f"LazyModel({self.member})"
+
+
+class ContainerWriter(object):
+    """
+    Writer of a network into a container: a directory or a zip archive with
+    manifest.json (descriptor, edges, weights), parameters.json (parameters
+    with references), .npy arrays of CPTs and mixtures and separate model blobs.
+    """
+
+    # parameters stored as arrays (if they are rectangular tables of numbers),
+    # small ones are kept in parameters.json: reading a file costs more than parsing
+    array_keys = ("cprob", "mean", "covars", "coef")
+    min_array_size = 256
+
+    def __init__(self, path: str, kind: str = "zip"):
+        if kind not in ("zip", "dir"):
+            raise ValueError(f"Unknown container kind: {kind}. Expected: zip, dir.")
+        self.path = path
+        self.kind = kind
+        # the container is written next to path and moved over it when complete,
+        # so blobs of a container being overwritten can still be read
+        self._staging = None
+        self._archive = None
+        self._count = 0
+        self._models = {}
+
+    def _put(self, member: str, data: bytes):
+        if self.kind == "zip":
+            self._archive.writestr(member, data)
+        else:
+            with open(os.path.join(self._staging, member), "wb") as out:
+                out.write(data)
+
+    def _name(self, folder: str, extension: str) -> str:
+        self._count += 1
+        return f"{folder}/{self._count}.{extension}"
+
+    def _put_array(self, value) -> Optional[str]:
+        if isinstance(value, np.ndarray):
+            array = value
+        else:
+            try:
+                array = np.asarray(value, dtype=float)
+            except (TypeError, ValueError):
+                return None
+            if array.size < self.min_array_size:
+                return None
+        member = self._name("arrays", "npy")
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        self._put(member, buffer.getvalue())
+        return member
+
+    def _put_model(self, model) -> str:
+        if isinstance(model, LazyModel) and not model.loaded:
+            # copy the blob without unpickling
+            data = model.source.read_bytes(model.member)
+            if os.path.realpath(model.source.path) == os.path.realpath(self.path):
+                # the container of the model is overwritten, its blob goes away
+                model.load()
+        else:
+            buffer = io.BytesIO()
+            # not compressed, so arrays of models can be memory-mapped on load
+            joblib.dump(model, buffer, protocol=4)
+            data = buffer.getvalue()
+        # byte-identical models are stored once
+        digest = hashlib.sha1(data).hexdigest()
+        if digest not in self._models:
+            self._models[digest] = self._name("models", "joblib")
+            self._put(self._models[digest], data)
+        return self._models[digest]
+
+    def encode(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Replace models and numeric tables in parameters of a node with references
+        (parameters are not changed).
+        """
+        result = {}
+        for key, value in params.items():
+            if key.endswith("_obj") and (
+                isinstance(value, LazyModel) or check_utils.is_model(value)
+            ):
+                value = {"$model": self._put_model(value)}
+                result["serialization"] = "container"
+            elif isinstance(value, SparseCPT):
+                value = {
+                    "$cpt": {
+                        "parents_values": value.parents_values,
+                        "keys": value.keys_list,
+                        "array": self._put_array(value.table),
+                        "default": value.default.tolist(),
+                    }
+                }
+            elif key in self.array_keys and isinstance(value, list):
+                member = self._put_array(value)
+                if member:
+                    value = {"$array": member}
+            elif key in self.array_keys and isinstance(value, dict) and value:
+                member = self._put_array(list(value.values()))
+                if member:
+                    value = {"$table": {"keys": list(value.keys()), "array": member}}
+            elif isinstance(value, dict):
+                value = self.encode(value)
+            if key != "serialization" or "serialization" not in result:
+                result[key] = value
+        return result
+
+    def write(self, header: Dict[str, Any], parameters: Dict[str, Dict[str, Any]]):
+        directory, name = os.path.split(os.path.abspath(self.path))
+        self._staging = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        if self.kind == "zip":
+            self._archive = zipfile.ZipFile(self._staging, "w", zipfile.ZIP_STORED)
+        else:
+            for folder in ("arrays", "models"):
+                os.makedirs(os.path.join(self._staging, folder))
+        try:
+            encoded = {name: self.encode(params) for name, params in parameters.items()}
+            self._put("parameters.json", json.dumps(encoded).encode())
+            manifest = dict(header, format=ContainerReader.format_version)
+            self._put("manifest.json", json.dumps(manifest).encode())
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+            self._replace()
+        finally:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+            if os.path.isdir(self._staging):
+                shutil.rmtree(self._staging)
+            elif os.path.exists(self._staging):
+                os.remove(self._staging)
+            self._staging = None
+        return True
+
+    def _replace(self):
+        """Move the written container over path."""
+        if self.kind == "zip":
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path)
+            os.replace(self._staging, self.path)
+            return
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        os.makedirs(self.path, exist_ok=True)
+        # other files of the directory are kept, files of a previous save
+        # are not referenced anymore
+        for folder in ("arrays", "models"):
+            shutil.rmtree(os.path.join(self.path, folder), ignore_errors=True)
+            os.replace(
+                os.path.join(self._staging, folder), os.path.join(self.path, folder)
+            )
+        for member in ("parameters.json", "manifest.json"):
+            os.replace(
+                os.path.join(self._staging, member), os.path.join(self.path, member)
+            )
+
+
+class ContainerReader(object):
+    """
+    Reader of containers made by ContainerWriter. The manifest is read without
+    parameters, so the structure can be inspected cheaply; models are loaded lazily
+    (arrays of models and tables of SparseCPT in directories are memory-mapped).
+    """
+
+    format_version = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_dir = os.path.isdir(path)
+        self._archive = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_container(path: str) -> bool:
+        if os.path.isdir(path):
+            return os.path.isfile(os.path.join(path, "manifest.json"))
+        return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+    def read_bytes(self, member: str) -> bytes:
+        if self.is_dir:
+            with open(os.path.join(self.path, member), "rb") as f:
+                return f.read()
+        with self._lock:
+            if self._archive is None:
+                self._archive = zipfile.ZipFile(self.path)
+            return self._archive.read(member)
+
+    def read_model(self, member: str):
+        if self.is_dir:
+            return joblib.load(os.path.join(self.path, member), mmap_mode="r")
+        return joblib.load(io.BytesIO(self.read_bytes(member)))
+
+    def read_array(self, member: str, mmap: bool = False) -> np.ndarray:
+        if mmap and self.is_dir:
+            return np.load(os.path.join(self.path, member), mmap_mode="r")
+        return np.load(io.BytesIO(self.read_bytes(member)), allow_pickle=False)
+
+    def read_header(self) -> Dict[str, Any]:
+        header = json.loads(self.read_bytes("manifest.json"))
+        if header.get("format", 0) > self.format_version:
+            raise ValueError(
+                f"Container format {header['format']} is newer than supported "
+                f"({self.format_version})."
+            )
+        return header
+
+    def decode(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        result = {}
+        for key, value in params.items():
+            if isinstance(value, dict):
+                if "$model" in value:
+                    value = LazyModel(self, value["$model"])
+                elif "$array" in value:
+                    value = self.read_array(value["$array"]).tolist()
+                elif "$cpt" in value:
+                    cpt = value["$cpt"]
+                    value = SparseCPT(
+                        cpt["parents_values"],
+                        cpt["keys"],
+                        self.read_array(cpt["array"], mmap=True),
+                        cpt["default"],
+                    )
+                elif "$table" in value:
+                    table = value["$table"]
+                    rows = self.read_array(table["array"]).tolist()
+                    value = dict(zip(table["keys"], rows))
+                else:
+                    value = self.decode(value)
+            result[key] = value
+        return result
+
+    def read_parameters(self) -> Dict[str, Dict[str, Any]]:
+        parameters = json.loads(self.read_bytes("parameters.json"))
+        return {name: self.decode(params) for name, params in parameters.items()}
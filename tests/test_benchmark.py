@@ -0,0 +1,61 @@
+import logging
+import unittest
+
+import pandas as pd
+
+from bamt.benchmark import Benchmark, compare, scale_data
+
+logging.getLogger("network").setLevel(logging.CRITICAL)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_scale_data(self):
+        data = pd.DataFrame({"a": ["x", "y", "z", "x"], "b": [0.1, 0.5, 0.2, 1.0]})
+        scaled = scale_data(data, 3, seed=1)
+        self.assertEqual((12, 2), scaled.shape)
+        self.assertTrue(set(scaled["a"]) <= set(data["a"]))
+        self.assertTrue(scaled["b"].between(-0.5, 1.5).all())
+
+    def test_run(self):
+        benchmark = Benchmark(
+            datasets=["cancer"],
+            sample_sizes=[10],
+            stages=["structure", "fit_parameters", "sample", "predict", "save", "load"],
+            metrics=["K2"],
+        )
+        results = benchmark.run()
+        self.assertEqual(
+            [
+                "structure_HC_K2",
+                "fit_parameters",
+                "sample_10",
+                "predict",
+                "save",
+                "load",
+            ],
+            [record["stage"] for record in results],
+        )
+        for record in results:
+            self.assertEqual("Discrete", record["network"])
+            self.assertGreater(record["seconds"], 0)
+        self.assertEqual(10, results[2]["rows"])
+
+        baseline = [dict(record) for record in results]
+        baseline[0]["seconds"] = results[0]["seconds"] / 2
+        regressions = compare(results, baseline, tolerance=0.2)
+        self.assertEqual([results[0]], regressions)
+        self.assertAlmostEqual(2, results[0]["ratio"])
+        self.assertFalse(results[1]["regression"])
+
+    def test_run_load(self):
+        benchmark = Benchmark(
+            datasets=["cancer"], stages=["structure", "load"], metrics=["K2"]
+        )
+        results = benchmark.run()
+        self.assertEqual(
+            ["structure_HC_K2", "load"], [record["stage"] for record in results]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=3)
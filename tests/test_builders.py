@@ -667,6 +667,59 @@ class TestHillClimbDefiner(unittest.TestCase):
 
         self.assertEqual(hcd.skeleton["E"], right_edges)
 
+        # all nodes as candidates is the full search
+        columns = list(self.data)
+        hcd.apply_group1(
+            data=pd.DataFrame(self.data),
+            progress_bar=False,
+            init_edges=None,
+            remove_init_edges=False,
+            white_list=None,
+            candidates={v: [u for u in columns if u != v] for v in columns},
+        )
+        self.assertEqual(hcd.skeleton["E"], right_edges)
+
+    def test_candidates(self):
+        data = pd.DataFrame(self.data)
+        hcd = HillClimbDefiner(
+            data=data, descriptor=self.descriptor, scoring_function=("MI",)
+        )
+        hcd.restrict(data=data, bl_add=None, init_nodes=None)
+
+        for method in ["MI", "pearson", "brave", "PC", "MMPC"]:
+            candidates = hcd.select_candidates(data, method, n_candidates=3)
+            self.assertEqual(set(data), set(candidates))
+            for v, parents in candidates.items():
+                self.assertNotIn(v, parents)
+                if method in ["MI", "pearson"]:
+                    self.assertEqual(3, len(parents))
+                for u in parents:
+                    self.assertNotIn((u, v), hcd.black_list)
+
+        hcd.apply_group1(
+            data=data,
+            progress_bar=False,
+            init_edges=None,
+            remove_init_edges=False,
+            white_list=None,
+            candidates=candidates,
+        )
+        self.assertTrue(hcd.skeleton["E"])
+        for u, v in hcd.skeleton["E"]:
+            self.assertIn(u, candidates[v])
+
+        # candidates selected again by score gain
+        hcd.apply_group1(
+            data=data,
+            progress_bar=False,
+            init_edges=None,
+            remove_init_edges=False,
+            white_list=None,
+            candidates=candidates,
+            refresh_candidates=1,
+        )
+        self.assertTrue(hcd.skeleton["E"])
+
 
 class TestEvoStructureBuilder(unittest.TestCase):
     def setUp(self):
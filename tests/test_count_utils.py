@@ -0,0 +1,101 @@
+import itertools
+import tracemalloc
+import unittest
+
+import numpy as np
+import pandas as pd
+from pgmpy.estimators import K2Score
+
+from bamt.builders.hc_builder import CountK2Score
+from bamt.utils.CountUtils import CountIndex, popcount
+
+
+class TestCountUtils(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 1001
+        self.data = pd.DataFrame(
+            {
+                "a": rng.integers(0, 2, n),
+                "b": rng.choice(["x", "y", "z"], n),
+                "c": rng.integers(0, 5, n),
+                # more values than rows of a conjunction with other columns
+                "d": rng.integers(0, 800, n),
+            }
+        )
+        self.data["e"] = (self.data["a"] + self.data["c"]) % 3
+        self.weights = rng.random(n)
+
+    def test_popcount(self):
+        words = np.array([0, 1, 2**64 - 1, 0xF0F0], dtype=np.uint64)
+        self.assertEqual([0, 1, 64, 8], popcount(words).tolist())
+
+    def test_cells(self):
+        for weights in [None, self.weights]:
+            index = CountIndex(self.data, weights)
+            for columns in [["b"], ["c", "a"], ["e", "a", "c"], ["a", "d", "b"]]:
+                grouped = (
+                    pd.Series(1.0 if weights is None else weights, self.data.index)
+                    .groupby([self.data[c] for c in columns])
+                    .sum()
+                )
+                cells, counts = index.cells(columns, decode=True)
+                self.assertEqual(
+                    grouped.index.to_list(),
+                    [tuple(cell) if len(columns) > 1 else cell[0] for cell in cells],
+                )
+                np.testing.assert_allclose(grouped.values, counts)
+
+                table = index.table(columns)
+                self.assertEqual(
+                    tuple(self.data[c].nunique() for c in columns), table.shape
+                )
+                self.assertAlmostEqual(grouped.sum(), table.sum())
+
+        # conjunctions of prefixes are cached, the least recently used are dropped
+        index = CountIndex(self.data, max_bytes=10**4)
+        index.cells(["e", "a", "c"])
+        self.assertIn(("e", "a"), index._cache)
+        index.cells(["b", "d"])
+        self.assertNotIn(("e", "a"), index._cache)
+        self.assertIn(("b", "d"), index._cache)
+
+    def test_memory(self):
+        # columns of many values are grouped from codes, memory is linear in rows
+        rng = np.random.default_rng(1)
+        n = 40000
+        data = pd.DataFrame(
+            {c: rng.integers(0, 400, n) for c in "xyz"} | {"w": rng.integers(0, 3, n)}
+        )
+        index = CountIndex(data)
+        tracemalloc.start()
+        cells, counts = index.cells(["w", "x", "y", "z"])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertLess(peak, 50 * 2**20)
+        self.assertEqual(n, counts.sum())
+        self.assertEqual(data.drop_duplicates().shape[0], cells.shape[0])
+
+    def test_k2_score(self):
+        data = self.data.drop(columns="d")
+        expected, result = K2Score(data), CountK2Score(data)
+        for variable in data:
+            others = [c for c in data if c != variable]
+            families = [()] + list(itertools.combinations(others, 1))
+            for parents in families + list(itertools.combinations(others, 2)):
+                self.assertEqual(
+                    expected.local_score(variable, list(parents)),
+                    result.local_score(variable, list(parents)),
+                )
+
+        # weights of rows are counts of identical rows
+        repeated = data.loc[data.index.repeat(3)]
+        weighted = CountK2Score(data, np.full(data.shape[0], 3))
+        self.assertAlmostEqual(
+            K2Score(repeated).local_score("e", ["a", "c"]),
+            weighted.local_score("e", ["a", "c"]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=3)
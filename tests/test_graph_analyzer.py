@@ -93,6 +93,35 @@ class TestGraphAnalyzer(unittest.TestCase):
             without_children,
         )
 
+    def test_requisite_nodes(self):
+        # descendants without evidence are barren
+        self.assertEqual(
+            sorted(["Node0", "Node2", "Node3", "Node4", "Node7", "Node9"]),
+            sorted(self.analyzer.requisite_nodes(["Node0"], ["Node3"])),
+        )
+        # ancestors of Node0 are d-separated from Node2 by evidence
+        self.assertEqual(
+            sorted(["Node0", "Node2", "Node9"]),
+            sorted(self.analyzer.requisite_nodes(["Node2"], ["Node0"])),
+        )
+        self.assertEqual(
+            sorted(["Node1", "Node5"]),
+            sorted(self.analyzer.requisite_nodes(["Node5"], ["Node1"])),
+        )
+        self.assertEqual(
+            sorted(["Node0", "Node4", "Node7"]),
+            sorted(self.analyzer.requisite_nodes(["Node0"], ["Node3"], forward=True)),
+        )
+
+    def test_requisite_nodes_order(self):
+        # nodes of the network are not in topological order
+        self.bn.nodes.reverse()
+        parents = {node.name: node.disc_parents for node in self.bn.nodes}
+        for forward in [False, True]:
+            names = self.analyzer.requisite_nodes(["Node0"], ["Node3"], forward)
+            for i, name in enumerate(names):
+                self.assertTrue(set(parents[name]) & set(names) <= set(names[:i]))
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,75 @@
+import sys
+import unittest
+
+import numpy as np
+
+from bamt.mi_entropy_gauss import GaussianStatistics, entropy_gauss, mi_gauss
+from bamt.preprocess.numpy_pandas import get_type_numpy, loc_to_DataFrame
+from bamt.redef_info_scores import AIC_local, BIC_local, LocalScore, log_lik_local
+
+
+class TestInfoScores(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        a = rng.normal(size=500)
+        b = a + rng.normal(size=500)
+        d = rng.integers(0, 3, 500)
+        # a value of one row only
+        e = np.where(a > 0, 1, 0)
+        e[0] = 2
+        self.data = np.column_stack(
+            [a, b, b - a + d + rng.normal(size=500), d, a * 1e-3, e]
+        )
+
+    def test_get_type_numpy(self):
+        self.assertEqual(
+            {0: "cont", 1: "cont", 2: "cont", 3: "disc", 4: "cont", 5: "disc"},
+            get_type_numpy(self.data),
+        )
+        self.assertEqual(
+            {0: "disc", 1: "cont", 2: "cont"},
+            get_type_numpy(np.array([2.0, np.nan, np.inf])),
+        )
+
+    def test_gaussian_statistics(self):
+        statistics = GaussianStatistics(self.data)
+        self.assertEqual(
+            [True, True, True, False, True, False], list(statistics.continuous)
+        )
+        for columns in [(0,), (1, 0), (2, 0, 1), (4, 0), (2, 4, 1, 0)]:
+            df = loc_to_DataFrame(self.data[:, columns])
+            self.assertTrue(statistics.is_continuous(columns))
+            self.assertAlmostEqual(entropy_gauss(df), statistics.entropy(columns))
+            self.assertAlmostEqual(mi_gauss(df), statistics.mi(columns))
+        self.assertFalse(statistics.is_continuous((3, 5)))
+
+        for columns in [(2, 3), (3, 2), (2, 0, 3), (1, 3, 5), (1, 5), (1, 5, 0)]:
+            df = loc_to_DataFrame(self.data[:, columns])
+            for method in ["MI", "BIC"]:
+                self.assertAlmostEqual(
+                    mi_gauss(df, method), statistics.mi(columns, method)
+                )
+        # families with a repeated column are degenerate
+        self.assertEqual(sys.float_info.min, statistics.entropy((1, 0, 1)))
+        self.assertAlmostEqual(0.0, statistics.mi((1, 3, 1)))
+        # groups of rows are found once for a set of discrete columns
+        self.assertEqual({(3,), (3, 5), (5,)}, set(statistics._moments))
+
+    def test_local_score(self):
+        for metric, function in [
+            ("MI", mi_gauss),
+            ("LL", log_lik_local),
+            ("BIC", BIC_local),
+            ("AIC", AIC_local),
+        ]:
+            score = LocalScore(self.data, metric)
+            families = [(0,), (1, 0), (2, 0, 1), (2, 3), (3, 0, 1), (1, 5, 3)]
+            # (5, 3) is discrete, scored by counts from the index
+            for columns in families + [(5, 3)]:
+                self.assertAlmostEqual(
+                    function(self.data[:, columns]), score(columns), places=6
+                )
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=3)
@@ -1,25 +1,46 @@
 import json
 import logging
+import os
 import pathlib as pl
+import pickle
+import shutil
+import subprocess
+import sys
+import threading
 import unittest
 
+import numpy as np
 import pandas as pd
 from catboost import CatBoostRegressor
 from sklearn import preprocessing as pp
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mutual_info_score
 from sklearn.tree import DecisionTreeRegressor
 
 import bamt.preprocessors as bp
+from bamt import profiling
+from bamt.external.pyitlib.DiscreteRandomVariableUtils import (
+    entropy,
+    entropy_conditional,
+    information_mutual,
+    information_mutual_conditional,
+)
+from bamt.networks.big_brave_bn import BigBraveBN
 from bamt.networks.composite_bn import CompositeBN
+from bamt.networks.continuous_bn import ContinuousBN
+from bamt.networks.discrete_bn import DiscreteBN
 from bamt.networks.hybrid_bn import BaseNetwork, HybridBN
 from bamt.nodes.discrete_node import DiscreteNode
 from bamt.nodes.gaussian_node import GaussianNode
-from bamt.utils.MathUtils import precision_recall
+from bamt.preprocess.numpy_pandas import compress_rows
+from bamt.utils.MathUtils import mutual_information_matrix, precision_recall
 from bamt.utils.composite_utils.CompositeGeneticOperators import (
     custom_mutation_add_model,
     custom_crossover_all_model,
 )
 from bamt.utils.composite_utils.CompositeModel import CompositeModel, CompositeNode
+from bamt.utils.serialization_utils import Deserializer, LazyModel, ModelsSerializer
 
 logging.getLogger("network").setLevel(logging.CRITICAL)
 
@@ -112,6 +133,20 @@ class TestBaseNetwork(TestCaseBase):
         self.bn.update_descriptor()
         self.assertEqual({"Node0": "cont"}, self.bn.descriptor["types"])
 
+    def test_getitem(self):
+        self.bn.nodes = self.nodes
+        self.assertIs(self.nodes[1], self.bn["Node1"])
+        self.assertIsNone(self.bn["Node3"])
+
+        # registry follows changes of the list of nodes
+        self.bn.nodes.append(GaussianNode(name="Node3"))
+        self.assertIs(self.nodes[3], self.bn["Node3"])
+        self.bn.nodes[1] = DiscreteNode(name="Node4")
+        self.assertIsNone(self.bn["Node1"])
+        self.assertIs(self.nodes[1], self.bn["Node4"])
+        self.bn.nodes = self.nodes[:1]
+        self.assertIsNone(self.bn["Node2"])
+
     # It uses only Vertices Definer, test of this is in builders tests.
     def test_add_nodes(self):
         pass
@@ -121,7 +156,83 @@ class TestBaseNetwork(TestCaseBase):
         pass
 
     def test_calculate_weights(self):
-        pass
+        data = pd.read_csv("data/benchmark/cancer.csv", index_col=0)
+        codes = data.apply(lambda column: pd.factorize(column)[0])
+        bn = DiscreteBN()
+        bn.add_nodes({"types": {name: "disc" for name in data}, "signs": {}})
+        bn.set_structure(
+            edges=[
+                ("Pollution", "Cancer"),
+                ("Smoker", "Cancer"),
+                ("Cancer", "Xray"),
+                ("Cancer", "Dyspnoea"),
+            ]
+        )
+        bn.calculate_weights(data)
+
+        y, x, z = codes["Cancer"].values, codes["Smoker"].values, codes["Pollution"]
+        z = [list(z.values)]
+        expected = information_mutual_conditional(
+            x=y, y=x, z=z, cartesian_product=True
+        ) / (entropy_conditional(X=y, Y=z, cartesian_product=True) + 1e-8)
+        self.assertAlmostEqual(
+            float(np.average(expected)), bn.weights[("Smoker", "Cancer")]
+        )
+        y, x = codes["Xray"].values, codes["Cancer"].values
+        self.assertAlmostEqual(
+            information_mutual(X=y, Y=x) / entropy(X=y),
+            bn.weights[("Cancer", "Xray")],
+        )
+
+        weights = dict(bn.weights)
+        bn.calculate_weights(data, n_jobs=2, n_bootstrap=30, seed=1)
+        self.assertEqual(weights, bn.weights)
+        self.assertEqual(set(weights), set(bn.weights_ci))
+        for edge, (low, high) in bn.weights_ci.items():
+            self.assertLessEqual(low, high)
+
+        unique, counts = compress_rows(data)
+        bn.calculate_weights(unique, sample_weight=counts)
+        for edge, weight in weights.items():
+            self.assertAlmostEqual(weight, bn.weights[edge])
+
+    def test_sample_weight(self):
+        # identical rows are compressed into unique rows with their counts
+        data = pd.read_csv("data/benchmark/asia.csv", index_col=0)
+        data = data.apply(lambda column: pd.factorize(column)[0])
+        unique, counts = compress_rows(data)
+        self.assertLess(unique.shape[0], data.shape[0])
+        self.assertEqual(data.shape[0], counts.sum())
+        pd.testing.assert_series_equal(
+            data.value_counts().sort_index(),
+            unique.loc[unique.index.repeat(counts)].value_counts().sort_index(),
+        )
+
+        info = {"types": {name: "disc" for name in data}, "signs": {}}
+        for scoring_function in [("K2",), ("BIC",)]:
+            bn, weighted = DiscreteBN(), DiscreteBN()
+            bn.add_nodes(info)
+            weighted.add_nodes(info)
+            bn.add_edges(data, scoring_function=scoring_function, progress_bar=False)
+            weighted.add_edges(
+                unique,
+                scoring_function=scoring_function,
+                progress_bar=False,
+                sample_weight=counts,
+            )
+            self.assertEqual(sorted(bn.edges), sorted(weighted.edges))
+
+        bn.fit_parameters(data)
+        weighted.fit_parameters(unique, sample_weight=counts)
+        for node, distribution in bn.distributions.items():
+            expected = distribution["cprob"]
+            result = weighted.distributions[node]["cprob"]
+            if isinstance(expected, dict):
+                self.assertEqual(set(expected), set(result))
+                keys = sorted(expected)
+                expected = [expected[key] for key in keys]
+                result = [result[key] for key in keys]
+            np.testing.assert_allclose(expected, result)
 
     def test_set_nodes(self):
         class MyNode:
@@ -195,6 +306,39 @@ class TestBaseNetwork(TestCaseBase):
     def test_save(self):
         pass
 
+    def test_serialize_models(self):
+        x = np.arange(10, dtype=float).reshape(-1, 1)
+        models = [LinearRegression().fit(x, 2 * x.ravel()) for _ in range(2)]
+        dist = {
+            "hybcprob": {
+                f"['{i}']": {"regressor_obj": model, "regressor": "LinearRegression"}
+                for i, model in enumerate(models)
+            }
+        }
+        serializer = ModelsSerializer(bn_name="serialized", models_dir="models_test")
+        # all models are stored in files
+        serializer.inline_limit = 0
+        result = serializer.serialize({"Node": ["ConditionalGaussian", dist]})
+
+        self.assertIs(models[0], dist["hybcprob"]["['0']"]["regressor_obj"])
+        paths = [
+            instance["regressor_obj"] for instance in result["Node"]["hybcprob"].values()
+        ]
+        # byte-identical models are stored once
+        self.assertEqual(paths[0], paths[1])
+        self.assertIsFile(paths[0])
+
+        restored = Deserializer("models_test").apply(
+            {"Node": ["ConditionalGaussian", result["Node"]]}
+        )
+        restored = [
+            instance["regressor_obj"]
+            for instance in restored["Node"]["hybcprob"].values()
+        ]
+        self.assertIs(restored[0], restored[1])
+        self.assertTrue(np.allclose(models[0].coef_, restored[0].coef_))
+        shutil.rmtree("models_test")
+
     def test_fit_parameters(self):
         """
         General test, the full one is in the tests of each node.
@@ -227,6 +371,151 @@ class TestBaseNetwork(TestCaseBase):
         if combination_package["serialization"] == "joblib":
             self.assertIsFile(regressor_obj)
 
+    def test_profile(self):
+        data = pd.read_csv("data/benchmark/cancer.csv", index_col=0)
+        p = bp.Preprocessor([("encoder", pp.LabelEncoder())])
+        bn = DiscreteBN()
+
+        events = []
+        with bn.profile(callbacks=[events.append]) as profiler:
+            discretized_data, _ = p.apply(data)
+            bn.add_nodes(p.info)
+            bn.add_edges(
+                discretized_data, scoring_function=("BIC",), progress_bar=False
+            )
+            bn.fit_parameters(data)
+            bn.sample(50, progress_bar=False)
+        # disabled out of the context
+        bn.sample(50, progress_bar=False)
+
+        report = profiler.report()
+        self.assertEqual(len(profiler.events), len(events))
+        for stage in ["preprocess", "add_edges", "hc_search", "fit_parameters"]:
+            self.assertEqual(1, report["stages"][stage]["calls"])
+        self.assertEqual(1, report["stages"]["sample"]["calls"])
+        self.assertEqual(5, report["stages"]["fit_node"]["calls"])
+        self.assertEqual({"fit_node", "sample_node"}, set(report["nodes"]["Smoker"]))
+
+        counters = report["counters"]
+        self.assertGreater(counters["hc_iterations"], 0)
+        self.assertGreater(counters["hc_cycle_checks"], 0)
+        self.assertGreater(counters["hc_score_cache_hits"], 0)
+        self.assertGreater(counters["hc_score_cache_misses"], 0)
+
+        trace = profiler.chrome_trace()["traceEvents"]
+        self.assertEqual(len(events) + 1, len(trace))
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in trace[:-1]))
+        self.assertEqual(counters, trace[-1]["args"])
+
+    def test_profile_scope(self):
+        with profiling.Profiler(allocations=True) as profiler:
+            with profiling.stage("outer"):
+                block = np.ones(2**20)
+                del block
+                with profiling.stage("inner"):
+                    block = np.ones(2**17)
+        outer, inner = profiler.report()["stages"]["outer"], profiler.events[0]
+        # peaks of freed memory are kept, also after peaks of nested stages
+        self.assertGreaterEqual(outer["peak_memory"], 8 * 2**20)
+        self.assertLess(inner["peak_memory"], 2 * 2**20)
+
+        # a profiler is active only in the thread which entered it
+        entered, done = threading.Event(), threading.Event()
+
+        def run():
+            with profiling.Profiler():
+                entered.set()
+                done.wait()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        entered.wait()
+        self.assertIsNone(profiling.active())
+        done.set()
+        thread.join()
+
+        # worker threads of sampling get the profiler of the caller
+        data = pd.read_csv("data/benchmark/cancer.csv", index_col=0)
+        bn = DiscreteBN()
+        bn.add_nodes({"types": {c: "disc" for c in data}, "signs": {}})
+        bn.set_structure(edges=[("Pollution", "Cancer"), ("Smoker", "Cancer")])
+        bn.fit_parameters(data)
+        with bn.profile() as profiler:
+            bn.sample(100, progress_bar=False, parall_count=2)
+        self.assertEqual(
+            2 * len(bn.nodes), profiler.report()["stages"]["sample_node"]["calls"]
+        )
+
+    def test_import_time(self):
+        # sampling and prediction from loaded models must not pay for
+        # structure learning, plotting and composite models at import
+        heavy = ["pgmpy", "golem", "matplotlib", "pyvis", "catboost", "xgboost"]
+        code = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import bamt.networks\n"
+            "print(time.perf_counter() - start)\n"
+            f"print([m for m in {heavy!r} if m in sys.modules])\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        elapsed, loaded = result.stdout.strip().splitlines()[-2:]
+        self.assertEqual("[]", loaded, f"import bamt.networks took {elapsed} s")
+
+    def test_save_container(self):
+        hack_data = self.prepare_bn_and_data()
+        self.bn.fit_parameters(hack_data)
+        test = hack_data.iloc[:50].drop(columns=["Gross", "Lithology"])
+        expected = self.bn.predict(test, progress_bar=False)
+
+        for kind in ["zip", "dir"]:
+            self.assertTrue(self.bn.save("container", container=kind))
+            if kind == "zip":
+                self.assertIsFile("container.bamt")
+            else:
+                self.assertIsDir("container.bamt")
+
+            header = HybridBN(has_logit=True)
+            self.assertTrue(header.load("container.bamt", header_only=True))
+            self.assertEqual(self.bn.nodes_names, header.nodes_names)
+            self.assertEqual(len(self.bn.edges), len(header.edges))
+            self.assertEqual({}, header.distributions)
+
+            bn = HybridBN(has_logit=True)
+            self.assertTrue(bn.load("container.bamt"))
+            self.assertEqual(
+                self.bn.distributions["Period"], bn.distributions["Period"]
+            )
+            model = bn.distributions["Gross"]["hybcprob"]["['COMPRESSION']"][
+                "regressor_obj"
+            ]
+            self.assertIsInstance(model, LazyModel)
+            self.assertFalse(model.loaded)
+
+            result = bn.predict(test, progress_bar=False)
+            self.assertEqual(expected["Lithology"], result["Lithology"])
+            self.assertTrue(np.allclose(expected["Gross"], result["Gross"]))
+            self.assertTrue(model.loaded)
+
+            # a loaded network is saved back to its own container
+            bn = HybridBN(has_logit=True)
+            self.assertTrue(bn.load("container.bamt"))
+            self.assertTrue(bn.save("container", container=kind))
+            for network in [bn, HybridBN(has_logit=True)]:
+                if network is not bn:
+                    self.assertTrue(network.load("container.bamt"))
+                result = network.predict(test, progress_bar=False)
+                self.assertEqual(expected["Lithology"], result["Lithology"])
+                self.assertTrue(np.allclose(expected["Gross"], result["Gross"]))
+            names = [p for p in os.listdir(".") if "container" in p]
+            self.assertEqual(["container.bamt"], names)
+
+            if kind == "zip":
+                pl.Path("container.bamt").unlink()
+            else:
+                shutil.rmtree("container.bamt")
+
     def test_sample(self):
         data = {
             "Tectonic regime": [
@@ -641,6 +930,165 @@ class TestBaseNetwork(TestCaseBase):
         self.bn.fit_parameters(pd.DataFrame.from_records(data))
         self.assertIsNotNone(self.bn.sample(50, as_df=False, progress_bar=False))
 
+    def test_sample_columns(self):
+        hack_data = self.prepare_bn_and_data()
+        self.bn.fit_parameters(hack_data)
+
+        columns = self.bn.sample(200, as_df="columns", progress_bar=False, seed=0)
+        self.assertEqual(set(columns.keys()), set(hack_data.columns))
+        self.assertIsInstance(columns["Tectonic regime"], pd.Categorical)
+        self.assertEqual(columns["Gross"].dtype, "float64")
+
+        sample = self.bn.sample(
+            200, progress_bar=False, evidence={"Tectonic regime": "COMPRESSION"}
+        )
+        self.assertGreater(sample.shape[0], 0)
+        self.assertTrue((sample["Tectonic regime"] == "COMPRESSION").all())
+        self.assertFalse(sample.isnull().values.any())
+
+    def test_weighted_sample(self):
+        np.random.seed(1)
+        a = np.random.choice(["a0", "a1"], 2000, p=[0.9, 0.1])
+        b = np.where(
+            a == "a0",
+            np.random.choice(["b0", "b1"], 2000, p=[0.95, 0.05]),
+            np.random.choice(["b0", "b1"], 2000, p=[0.3, 0.7]),
+        )
+        self.bn.set_structure(
+            info={"types": {"A": "disc", "B": "disc"}, "signs": {}},
+            nodes=[DiscreteNode(name="A"), DiscreteNode(name="B")],
+            edges=[("A", "B")],
+        )
+        self.bn.fit_parameters(pd.DataFrame({"A": a, "B": b}))
+
+        distribution = self.bn.distributions["A"]
+        prior = dict(zip(distribution["vals"], distribution["cprob"]))
+        b1 = self.bn.distributions["B"]["vals"].index("b1")
+        joint = {
+            val: p * self.bn.distributions["B"]["cprob"][str([val])][b1]
+            for val, p in prior.items()
+        }
+
+        sample, weights, ess = self.bn.weighted_sample(
+            20000, evidence={"B": "b1"}, progress_bar=False, seed=0
+        )
+        self.assertTrue((sample["B"] == "b1").all())
+        self.assertAlmostEqual(weights.sum(), 1)
+        self.assertLess(ess, 20000)
+        self.assertAlmostEqual(
+            weights[sample["A"] == "a1"].sum(),
+            joint["a1"] / sum(joint.values()),
+            delta=0.02,
+        )
+
+    def test_log_prob(self):
+        hack_data = self.prepare_bn_and_data()
+        self.bn.fit_parameters(hack_data)
+
+        log_prob = self.bn.log_prob(hack_data)
+        self.assertEqual(log_prob.shape, (hack_data.shape[0],))
+        self.assertTrue(np.isfinite(log_prob).all())
+
+        per_node = self.bn.log_prob(hack_data, per_node=True, batch_size=100)
+        self.assertEqual(list(per_node.columns), self.bn.nodes_names)
+        np.testing.assert_allclose(per_node.sum(axis=1), log_prob)
+
+        chunks = [hack_data.iloc[:150], hack_data.iloc[150:]]
+        np.testing.assert_allclose(
+            np.concatenate(list(self.bn.iter_log_prob(chunks))), log_prob
+        )
+
+        unknown = hack_data.iloc[:1].copy()
+        unknown["Tectonic regime"] = "UNKNOWN"
+        self.assertEqual(self.bn.log_prob(unknown)[0], -np.inf)
+
+    def test_compile(self):
+        hack_data = self.prepare_bn_and_data()
+        self.bn.fit_parameters(hack_data)
+
+        plan = self.bn.compile()
+        self.assertIs(self.bn.compile(), plan)
+        self.assertEqual(plan.names, tuple(self.bn.nodes_names))
+        with self.assertRaises(AttributeError):
+            plan.params = ()
+
+        restored = pickle.loads(pickle.dumps(plan))
+        self.assertEqual(restored.names, plan.names)
+        self.assertEqual(restored.index["Depth"], plan.index["Depth"])
+
+        self.bn.fit_parameters(hack_data)
+        self.assertIsNot(self.bn.compile(), plan)
+
+    def test_gibbs_sample(self):
+        np.random.seed(1)
+        x = np.random.normal(0, 1, 5000)
+        y = x + np.random.normal(0, 0.5, 5000)
+        self.bn.set_structure(
+            info={"types": {"X": "cont", "Y": "cont"}, "signs": {}},
+            nodes=[GaussianNode(name="X"), GaussianNode(name="Y")],
+            edges=[("X", "Y")],
+        )
+        self.bn.fit_parameters(pd.DataFrame({"X": x, "Y": y}))
+
+        # posterior of X given Y = 2 is N(1.6, 0.2)
+        sample, diagnostics = self.bn.gibbs_sample(
+            200, evidence={"Y": 2.0}, n_iter=200, progress_bar=False, seed=0
+        )
+        self.assertEqual(sample.shape[0], 200 * 200)
+        self.assertAlmostEqual(sample["X"].mean(), 1.6, delta=0.05)
+        self.assertLess(diagnostics["r_hat"]["X"], 1.1)
+
+        predictions = self.bn.predict(
+            pd.DataFrame({"Y": [2.0, -1.0]}),
+            progress_bar=False,
+            method="gibbs",
+            gibbs_params={"n_iter": 1000},
+        )
+        np.testing.assert_allclose(predictions["X"], [1.6, -0.8], atol=0.1)
+
+    def test_gibbs_predict_encoded(self):
+        # categorical columns are label-encoded as in CompositeBN
+        np.random.seed(1)
+        a = np.random.choice(["x", "y"], 2000)
+        flip = np.random.rand(2000) < 0.1
+        b = np.where((a == "x") ^ flip, "u", "v")
+        self.bn.set_structure(
+            info={"types": {"A": "disc", "B": "disc"}, "signs": {}},
+            nodes=[DiscreteNode(name="A"), DiscreteNode(name="B")],
+            edges=[("A", "B")],
+        )
+        data = self.bn._encode_categorical_data(pd.DataFrame({"A": a, "B": b}))
+        self.bn.fit_parameters(data)
+
+        test = pd.DataFrame({"A": ["x", "y"]})
+        predictions = self.bn.predict(
+            test, progress_bar=False, method="gibbs", gibbs_params={"n_iter": 200}
+        )
+        self.assertEqual(predictions["B"], ["u", "v"])
+        self.assertEqual(predictions, self.bn.predict(test, progress_bar=False))
+
+    def test_fill_gaps(self):
+        hack_data = self.prepare_bn_and_data()
+        self.bn.fit_parameters(hack_data)
+
+        data = hack_data.iloc[:50].copy()
+        data.loc[data.index[::2], "Gross"] = np.nan
+        data.loc[data.index[::3], "Lithology"] = np.nan
+        before = data.copy()
+
+        filled, failed = self.bn.fill_gaps(data)
+        pd.testing.assert_frame_equal(data, before)
+        self.assertFalse(filled.isna().any().any())
+        self.assertEqual(filled.shape[0] + len(failed), data.shape[0])
+
+        # the same values as predictions for separate rows
+        row = data.iloc[[2]]
+        expected = self.bn.predict(row.dropna(axis=1), progress_bar=False)
+        if data.index[2] not in failed:
+            self.assertAlmostEqual(
+                filled.loc[data.index[2], "Gross"], expected["Gross"][0]
+            )
+
     def test_predict(self):
         seq = {
             "Tectonic regime": [
@@ -1058,8 +1506,139 @@ class TestBaseNetwork(TestCaseBase):
                 self.assertFalse(pd.isna(item))
 
 
-class TestBigBraveBN(unittest.SkipTest):
-    pass
+class TestContinuousBN(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(1)
+        x = np.random.normal(0, 1, 5000)
+        y = x + np.random.normal(0, 0.5, 5000)
+        z = y + np.random.normal(0, 0.5, 5000)
+        self.data = pd.DataFrame({"X": x, "Y": y, "Z": z})
+        self.bn = ContinuousBN()
+        self.bn.set_structure(
+            info={"types": {"X": "cont", "Y": "cont", "Z": "cont"}, "signs": {}},
+            nodes=[GaussianNode(name=name) for name in ["X", "Y", "Z"]],
+            edges=[("X", "Y"), ("Y", "Z")],
+        )
+        self.bn.fit_parameters(self.data)
+
+    def test_posterior(self):
+        joint = self.bn.compile_gaussian()
+        np.testing.assert_allclose(joint.cov, self.data.cov().values, rtol=0.05)
+
+        # X given Z = 2 is N(1.33, 0.33)
+        means, cov = self.bn.posterior({"Z": [2.0, 0.0]})
+        self.assertEqual(list(means.columns), ["X", "Y"])
+        np.testing.assert_allclose(means["X"], [4 / 3, 0], atol=0.05)
+        self.assertAlmostEqual(cov.loc["X", "X"], 1 / 3, delta=0.03)
+        self.assertIs(self.bn.compile_gaussian(), joint)
+
+        predictions = self.bn.predict(
+            pd.DataFrame({"Y": [1.0], "Z": [2.0]}), method="exact"
+        )
+        np.testing.assert_allclose(predictions["X"], [0.8], atol=0.05)
+
+    def test_compile_force(self):
+        plan = self.bn.compile()
+        joint = self.bn.compile_gaussian()
+        # in-place edits of parameters are not detected
+        self.bn.distributions["X"]["mean"] = 10.0
+        self.assertIs(self.bn.compile(), plan)
+        self.assertIs(self.bn.compile_gaussian(), joint)
+
+        self.assertIsNot(self.bn.compile(force=True), plan)
+        sample = self.bn.sample(2000, progress_bar=False, seed=0)
+        self.assertAlmostEqual(sample["X"].mean(), 10, delta=0.1)
+        self.assertAlmostEqual(self.bn.compile_gaussian(force=True).mean[0], 10)
+
+    def test_sample_node_order(self):
+        bn = ContinuousBN()
+        bn.set_structure(
+            info={"types": {"X": "cont", "Y": "cont", "Z": "cont"}, "signs": {}},
+            nodes=[GaussianNode(name=name) for name in ["X", "Y", "Z"]],
+            edges=[("X", "Y"), ("Y", "Z")],
+        )
+        # nodes are not in topological order
+        bn.nodes.reverse()
+        bn.fit_parameters(self.data)
+        self.assertEqual(("X", "Y", "Z"), bn.compile().names)
+
+        sample = bn.sample(1000, progress_bar=False, seed=0)
+        self.assertFalse(sample.isna().any().any())
+        np.testing.assert_allclose(sample.cov(), self.data.cov(), rtol=0.2)
+        predictions = bn.predict(pd.DataFrame({"X": [1.0, -1.0]}), progress_bar=False)
+        np.testing.assert_allclose(predictions["Z"], [1.0, -1.0], atol=0.1)
+
+    def test_posterior_node_order(self):
+        bn = ContinuousBN()
+        bn.set_structure(
+            info={"types": {"X": "cont", "Y": "cont", "Z": "cont"}, "signs": {}},
+            nodes=[GaussianNode(name=name) for name in ["X", "Y", "Z"]],
+            edges=[("X", "Y"), ("Y", "Z")],
+        )
+        # nodes are not in topological order
+        bn.nodes.reverse()
+        bn.fit_parameters(self.data)
+        self.assertEqual(["Z", "Y", "X"], bn.nodes_names)
+
+        joint = bn.compile_gaussian()
+        expected = self.bn.compile_gaussian()
+        self.assertEqual(["Z", "Y", "X"], joint.names)
+        np.testing.assert_allclose(joint.mean, expected.mean[::-1])
+        np.testing.assert_allclose(joint.cov, expected.cov[::-1, ::-1])
+
+
+class TestBigBraveBN(unittest.TestCase):
+    def setUp(self):
+        self.data = pd.read_csv("data/benchmark/healthcare.csv", index_col=0)
+        self.bn = BigBraveBN()
+
+    def test_proximity_matrix(self):
+        proximity = self.bn._get_proximity_matrix(self.data, "MI")
+        codes = self.data.apply(lambda column: pd.factorize(column)[0])
+        for c1 in self.data.columns:
+            for c2 in self.data.columns:
+                self.assertAlmostEqual(
+                    mutual_info_score(codes[c1], codes[c2]), proximity.loc[c1, c2]
+                )
+
+        # narrow columns (one-hot products) and wide columns (bincount) agree
+        rng = np.random.default_rng(0)
+        codes = rng.integers(0, [2, 5, 40, 300], (300, 4))
+        expected = mutual_information_matrix(codes, codes.max(axis=0) + 1)
+        for max_card in [0, 1000]:
+            self.assertTrue(
+                np.allclose(
+                    expected,
+                    mutual_information_matrix(
+                        codes, codes.max(axis=0) + 1, n_jobs=2, max_card=max_card
+                    ),
+                )
+            )
+
+    def test_brave_matrix(self):
+        proximity = self.bn._get_proximity_matrix(self.data, "MI")
+        brave = self.bn._get_brave_matrix(self.data.columns, proximity, n_nearest=2)
+        groups = [
+            proximity[c].sort_values(ascending=False).index[:3] for c in proximity
+        ]
+        for c1 in self.data.columns:
+            for c2 in self.data.columns:
+                if c1 == c2:
+                    self.assertEqual(0, brave.loc[c1, c2])
+                    continue
+                a = sum((c1 in g) & (c2 in g) for g in groups)
+                b = sum((c1 in g) & (c2 not in g) for g in groups)
+                c = sum((c1 not in g) & (c2 in g) for g in groups)
+                d = sum((c1 not in g) & (c2 not in g) for g in groups)
+                divisor = np.sqrt((a + c) * (b + d)) * np.sqrt((a + b) * (c + d))
+                self.assertAlmostEqual(
+                    (a * len(groups) + (a + c) * (a + b)) / (divisor or 1e-10),
+                    brave.loc[c1, c2],
+                )
+
+        edges = self.bn.set_possible_edges_by_brave(self.data, n_nearest=2)
+        self.assertEqual(edges, self.bn.possible_edges)
+        self.assertTrue(all(a != b for a, b in edges))
 
 
 class TestCompositeNetwork(unittest.TestCase):
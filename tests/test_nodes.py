@@ -1,4 +1,7 @@
 import logging
+import os
+import pickle
+import tempfile
 import unittest
 
 import numpy as np
@@ -6,6 +9,8 @@ import pandas as pd
 
 from bamt.networks.hybrid_bn import HybridBN
 from bamt.nodes import *
+from bamt.nodes.schema import CodedColumn
+from bamt.utils.CountUtils import CountIndex
 
 logging.getLogger("nodes").setLevel(logging.CRITICAL)
 
@@ -221,6 +226,82 @@ class TestDiscreteNode(unittest.TestCase):
         self.assertTrue([self.node.predict(params, pvals) in params["vals"]])
         self.assertRaises(KeyError, self.node.predict, params, ["bad", "values"])
 
+    def test_count_index(self):
+        data = pd.DataFrame.from_records(self.data_dict)
+        # some combinations of parents values are not observed
+        data.loc[data["node4"] == "cat4", "node5"] = "cat7"
+        weights = np.random.randint(1, 4, data.shape[0])
+        for sample_weight in [None, weights]:
+            index = CountIndex(data, sample_weight)
+            self.node.cpt_storage = None
+            params = self.node.fit_parameters(data, sample_weight=sample_weight)
+            indexed = self.node.fit_parameters(
+                data, sample_weight=sample_weight, count_index=index
+            )
+            self.assertEqual(params, indexed)
+
+            self.node.cpt_storage = {"dtype": "float64", "mmap_dir": None}
+            sparse = self.node.fit_parameters(data, sample_weight=sample_weight)
+            indexed = self.node.fit_parameters(
+                data, sample_weight=sample_weight, count_index=index
+            )
+            cprob = indexed["cprob"]
+            self.assertLess(len(cprob.keys_list), len(cprob))
+            self.assertEqual(sparse["cprob"].keys_list, cprob.keys_list)
+            self.assertEqual(sparse["cprob"].parents_values, cprob.parents_values)
+            self.assertTrue(np.allclose(sparse["cprob"].table, cprob.table))
+            for comb, probas in params["cprob"].items():
+                self.assertTrue(np.allclose(probas, cprob[comb]))
+
+    def test_sparse_cpt(self):
+        data = pd.DataFrame.from_records(self.data_dict)
+        params = self.node.fit_parameters(data)
+        self.node.cpt_storage = {"dtype": "float32", "mmap_dir": None}
+        sparse = self.node.fit_parameters(data)
+        cprob = sparse["cprob"]
+
+        self.assertEqual(params["vals"], sparse["vals"])
+        self.assertEqual(np.float32, cprob.table.dtype)
+        self.assertEqual(list(params["cprob"].keys()), list(cprob.keys()))
+        for comb, probas in params["cprob"].items():
+            self.assertTrue(np.allclose(probas, cprob[comb]))
+        self.assertEqual(params["cprob"].keys(), cprob.to_dict().keys())
+
+        # unobserved combinations of known values get the default row
+        self.assertEqual(9, len(cprob))
+        self.assertLessEqual(len(cprob.keys_list), 9)
+        self.assertRaises(KeyError, self.node.predict, sparse, ["bad", "values"])
+        self.assertTrue(self.node.predict(sparse, ["cat4", "cat7"]) in sparse["vals"])
+
+        codes = np.array([0, 1, 0], dtype=np.int8)
+        columns = {
+            "node4": CodedColumn(codes, ["cat4", "cat5"]),
+            "node5": CodedColumn(codes, ["cat7", "bad"]),
+        }
+        self.assertTrue(
+            np.allclose(
+                self.node._batch_probs(params, columns, 3)[1],
+                self.node._batch_probs(sparse, columns, 3)[1],
+                equal_nan=True,
+            )
+        )
+
+    def test_sparse_cpt_mmap(self):
+        data = pd.DataFrame.from_records(self.data_dict)
+        other = data.assign(test=np.random.choice(["cat1", "cat2"], 30))
+        with tempfile.TemporaryDirectory() as directory:
+            self.node.cpt_storage = {"dtype": "float64", "mmap_dir": directory}
+            first = self.node.fit_parameters(data)["cprob"]
+            second = self.node.fit_parameters(other)["cprob"]
+
+            self.assertEqual(2, len(os.listdir(directory)))
+            self.assertNotEqual(first.table.filename, second.table.filename)
+            self.assertEqual(3, first.table.shape[1])
+            self.assertEqual(2, second.table.shape[1])
+            restored = pickle.loads(pickle.dumps(first))
+            self.assertTrue(np.array_equal(first.table, restored.table))
+            del first, second, restored
+
 
 class TestGaussianNode(unittest.TestCase):
     def setUp(self):
@@ -271,6 +352,20 @@ class TestGaussianNode(unittest.TestCase):
         self.assertTrue(isinstance(self.node.predict(params, pvals), float))
         self.assertRaises(ValueError, self.node.predict, params, ["bad", "values"])
 
+    def test_choose_batch_positive(self):
+        node_without_parents = gaussian_node.GaussianNode(name="foster-son")
+        params = node_without_parents.fit_parameters(
+            pd.DataFrame.from_records(self.data_dict)
+        )
+        params["mean"] = -0.5
+
+        out = np.empty(1000)
+        node_without_parents.choose_batch(params, {}, out)
+        self.assertTrue((out < 0).any())
+
+        node_without_parents.choose_batch(params, {}, out, positive=True)
+        self.assertTrue((out >= 0).all())
+
 
 class TestConditionalGaussianNode(unittest.TestCase):
     def setUp(self):
@@ -381,6 +476,16 @@ class TestMixtureGaussianNode(unittest.TestCase):
 
         self.assertTrue(isinstance(self.node.predict(params, pvals), float))
 
+    def test_choose_batch_positive(self):
+        data = pd.DataFrame.from_records(self.data_dict)
+        data["test"] -= 3
+        params = self.node.fit_parameters(data)
+        columns = {"node0": data["node0"].values, "node1": data["node1"].values}
+
+        out = np.empty(30)
+        self.node.choose_batch(params, columns, out, positive=True)
+        self.assertTrue((out >= 0).all())
+
 
 class TestConditionalMixtureGaussianNode(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,64 @@
+import logging
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+
+from bamt.utils.SkeletonUtils import CITester, skeleton
+from bamt.utils.SyntheticUtils import random_network, synthetic_data
+
+logging.getLogger("network").setLevel(logging.CRITICAL)
+
+
+class TestSkeletonUtils(unittest.TestCase):
+    def test_tests(self):
+        rng = np.random.default_rng(0)
+        x = rng.integers(0, 3, 2000)
+        data = pd.DataFrame(
+            {
+                "x": x,
+                "y": (x + rng.integers(0, 2, 2000)) % 3,
+                "a": rng.normal(size=2000),
+            }
+        )
+        data["b"] = data["a"] + rng.normal(size=2000)
+        data["c"] = data["b"] + rng.normal(size=2000)
+        types = {"x": "disc", "y": "disc", "a": "cont", "b": "cont", "c": "cont"}
+
+        table = pd.crosstab(data["x"], data["y"]).to_numpy()
+        for statistic, name in [("g2", "log-likelihood"), ("chi2", "pearson")]:
+            tester = CITester(data, types, statistic)
+            expected = chi2_contingency(table, correction=False, lambda_=name)[1]
+            self.assertAlmostEqual(expected, tester.discrete(0, 1, ()))
+
+        # a and c are dependent, independent given b
+        self.assertLess(tester.p_value(2, 4, ()), 1e-10)
+        self.assertGreater(tester.p_value(2, 4, (3,)), 0.01)
+        p_values = tester.partial_correlation(3, 4, [(2,), (2,)])
+        self.assertEqual(tester.p_value(3, 4, (2,)), p_values[0])
+        self.assertLess(p_values[1], 1e-10)
+        self.assertEqual((3,), tester.separate(2, 4, [(0,), (3,)], 0.01))
+
+    def test_skeleton(self):
+        for disc_share in [0, 1, 0.5]:
+            bn = random_network(25, max_in_degree=2, disc_share=disc_share, seed=2)
+            data = synthetic_data(bn, 5000, seed=1)
+            true = {frozenset(edge) for edge in bn.edges}
+            for method in ["PC", "MMPC"]:
+                neighbours = skeleton(data, bn.descriptor["types"], method=method)
+                self.assertEqual(set(data), set(neighbours))
+                found = {
+                    frozenset((node, other))
+                    for node, others in neighbours.items()
+                    for other in others
+                }
+                self.assertTrue(
+                    all(node in neighbours[other] for node, other in map(tuple, found))
+                )
+                self.assertGreater(len(found & true) / len(true), 0.8)
+                self.assertGreater(len(found & true) / len(found), 0.8)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=3)
@@ -0,0 +1,87 @@
+import logging
+import unittest
+
+import numpy as np
+
+from bamt.networks.continuous_bn import ContinuousBN
+from bamt.networks.discrete_bn import DiscreteBN
+from bamt.utils.MathUtils import precision_recall
+from bamt.utils.SyntheticUtils import random_dag, random_network, synthetic_data
+
+logging.getLogger("network").setLevel(logging.CRITICAL)
+logging.getLogger("builder").setLevel(logging.CRITICAL)
+
+
+class TestSyntheticUtils(unittest.TestCase):
+    def test_random_dag(self):
+        info, edges = random_dag(200, max_in_degree=2, disc_share=0.5, seed=1)
+        names = list(info["types"])
+        position = {name: i for i, name in enumerate(names)}
+
+        self.assertEqual(200, len(names))
+        self.assertTrue(all(position[a] < position[b] for a, b in edges))
+        in_degree = np.bincount([position[b] for _, b in edges], minlength=200)
+        self.assertLessEqual(in_degree.max(), 2)
+        # without logit nodes discrete nodes have only discrete parents
+        self.assertFalse(
+            any(
+                info["types"][a] == "cont" and info["types"][b] == "disc"
+                for a, b in edges
+            )
+        )
+
+    def test_random_network(self):
+        bn = random_network(
+            60, disc_share=0.5, logit_share=0.5, mixture_share=0.5, seed=2
+        )
+        types = {node.type.split(" ")[0] for node in bn.nodes}
+        self.assertTrue(
+            {"Discrete", "Gaussian", "ConditionalGaussian", "Logit"} <= types
+        )
+        self.assertTrue(any("Mixture" in t for t in types))
+
+        data = synthetic_data(bn, 3000, seed=1, chunk_size=1000)
+        self.assertEqual((3000, 60), data.shape)
+        self.assertFalse(data.isna().any().any())
+        for node in bn.nodes:
+            if node.type == "Discrete":
+                self.assertTrue(
+                    set(data[node.name]) <= set(bn.distributions[node.name]["vals"])
+                )
+
+    def test_known_parameters(self):
+        bn = random_network(15, disc_share=0, seed=3)
+        data = synthetic_data(bn, 5000, seed=1)
+
+        fitted = ContinuousBN()
+        fitted.add_nodes(bn.descriptor)
+        fitted.set_structure(edges=bn.edges)
+        fitted.fit_parameters(data)
+        for node in bn.nodes:
+            true, learnt = bn.distributions[node.name], fitted.distributions[node.name]
+            if true["regressor_obj"] is not None:
+                self.assertTrue(
+                    np.allclose(
+                        true["regressor_obj"].coef_,
+                        learnt["regressor_obj"].coef_,
+                        atol=0.1,
+                    )
+                )
+            else:
+                self.assertAlmostEqual(true["mean"], learnt["mean"], delta=0.2)
+
+    def test_known_structure(self):
+        bn = random_network(15, disc_share=1, max_in_degree=2, seed=5)
+        data = synthetic_data(bn, 5000, seed=1)
+
+        learnt = DiscreteBN()
+        learnt.add_nodes(bn.descriptor)
+        learnt.add_edges(data, scoring_function=("K2",), progress_bar=False)
+        metrics = precision_recall(learnt.edges, bn.edges)
+        # directions are identified up to equivalence classes, adjacencies are not
+        self.assertGreaterEqual(metrics["AP"], 0.9)
+        self.assertGreaterEqual(metrics["AR"], 0.9)
+        self.assertLessEqual(metrics["SHD"], 6)
+
+if __name__ == "__main__":
+    unittest.main(verbosity=3)